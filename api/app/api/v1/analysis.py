@@ -1,261 +1,310 @@
 # app/api/v1/analysis.py
 
+import gzip
 from datetime import datetime
+from typing import Literal, Optional, Union
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-
-from app.database import get_db
-from app.jobs.analysis_scheduler import recompute_all_analyses, scheduler
-from app.models import AnalysisResult, Franchise, Subgroup, Submission, Song
-from app.schemas import (AnalysisMetadata, CommunityRankResponse,
+from starlette.concurrency import run_in_threadpool
+
+from app import database
+from app.database import get_async_read_db, get_read_db
+from app.jobs.analysis_scheduler import (ANALYSIS_TYPES, AnalysisScope,
+                                        queue_scope, run_scope, scheduler)
+from app.models import AnalysisResult, Franchise, Subgroup, Submission, SubmissionStatus, Song, UserNeighbors
+from app.schemas import (CommunityRankResponse, CompactDivergenceResponse,
                          ControversyResponse, DivergenceMatrixResponse,
                          HotTakesResponse, SpiceMeterResponse, TriggerResponse,
                          SubgroupResponse)
 from app.services.analysis import AnalysisService, ControversyIndexService
+from app.services.analysis_responses import AnalysisResponseService
+from app.services.compute_gate import analysis_gate, offloaded
+from app.services.live_analysis import LiveAnalysisService
+from app.utils.http_cache import HttpCache
 
 router = APIRouter(prefix="/api/v1", tags=["analysis"])
 
 
-@router.get("/analysis/rankings", response_model=CommunityRankResponse)
-async def get_community_rankings(
-    franchise: str, subgroup: str, db: Session = Depends(get_db)
-):
-    """Get the community-wide leaderboard for a subgroup"""
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
-        raise HTTPException(status_code=404, detail="Franchise not found")
-
-    subgroup_obj = (
-        db.query(Subgroup)
-        .filter(
-            Subgroup.name == subgroup, Subgroup.franchise_id == franchise_obj.id
-        )
-        .first()
-    )
-    if not subgroup_obj:
-        raise HTTPException(status_code=404, detail="Subgroup not found")
-
-    result = (
-        db.query(AnalysisResult)
-        .filter(
-            AnalysisResult.franchise_id == franchise_obj.id,
-            AnalysisResult.subgroup_id == subgroup_obj.id,
-            AnalysisResult.analysis_type == "COMMUNITY_RANK",
-        )
-        .first()
+def _stored_result_query(franchise: str, subgroup: Optional[str], analysis_type: str):
+    """
+    Franchise id, subgroup id and the stored result's version columns in
+    one indexed round trip (result_data is not loaded). subgroup=None
+    looks up a franchise-wide analysis (SPICE).
+    """
+    version_columns = (
+        AnalysisResult.id.label("result_id"),
+        AnalysisResult.computed_at,
+        AnalysisResult.response_encoding,
     )
-
-    if not result:
-        data = AnalysisService.compute_community_rankings(
-            str(franchise_obj.id), str(subgroup_obj.id), db
+    if subgroup is None:
+        return (
+            select(Franchise.id, *version_columns)
+            .outerjoin(AnalysisResult, and_(
+                AnalysisResult.franchise_id == Franchise.id,
+                AnalysisResult.subgroup_id.is_(None),
+                AnalysisResult.analysis_type == analysis_type,
+            ))
+            .filter(Franchise.name == franchise)
         )
-        return CommunityRankResponse(
-            metadata=AnalysisMetadata(
-                computed_at=datetime.utcnow(),
-                based_on_submissions=len(subgroup_obj.submissions),
-            ),
-            rankings=data,
-        )
-
-    return CommunityRankResponse(
-        metadata=AnalysisMetadata(
-            computed_at=result.computed_at,
-            based_on_submissions=result.based_on_submissions,
-        ),
-        rankings=result.result_data,
+    return (
+        select(Franchise.id, Subgroup.id.label("subgroup_id"), *version_columns)
+        .outerjoin(Subgroup, and_(Subgroup.franchise_id == Franchise.id, Subgroup.name == subgroup))
+        .outerjoin(AnalysisResult, and_(
+            AnalysisResult.franchise_id == Franchise.id,
+            AnalysisResult.subgroup_id == Subgroup.id,
+            AnalysisResult.analysis_type == analysis_type,
+        ))
+        .filter(Franchise.name == franchise)
     )
 
 
-@router.get("/analysis/divergence", response_model=DivergenceMatrixResponse)
-async def get_divergence_matrix(
-    franchise: str, subgroup: str, db: Session = Depends(get_db)
-):
-    """Get divergence matrix for a subgroup"""
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
-        raise HTTPException(status_code=404, detail="Franchise not found")
-
-    subgroup_obj = (
-        db.query(Subgroup)
-        .filter(Subgroup.name == subgroup, Subgroup.franchise_id == franchise_obj.id)
-        .first()
-    )
-    if not subgroup_obj:
-        raise HTTPException(status_code=404, detail="Subgroup not found")
-
-    result = (
-        db.query(AnalysisResult)
-        .filter(
-            AnalysisResult.franchise_id == franchise_obj.id,
-            AnalysisResult.subgroup_id == subgroup_obj.id,
-            AnalysisResult.analysis_type == "DIVERGENCE",
+def _live_analysis(franchise_id, subgroup_id, analysis_type: str, compute):
+    """Threadpool half of _serve_analysis: computes a missing result."""
+    db = database.get_read_session()
+    try:
+        return LiveAnalysisService.get_or_compute(
+            franchise_id, subgroup_id, analysis_type,
+            lambda: compute(franchise_id, subgroup_id, db),
+            db,
         )
-        .first()
-    )
+    finally:
+        db.close()
 
-    if not result:
-        # Divergence matrices are computationally heavy; fallback to live
-        data = AnalysisService.compute_divergence_matrix(
-            str(franchise_obj.id), str(subgroup_obj.id), db
-        )
-        return DivergenceMatrixResponse(
-            metadata=AnalysisMetadata(
-                computed_at=datetime.utcnow(),
-                based_on_submissions=len(subgroup_obj.submissions),
-            ),
-            matrix=data["matrix"],
-            rankings=data.get("rankings"),
-            song_names=data.get("song_names"),
-        )
 
-    # Handle cached results (legacy check)
-    cached = result.result_data
-    # If it's the new format, it has "matrix" key. If old, the top level is the matrix.
-    # We can check if "matrix" is in the keys, but user names might be keys too.
-    # A safe heuristic: New format keys are "matrix", "rankings", "song_names".
-    # Old format keys are usernames (strings).
-    is_new_format = "matrix" in cached and isinstance(cached["matrix"], dict)
-    
-    if is_new_format:
-        return DivergenceMatrixResponse(
-            metadata=AnalysisMetadata(
-                computed_at=result.computed_at,
-                based_on_submissions=result.based_on_submissions,
-            ),
-            matrix=cached["matrix"],
-            rankings=cached.get("rankings"),
-            song_names=cached.get("song_names"),
-        )
+def _render_body(analysis_type: str, render, data, computed_at, based_on_submissions) -> bytes:
+    """Threadpool half of _serve_analysis: a result's response model as JSON bytes."""
+    if render is None:
+        model = AnalysisResponseService.render(analysis_type, data, computed_at, based_on_submissions)
     else:
-        return DivergenceMatrixResponse(
-            metadata=AnalysisMetadata(
-                computed_at=result.computed_at,
-                based_on_submissions=result.based_on_submissions,
-            ),
-            matrix=cached,
-            rankings=None,
-            song_names=None,
-        )
+        model = render(data, computed_at, based_on_submissions)
+    body, _ = AnalysisResponseService.encode_model(model, 0)
+    return body
 
 
-@router.get("/analysis/controversy", response_model=ControversyResponse)
-async def get_controversy(franchise: str, subgroup: str, db: Session = Depends(get_db)):
-    """Get controversy analysis for a subgroup"""
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
+async def _serve_analysis(
+    db: AsyncSession,
+    franchise: str,
+    subgroup: Optional[str],
+    analysis_type: str,
+    if_none_match: Optional[str],
+    accept_encoding: Optional[str],
+    compute,
+    variant: Optional[str] = None,
+    render=None,
+):
+    """
+    Shared body of the stored-analysis GET routes.
+
+    A client whose If-None-Match still matches gets a 304 after one
+    lookup. Otherwise the response body stored with the result is sent as
+    is, gzip-encoded when the client accepts it; results stored without
+    one are rendered from result_data. `compute(franchise_id, subgroup_id, db)`
+    builds a missing result on the analysis gate.
+
+    `render(data, computed_at, based_on_submissions)` replaces the stored
+    body with another representation of the result, named by `variant`
+    in its ETag; it is rendered once per stored result and encoding, then
+    served from HttpCache's body cache. Bodies are built and serialized in
+    the threadpool; the event loop only sends bytes.
+    """
+    row = (await db.execute(_stored_result_query(franchise, subgroup, analysis_type))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Franchise not found")
-
-    subgroup_obj = (
-        db.query(Subgroup)
-        .filter(Subgroup.name == subgroup, Subgroup.franchise_id == franchise_obj.id)
-        .first()
-    )
-    if not subgroup_obj:
-        raise HTTPException(status_code=404, detail="Subgroup not found")
-
-    result = (
-        db.query(AnalysisResult)
-        .filter(
-            AnalysisResult.franchise_id == franchise_obj.id,
-            AnalysisResult.subgroup_id == subgroup_obj.id,
-            AnalysisResult.analysis_type == "CONTROVERSY",
+    subgroup_id = None
+    if subgroup is not None:
+        if not row.subgroup_id:
+            raise HTTPException(status_code=404, detail="Subgroup not found")
+        subgroup_id = row.subgroup_id
+
+    accepts_gzip = HttpCache.accepts(accept_encoding, "gzip")
+    if row.result_id and render is not None:
+        # Known before rendering, so the tag can be checked and the kept body found
+        encoding = AnalysisResponseService.response_encoding(accepts_gzip)
+        etag = HttpCache.etag(row.result_id, row.computed_at, encoding, variant)
+        if HttpCache.matches(if_none_match, etag):
+            return HttpCache.not_modified(etag, vary=True)
+        body = HttpCache.recall(etag)
+        if body is not None:
+            return HttpCache.encoded_response(body, etag, encoding)
+
+        result = (
+            await db.execute(
+                select(
+                    AnalysisResult.result_data,
+                    AnalysisResult.computed_at,
+                    AnalysisResult.based_on_submissions,
+                ).filter(AnalysisResult.id == row.result_id)
+            )
+        ).one()
+        body, _ = await run_in_threadpool(
+            lambda: AnalysisResponseService.encode_model(
+                render(result.result_data, result.computed_at, result.based_on_submissions),
+                None if encoding == "gzip" else 0,
+            )
         )
-        .first()
+        # The result may have been recomputed since the first lookup
+        etag = HttpCache.etag(row.result_id, result.computed_at, encoding, variant)
+        HttpCache.remember(etag, body)
+        return HttpCache.encoded_response(body, etag, encoding)
+
+    if row.result_id:
+        encoding = "gzip" if row.response_encoding == "gzip" and accepts_gzip else "identity"
+        etag = HttpCache.etag(row.result_id, row.computed_at, encoding)
+        if HttpCache.matches(if_none_match, etag):
+            return HttpCache.not_modified(etag, vary=True)
+
+        result = (
+            await db.execute(
+                select(
+                    AnalysisResult.computed_at,
+                    AnalysisResult.based_on_submissions,
+                    AnalysisResult.response_body,
+                    AnalysisResult.response_encoding,
+                ).filter(AnalysisResult.id == row.result_id)
+            )
+        ).one()
+        # The result may have been recomputed since the lookup: ETags below
+        # describe the body actually sent
+        if result.response_body is None:
+            data = await db.scalar(select(AnalysisResult.result_data).filter(AnalysisResult.id == row.result_id))
+            body = await run_in_threadpool(
+                _render_body, analysis_type, None, data, result.computed_at, result.based_on_submissions
+            )
+            etag = HttpCache.etag(row.result_id, result.computed_at, "identity")
+            return HttpCache.encoded_response(body, etag, "identity")
+
+        body, encoding = result.response_body, result.response_encoding
+        if encoding == "gzip" and not accepts_gzip:
+            body, encoding = await run_in_threadpool(gzip.decompress, body), "identity"
+        etag = HttpCache.etag(row.result_id, result.computed_at, encoding)
+        return HttpCache.encoded_response(body, etag, encoding)
+
+    version = (await db.execute(LiveAnalysisService.data_version_query(row.id))).one()
+    etag = HttpCache.etag(analysis_type, variant, row.id, subgroup_id, *version, weak=True)
+    if HttpCache.matches(if_none_match, etag):
+        return HttpCache.not_modified(etag, vary=True)
+
+    # Same gate as the @offloaded routes: computing stays off the event loop
+    live = await analysis_gate.run(
+        (analysis_type, franchise, subgroup),
+        _live_analysis, row.id, subgroup_id, analysis_type, compute,
     )
+    body = await run_in_threadpool(
+        _render_body, analysis_type, render, live.data, live.computed_at, live.based_on_submissions
+    )
+    return HttpCache.encoded_response(body, etag, "identity")
 
-    if not result:
-        data = AnalysisService.compute_controversy(
-            str(franchise_obj.id), str(subgroup_obj.id), db
-        )
-        return ControversyResponse(
-            metadata=AnalysisMetadata(
-                computed_at=datetime.utcnow(),
-                based_on_submissions=len(subgroup_obj.submissions),
-            ),
-            results=data,
-        )
 
-    return ControversyResponse(
-        metadata=AnalysisMetadata(
-            computed_at=result.computed_at,
-            based_on_submissions=result.based_on_submissions,
+@router.get("/analysis/rankings", response_model=CommunityRankResponse)
+async def get_community_rankings(
+    franchise: str,
+    subgroup: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get the community-wide leaderboard for a subgroup"""
+    return await _serve_analysis(
+        db, franchise, subgroup, "COMMUNITY_RANK", if_none_match, accept_encoding,
+        lambda franchise_id, subgroup_id, session: AnalysisService.compute_community_rankings(
+            str(franchise_id), str(subgroup_id), session
         ),
-        results=result.result_data,
     )
 
 
-@router.get("/analysis/takes", response_model=HotTakesResponse)
-async def get_hot_takes(franchise: str, subgroup: str, db: Session = Depends(get_db)):
-    """Identify the biggest glazes and hot takes in a subgroup"""
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
-        raise HTTPException(status_code=404, detail="Franchise not found")
+@router.get(
+    "/analysis/divergence",
+    response_model=Union[DivergenceMatrixResponse, CompactDivergenceResponse],
+)
+async def get_divergence_matrix(
+    franchise: str,
+    subgroup: str,
+    format: Literal["legacy", "compact"] = "legacy",
+    array_encoding: Literal["json", "float16"] = "json",
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get divergence matrix for a subgroup.
+    format=compact returns CompactDivergenceResponse, whose arrays can be
+    packed as float16 with array_encoding=float16."""
+    render = variant = None
+    if format == "compact":
+        variant = f"compact-{array_encoding}"
+        render = lambda data, computed_at, based_on_submissions: AnalysisResponseService.compact_divergence(
+            data, computed_at, based_on_submissions, array_encoding
+        )
 
-    subgroup_obj = (
-        db.query(Subgroup)
-        .filter(Subgroup.name == subgroup, Subgroup.franchise_id == franchise_obj.id)
-        .first()
+    # Divergence matrices are computationally heavy; a missing one is computed live
+    return await _serve_analysis(
+        db, franchise, subgroup, "DIVERGENCE", if_none_match, accept_encoding,
+        lambda franchise_id, subgroup_id, session: AnalysisService.compute_divergence_matrix(
+            str(franchise_id), str(subgroup_id), session
+        ),
+        variant, render,
     )
-    if not subgroup_obj:
-        raise HTTPException(status_code=404, detail="Subgroup not found")
 
-    result = (
-        db.query(AnalysisResult)
-        .filter(
-            AnalysisResult.franchise_id == franchise_obj.id,
-            AnalysisResult.subgroup_id == subgroup_obj.id,
-            AnalysisResult.analysis_type == "TAKES",
-        )
-        .first()
+
+@router.get("/analysis/controversy", response_model=ControversyResponse)
+async def get_controversy(
+    franchise: str,
+    subgroup: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get controversy analysis for a subgroup"""
+    return await _serve_analysis(
+        db, franchise, subgroup, "CONTROVERSY", if_none_match, accept_encoding,
+        lambda franchise_id, subgroup_id, session: AnalysisService.compute_controversy(
+            str(franchise_id), str(subgroup_id), session
+        ),
     )
 
-    if not result:
-        data = AnalysisService.compute_hot_takes(
-            str(franchise_obj.id), str(subgroup_obj.id), db
-        )
-        return HotTakesResponse(
-            metadata=AnalysisMetadata(
-                computed_at=datetime.utcnow(),
-                based_on_submissions=len(subgroup_obj.submissions),
-            ),
-            takes=data,
-        )
 
-    return HotTakesResponse(
-        metadata=AnalysisMetadata(
-            computed_at=result.computed_at,
-            based_on_submissions=result.based_on_submissions,
+@router.get("/analysis/takes", response_model=HotTakesResponse)
+async def get_hot_takes(
+    franchise: str,
+    subgroup: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Identify the biggest glazes and hot takes in a subgroup"""
+    return await _serve_analysis(
+        db, franchise, subgroup, "TAKES", if_none_match, accept_encoding,
+        lambda franchise_id, subgroup_id, session: AnalysisService.compute_hot_takes(
+            str(franchise_id), str(subgroup_id), session
         ),
-        takes=result.result_data,
     )
 
 
 @router.get("/analysis/spice", response_model=SpiceMeterResponse)
-async def get_spice_meter(franchise: str, db: Session = Depends(get_db)):
+async def get_spice_meter(
+    franchise: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
     """Get the Spice Meter ranking for all users in a franchise"""
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
-        raise HTTPException(status_code=404, detail="Franchise not found")
-
-    # Always compute fresh data (no caching for now)
-    data = AnalysisService.compute_spice_meter(str(franchise_obj.id), db)
-    sub_count = (
-        db.query(Submission).filter_by(franchise_id=franchise_obj.id).count()
-    )
-
-    return SpiceMeterResponse(
-        metadata=AnalysisMetadata(
-            computed_at=datetime.utcnow(), based_on_submissions=sub_count
+    # Spice is franchise-wide, so the scheduler stores it without a subgroup
+    return await _serve_analysis(
+        db, franchise, None, "SPICE", if_none_match, accept_encoding,
+        lambda franchise_id, subgroup_id, session: AnalysisService.compute_spice_meter(
+            str(franchise_id), session
         ),
-        results=data,
     )
 
 
+
 # NEW ENDPOINTS FOR ADDITIONAL FEATURES
 
 @router.get("/analysis/disputed")
-async def get_most_disputed(franchise: str, subgroup: str, db: Session = Depends(get_db)):
+@offloaded
+def get_most_disputed(franchise: str, subgroup: str, db: Session = Depends(get_read_db)):
     """Get songs with the largest ranking gaps between users"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
     if not franchise_obj:
@@ -283,8 +332,9 @@ async def get_most_disputed(franchise: str, subgroup: str, db: Session = Depends
 
 
 @router.get("/analysis/consensus")
-async def get_top_bottom_consensus(
-    franchise: str, subgroup: str, limit: int = 10, db: Session = Depends(get_db)
+@offloaded
+def get_top_bottom_consensus(
+    franchise: str, subgroup: str, limit: int = 10, db: Session = Depends(get_read_db)
 ):
     """Get songs universally ranked high or low with strong agreement"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
@@ -314,7 +364,8 @@ async def get_top_bottom_consensus(
 
 
 @router.get("/analysis/outliers")
-async def get_outlier_users(franchise: str, subgroup: str, db: Session = Depends(get_db)):
+@offloaded
+def get_outlier_users(franchise: str, subgroup: str, db: Session = Depends(get_read_db)):
     """Identify users with the most extreme/unique rankings"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
     if not franchise_obj:
@@ -342,7 +393,8 @@ async def get_outlier_users(franchise: str, subgroup: str, db: Session = Depends
 
 
 @router.get("/analysis/comebacks")
-async def get_comeback_songs(franchise: str, subgroup: str, db: Session = Depends(get_db)):
+@offloaded
+def get_comeback_songs(franchise: str, subgroup: str, db: Session = Depends(get_read_db)):
     """Find sleeper/comeback songs with polarized rankings"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
     if not franchise_obj:
@@ -370,7 +422,8 @@ async def get_comeback_songs(franchise: str, subgroup: str, db: Session = Depend
 
 
 @router.get("/analysis/subunits")
-async def get_subunit_popularity(franchise: str, db: Session = Depends(get_db)):
+@offloaded
+def get_subunit_popularity(franchise: str, db: Session = Depends(get_read_db)):
     """Analyze performance of different subunits/groups"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
     if not franchise_obj:
@@ -380,7 +433,11 @@ async def get_subunit_popularity(franchise: str, db: Session = Depends(get_db)):
         str(franchise_obj.id), db
     )
     
-    sub_count = db.query(Submission).filter_by(franchise_id=franchise_obj.id).count()
+    sub_count = db.query(Submission).filter(
+        Submission.franchise_id == franchise_obj.id,
+        Submission.submission_status == SubmissionStatus.VALID,
+        Submission.is_current.is_(True),
+    ).count()
     
     return {
         "metadata": {
@@ -392,20 +449,44 @@ async def get_subunit_popularity(franchise: str, db: Session = Depends(get_db)):
 
 
 @router.post("/analysis/trigger", response_model=TriggerResponse)
-async def trigger_manual_analysis(background_tasks: BackgroundTasks):
+async def trigger_manual_analysis(
+    background_tasks: BackgroundTasks,
+    franchise: Optional[str] = None,
+    subgroup: Optional[str] = None,
+    analysis_type: Optional[str] = None,
+    dirty_only: bool = False,
+):
     """
-    Manually trigger a full recomputation of all statistical metrics.
-    Prevents multiple simultaneous runs.
+    Manually trigger a recomputation of statistical metrics.
+    Without parameters everything is recomputed; franchise/subgroup/
+    analysis_type narrow the scope and dirty_only skips up-to-date scopes.
+    Identical (or narrower) requests already queued are not queued again.
     """
+    if subgroup and not franchise:
+        raise HTTPException(status_code=400, detail="A subgroup scope requires a franchise.")
+    if analysis_type and analysis_type not in ANALYSIS_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown analysis type. Choose from: {', '.join(ANALYSIS_TYPES)}",
+        )
+
     current_jobs = scheduler.get_jobs()
     for job in current_jobs:
-        if job.id == "recompute_all" and job.next_run_time is None:
+        if job.id == "recompute_dirty" and job.next_run_time is None:
             raise HTTPException(
                 status_code=409,
                 detail="Analysis recomputation is already in progress. Please wait.",
             )
 
-    background_tasks.add_task(recompute_all_analyses)
+    scope = AnalysisScope(franchise, subgroup, analysis_type, dirty_only)
+    if not queue_scope(scope):
+        return TriggerResponse(
+            status="already_queued",
+            message="An equivalent recomputation is already queued.",
+            timestamp=datetime.utcnow(),
+        )
+
+    background_tasks.add_task(run_scope, scope)
 
     return TriggerResponse(
         status="accepted",
@@ -415,32 +496,30 @@ async def trigger_manual_analysis(background_tasks: BackgroundTasks):
 
 
 @router.get("/subgroups", response_model=list[SubgroupResponse])
-async def get_franchise_subgroups(franchise: str, db: Session = Depends(get_db)):
+async def get_franchise_subgroups(franchise: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get all subgroup definitions for a franchise, 
     including resolved song name lists.
     """
     # 1. Validate Franchise
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
+    franchise_obj = (await db.execute(select(Franchise).filter_by(name=franchise))).scalars().first()
     if not franchise_obj:
         raise HTTPException(status_code=404, detail="Franchise not found")
 
     # 2. Fetch all subgroups belonging to this franchise
     subgroups = (
-        db.query(Subgroup)
-        .filter(Subgroup.franchise_id == franchise_obj.id)
-        .all()
-    )
+        await db.execute(select(Subgroup).filter(Subgroup.franchise_id == franchise_obj.id))
+    ).scalars().all()
+
+    # 3. Resolve song names for every subgroup in one round trip
+    song_names_by_id = {
+        str(song.id): song.name
+        for song in await db.execute(select(Song.id, Song.name).filter(Song.franchise_id == franchise_obj.id))
+    }
 
-    # 3. Transform and Resolve Song Names
     results = []
     for sg in subgroups:
-        # Resolve names for IDs stored in the JSON list
-        song_names = []
-        if sg.song_ids:
-            from uuid import UUID
-            songs = db.query(Song.name).filter(Song.id.in_([UUID(sid) for sid in sg.song_ids])).all()
-            song_names = [s.name for s in songs]
+        song_names = [song_names_by_id[sid] for sid in sg.song_ids or [] if sid in song_names_by_id]
 
         results.append(SubgroupResponse(
             id=sg.id,
@@ -456,12 +535,13 @@ async def get_franchise_subgroups(franchise: str, db: Session = Depends(get_db))
 
 
 @router.get("/analysis/head-to-head")
-async def get_head_to_head(
+@offloaded
+def get_head_to_head(
     franchise: str,
     subgroup: str,
     user_a: str,
     user_b: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Compare two users' rankings directly"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
@@ -486,41 +566,63 @@ async def get_head_to_head(
     return result
 
 
+def _user_match_query(franchise: str, subgroup: str, user: str):
+    """Franchise id, subgroup id and the user's indexed neighbors in one round trip."""
+    return (
+        select(Franchise.id, Subgroup.id.label("subgroup_id"), UserNeighbors.soulmates, UserNeighbors.nemeses)
+        .outerjoin(Subgroup, and_(Subgroup.franchise_id == Franchise.id, Subgroup.name == subgroup))
+        .outerjoin(UserNeighbors, and_(
+            UserNeighbors.franchise_id == Franchise.id,
+            UserNeighbors.subgroup_id == Subgroup.id,
+            UserNeighbors.username == user,
+        ))
+        .filter(Franchise.name == franchise)
+    )
+
+
+def _live_user_match(franchise_id, subgroup_id, user: str) -> dict:
+    """Threadpool half of get_user_matches: the user's divergence row only."""
+    db = database.get_read_session()
+    try:
+        return ControversyIndexService.compute_user_match(str(franchise_id), str(subgroup_id), user, db)
+    finally:
+        db.close()
+
+
 @router.get("/analysis/user-match")
 async def get_user_matches(
     franchise: str,
     subgroup: str,
     user: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Find soulmates and nemeses for a user"""
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
+    row = (await db.execute(_user_match_query(franchise, subgroup, user))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Franchise not found")
-        
-    subgroup_obj = (
-        db.query(Subgroup)
-        .filter(Subgroup.name == subgroup, Subgroup.franchise_id == franchise_obj.id)
-        .first()
-    )
-    if not subgroup_obj:
+    if not row.subgroup_id:
         raise HTTPException(status_code=404, detail="Subgroup not found")
 
-    result = ControversyIndexService.compute_user_match(
-        str(franchise_obj.id), str(subgroup_obj.id), user, db
+    if row.soulmates is not None:
+        return {"soulmates": row.soulmates, "nemeses": row.nemeses}
+
+    # Not indexed (no stored matrix yet, or a user newer than it)
+    result = await analysis_gate.run(
+        ("USER_MATCH", franchise, subgroup, user),
+        _live_user_match, row.id, row.subgroup_id, user,
     )
-    
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
-        
+
     return result
 
 
 @router.get("/analysis/conformity")
-async def get_conformity_scores(
+@offloaded
+def get_conformity_scores(
     franchise: str,
     subgroup: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Identify Normies and Hipsters based on consensus deviation"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
@@ -535,10 +637,11 @@ async def get_conformity_scores(
 
 
 @router.get("/analysis/oshi-bias")
-async def get_oshi_bias(
+@offloaded
+def get_oshi_bias(
     franchise: str,
     user: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Calculate member bias for a user"""
     franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
@@ -2,8 +2,8 @@
 
 from fastapi import APIRouter, Depends
 from datetime import datetime
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import database  # Module import
 from app.models import Franchise, Song, Subgroup, Submission
 from app.schemas import HealthResponse
@@ -21,29 +21,29 @@ async def health_check():
     )
 
 @router.get("/health/database")
-async def database_diagnostics(db: Session = Depends(database.get_db)):
+async def database_diagnostics(db: AsyncSession = Depends(database.get_async_read_db)):
     """Detailed database diagnostics"""
     
-    franchise_count = db.query(func.count(Franchise.id)).scalar()
-    song_count = db.query(func.count(Song.id)).scalar()
-    subgroup_count = db.query(func.count(Subgroup.id)).scalar()
-    submission_count = db.query(func.count(Submission.id)).scalar()
+    franchise_count = await db.scalar(select(func.count(Franchise.id)))
+    song_count = await db.scalar(select(func.count(Song.id)))
+    subgroup_count = await db.scalar(select(func.count(Subgroup.id)))
+    submission_count = await db.scalar(select(func.count(Submission.id)))
     
     # Get Liella-specific counts
-    liella = db.query(Franchise).filter_by(name="liella").first()
+    liella = (await db.execute(select(Franchise).filter_by(name="liella"))).scalars().first()
     liella_songs = 0
     liella_subgroups = 0
     
     if liella:
-        liella_songs = db.query(func.count(Song.id)).filter(
-            Song.franchise_id == liella.id
-        ).scalar()
-        liella_subgroups = db.query(func.count(Subgroup.id)).filter(
-            Subgroup.franchise_id == liella.id
-        ).scalar()
+        liella_songs = await db.scalar(
+            select(func.count(Song.id)).filter(Song.franchise_id == liella.id)
+        )
+        liella_subgroups = await db.scalar(
+            select(func.count(Subgroup.id)).filter(Subgroup.franchise_id == liella.id)
+        )
     
     # Get all subgroup details
-    subgroups = db.query(Subgroup).all()
+    subgroups = (await db.execute(select(Subgroup))).scalars().all()
     subgroup_details = [
         {
             "name": sg.name,
@@ -78,14 +78,14 @@ async def database_diagnostics(db: Session = Depends(database.get_db)):
     }
 
 @router.get("/health/songs")
-async def list_all_songs(db: Session = Depends(database.get_db)):
+async def list_all_songs(db: AsyncSession = Depends(database.get_async_read_db)):
     """List all Liella songs for verification"""
     
-    songs = db.query(Song).filter(
-        Song.franchise_id == (
-            db.query(Franchise.id).filter_by(name="liella").subquery()
-        )
-    ).order_by(Song.name).all()
+    songs = (await db.execute(
+        select(Song).filter(
+            Song.franchise_id == select(Franchise.id).filter_by(name="liella").scalar_subquery()
+        ).order_by(Song.name)
+    )).scalars().all()
     
     return {
         "total_count": len(songs),
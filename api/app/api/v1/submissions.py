@@ -1,21 +1,36 @@
 # app/api/v1/submissions.py
 
 import logging
+from typing import Iterable, Iterator, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.config import settings
 from app.database import get_db
-from app.models import Franchise, Subgroup, Submission, SubmissionStatus
+from app.jobs.analysis_scheduler import (AnalysisScope, apply_incremental_update, mark_dirty,
+                                         queue_scope, run_scope)
+from app.models import Franchise, Subgroup, SubgroupAggregate, Submission, SubmissionStatus, UserNeighbors
 from app.schemas import SubmissionResponse, SubmitRankingRequest, DeleteSubmissionsResponse
+from app.services.bulk_submissions import BulkSubmissionIngest
+from app.services.current_submissions import CurrentSubmissionService
+from app.services.divergence_rows import DivergenceRowService
 from app.services.matching import StrictSongMatcher
+from app.services.normalized_rankings import NormalizedRankingService
+from app.services.packed_rankings import PackedRankingService
 from app.services.tie_handling import TieHandlingService
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1", tags=["submissions"])
 
 @router.post("/submit", response_model=SubmissionResponse)
-async def submit_ranking(request: SubmitRankingRequest, db: Session = Depends(get_db)):
+async def submit_ranking(
+    request: SubmitRankingRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     # 1. Fetch dependencies
     franchise = db.query(Franchise).filter_by(name=request.franchise).first()
     if not franchise:
@@ -65,15 +80,89 @@ async def submit_ranking(request: SubmitRankingRequest, db: Session = Depends(ge
 
     submission.parsed_rankings = final_ranks
     submission.submission_status = SubmissionStatus.VALID
+    PackedRankingService.pack_submission(db, submission)
     db.add(submission)
+    # Replaces the user's previous ranking of this subgroup in analyses
+    replaced = CurrentSubmissionService.supersede(db, [submission])
+
+    subgroups = db.query(Subgroup).filter(Subgroup.franchise_id == franchise.id).all()
+    NormalizedRankingService.index_submission(db, submission, subgroups)
+
+    # Flag every subgroup this ranking touches for the next scoped recompute;
+    # a replaced ranking may have touched any of them
+    touched = [
+        sg.id
+        for sg in subgroups
+        if sg.song_ids and (replaced or not final_ranks.keys().isdisjoint(sg.song_ids))
+    ]
+    mark_dirty(db, franchise.id, touched)
     db.commit()
 
+    # 6. Refresh stored analyses after the response is sent
+    if settings.incremental_analysis_enabled:
+        background_tasks.add_task(apply_incremental_update, submission.id)
+
     return SubmissionResponse(
         submission_id=submission.id,
         status="VALID",
         parsed_count=len(final_ranks),
     )
 
+def _ndjson_lines(body: bytes) -> Iterator[Tuple[int, str]]:
+    """(line_num, text) for every non-blank line of an NDJSON body."""
+    for line_num, line in enumerate(body.split(b"\n"), start=1):
+        if line.strip():
+            yield line_num, line.decode("utf-8", errors="replace")
+
+
+def _recompute_franchises(franchises: Iterable[str]):
+    """
+    One dirty-scoped recompute per franchise a bulk request touched, in
+    place of an incremental update per stored ranking. The ingest already
+    flagged every subgroup its rankings touched.
+    """
+    for name in sorted(franchises):
+        scope = AnalysisScope(franchise=name, dirty_only=True)
+        if queue_scope(scope):
+            run_scope(scope)
+
+
+@router.post("/submit/bulk")
+async def submit_rankings_bulk(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk version of /submit. The body is NDJSON, one SubmitRankingRequest
+    per line; lines are stored in batches of bulk_submit_batch_size, one
+    transaction each. The response streams one BulkSubmissionResult per
+    non-blank line as NDJSON, in input order, as each batch commits.
+    Malformed lines get status "ERROR" without affecting the others.
+    """
+    # Read up front: StreamingResponse listens for disconnects on the same
+    # channel, so the body can't be consumed from inside the stream
+    body = await request.body()
+    ingest = BulkSubmissionIngest(db)
+    if settings.incremental_analysis_enabled:
+        # Runs after the stream ends, once every batch has filled franchises
+        background_tasks.add_task(_recompute_franchises, ingest.franchises)
+
+    async def results():
+        batch = []
+        for entry in _ndjson_lines(body):
+            batch.append(entry)
+            if len(batch) >= settings.bulk_submit_batch_size:
+                for result in await run_in_threadpool(ingest.process, batch):
+                    yield result.model_dump_json() + "\n"
+                batch = []
+        if batch:
+            for result in await run_in_threadpool(ingest.process, batch):
+                yield result.model_dump_json() + "\n"
+        logger.info(f"Bulk submit stored {len(ingest.accepted_ids)} valid rankings")
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @router.delete("/submissions/{username}", response_model=DeleteSubmissionsResponse)
 async def delete_user_submissions(
     username: str, 
@@ -103,7 +192,25 @@ async def delete_user_submissions(
             message=f"No submissions found for user '{username}'."
         )
 
+    NormalizedRankingService.remove_submissions(db, [row.id for row in query.with_entities(Submission.id).all()])
     query.delete(synchronize_session=False)
+    # Running aggregates can't subtract a user; drop them so the next
+    # incremental update reseeds from the remaining submissions
+    db.query(SubgroupAggregate).filter(
+        SubgroupAggregate.franchise_id == franchise_obj.id
+    ).delete(synchronize_session=False)
+    # Incremental updates must not fold their divergence rows back in
+    DivergenceRowService.remove_user(db, franchise_obj.id, username)
+    # Other users' neighbor lists may name them; user-match computes live
+    # rows until the recompute rebuilds the index
+    db.query(UserNeighbors).filter(
+        UserNeighbors.franchise_id == franchise_obj.id
+    ).delete(synchronize_session=False)
+    mark_dirty(
+        db,
+        franchise_obj.id,
+        [row.id for row in db.query(Subgroup.id).filter(Subgroup.franchise_id == franchise_obj.id).all()]
+    )
     db.commit()
 
     logger.info(f"Deleted {count} submissions for user '{username}' in {franchise}")
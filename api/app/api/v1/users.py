@@ -1,74 +1,211 @@
 # app/api/v1/users.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Franchise, Submission, Song, SubmissionStatus
-from typing import List, Dict
+import base64
+import json
+import sys
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.database import get_async_read_db
+from app.models import Franchise, Subgroup, Submission, Song, SubmissionStatus
+from app.services.live_analysis import LiveAnalysisService
+from app.services.ranking_utils import RelativeRankingService
+from app.utils.http_cache import HttpCache
+from typing import List, Dict, Optional, Tuple
 
 router = APIRouter(prefix="/api/v1", tags=["users"])
 
+# Largest page of users /users/rankings returns
+MAX_PAGE_SIZE = 500
+USER_FIELDS = ("username", "submission_date", "total_songs", "rankings")
+
+
+def _encode_cursor(username: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps(username).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        username = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        username = None
+    if not isinstance(username, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return username
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """The smallest string above every string starting with `prefix`, or None
+    when there is none (the prefix is all U+10FFFF)"""
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return None
+    code_point = ord(stem[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        # Surrogates can't be encoded; UTF-8 byte order skips them too
+        code_point = 0xE000
+    return stem[:-1] + chr(code_point)
+
+
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return USER_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(USER_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))} (allowed: {', '.join(USER_FIELDS)})",
+        )
+    # "username" is always sent, it identifies the entry
+    return tuple(name for name in USER_FIELDS if name in requested or name == "username")
+
+
+def _user_page_query(franchise_id, limit: Optional[int] = None, after: Optional[str] = None,
+                     username_prefix: Optional[str] = None):
+    """
+    Current VALID submissions of a franchise, by username and oldest first
+    per user. With `limit`, only those of the first `limit` usernames after
+    `after`: a user has a current row per subgroup, so pages are keyed on
+    the username and all of a user's rows land on the same page. The
+    username page and the row lookup both follow
+    ix_submissions_franchise_current_user_id, so a page is index range scans.
+    """
+    current = [
+        Submission.franchise_id == franchise_id,
+        Submission.submission_status == SubmissionStatus.VALID,
+        Submission.is_current.is_(True),
+    ]
+    if username_prefix:
+        # A range rather than LIKE, which SQLite can't serve from the index
+        current.append(Submission.username >= username_prefix)
+        upper = _prefix_upper_bound(username_prefix)
+        if upper is not None:
+            current.append(Submission.username < upper)
+
+    stmt = select(
+        Submission.username, Submission.subgroup_id, Submission.created_at, Submission.parsed_rankings
+    ).filter(*current)
+    if limit is not None:
+        usernames = select(Submission.username).filter(*current)
+        if after is not None:
+            usernames = usernames.filter(Submission.username > after)
+        usernames = usernames.group_by(Submission.username).order_by(Submission.username).limit(limit)
+        stmt = stmt.filter(Submission.username.in_(usernames.scalar_subquery()))
+    return stmt.order_by(Submission.username, Submission.created_at, Submission.id)
+
 
 @router.get("/users/rankings")
-async def get_user_rankings(franchise: str, subgroup: str, db: Session = Depends(get_db)):
-    """Get all individual user rankings for a franchise/subgroup"""
-    
-    # Look up franchise
-    franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-    if not franchise_obj:
+async def get_user_rankings(
+    franchise: str,
+    subgroup: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    username_prefix: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Get individual user rankings for a franchise/subgroup.
+
+    Each user appears once, with the ranking the analyses count for the
+    subgroup (see RelativeRankingService.pick_effective). Its list holds
+    the ranked songs of the subgroup with their franchise-wide `rank` and
+    the 1..N `relative_rank` within the subgroup; users who ranked none of
+    them are left out. Without `limit` every user
+    is returned, sorted case-insensitively. With it, users come in
+    case-sensitive username order and `next_cursor` fetches the next page,
+    which may hold fewer than `limit` users. `username_prefix` filters by
+    case-sensitive prefix; `fields` is a comma-separated subset of
+    username, submission_date, total_songs and rankings."""
+    user_fields = _parse_fields(fields)
+    after = _decode_cursor(cursor) if cursor else None
+
+    # Look up franchise and subgroup
+    row = (
+        await db.execute(
+            select(Franchise.id, Subgroup.id.label("subgroup_id"), Subgroup.song_ids)
+            .outerjoin(Subgroup, and_(Subgroup.franchise_id == Franchise.id, Subgroup.name == subgroup))
+            .filter(Franchise.name == franchise)
+        )
+    ).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Franchise not found")
-    
-    # Get all valid submissions for this franchise
-    submissions = (
-        db.query(Submission)
-        .filter(
-            Submission.franchise_id == franchise_obj.id,
-            Submission.submission_status == SubmissionStatus.VALID,
+    if not row.subgroup_id:
+        raise HTTPException(status_code=404, detail="Subgroup not found")
+    song_ids = row.song_ids or []
+
+    # Rendered live from current submissions, so versioned by the franchise's data
+    version = (await db.execute(LiveAnalysisService.data_version_query(row.id))).one()
+    etag = HttpCache.etag(
+        "users", row.id, subgroup, *song_ids, limit, cursor, username_prefix, user_fields, *version, weak=True
+    )
+    if HttpCache.matches(if_none_match, etag):
+        return HttpCache.not_modified(etag)
+
+    submissions = (await db.execute(_user_page_query(row.id, limit, after, username_prefix))).all()
+    next_cursor = None
+    if limit is not None and len({sub.username for sub in submissions}) == limit:
+        next_cursor = _encode_cursor(submissions[-1].username)
+
+    # Get song ID to name mapping for the subgroup
+    song_name_map = {}
+    if song_ids and "rankings" in user_fields:
+        songs = await db.execute(
+            select(Song.id, Song.name).filter(Song.id.in_([UUID(sid) for sid in song_ids]))
         )
-        .all()
+        song_name_map = {str(s.id): s.name for s in songs}
+
+    # Building and encoding every user's list is CPU work; keep it off the event loop
+    return await run_in_threadpool(
+        _render_user_rankings, franchise, subgroup, row.subgroup_id, song_ids, submissions, song_name_map,
+        user_fields, limit is None, next_cursor, etag,
     )
-    
-    # Get song ID to name mapping
-    all_song_ids = set()
+
+
+def _render_user_rankings(franchise: str, subgroup: str, subgroup_id: UUID, song_ids: List[str], submissions,
+                          song_name_map: Dict[str, str], user_fields: Tuple[str, ...],
+                          sort_by_name: bool, next_cursor: Optional[str], etag: str) -> JSONResponse:
+    entries = []
     for sub in submissions:
-        if sub.parsed_rankings:
-            all_song_ids.update(sub.parsed_rankings.keys())
-    
-    from uuid import UUID
-    if all_song_ids:
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in all_song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
-    else:
-        song_name_map = {}
-    
+        # Ranks within the subgroup; also drops songs outside it
+        relative = RelativeRankingService.relativize(sub.parsed_rankings or {}, song_ids)
+        if relative:
+            entries.append((sub.username, sub.subgroup_id == subgroup_id, (sub, relative)))
+
     # Build response
     result = []
-    for sub in submissions:
-        if not sub.parsed_rankings:
-            continue
-            
-        # Convert to song names and rankings
-        rankings = []
-        for song_id, rank in sorted(sub.parsed_rankings.items(), key=lambda x: x[1]):
-            song_name = song_name_map.get(song_id, "Unknown")
-            rankings.append({
-                "song_name": song_name,
-                "rank": rank
-            })
-        
-        result.append({
-            "username": sub.username,
-            "submission_date": sub.created_at,
-            "total_songs": len(rankings),
-            "rankings": rankings
-        })
-    
-    # Sort by username
-    result.sort(key=lambda x: x["username"].lower())
-    
-    return {
+    for sub, relative in RelativeRankingService.pick_effective(entries):
+        user = {"username": sub.username}
+        if "submission_date" in user_fields:
+            user["submission_date"] = sub.created_at
+        if "total_songs" in user_fields:
+            user["total_songs"] = len(relative)
+        if "rankings" in user_fields:
+            # Convert to song names and rankings
+            user["rankings"] = [
+                {
+                    "song_name": song_name_map.get(song_id, "Unknown"),
+                    "rank": sub.parsed_rankings[song_id],
+                    "relative_rank": relative_rank,
+                }
+                for song_id, relative_rank in sorted(relative.items(), key=lambda x: x[1])
+            ]
+        result.append(user)
+
+    # Sort by username (pages keep the index order the cursor relies on)
+    if sort_by_name:
+        result.sort(key=lambda x: x["username"].lower())
+
+    return JSONResponse(jsonable_encoder({
         "franchise": franchise,
         "subgroup": subgroup,
         "total_users": len(result),
-        "users": result
-    }
+        "users": result,
+        "next_cursor": next_cursor,
+    }), headers=HttpCache.headers(etag))
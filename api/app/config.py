@@ -2,6 +2,7 @@
 
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -10,15 +11,46 @@ class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./rankings.db"
     database_echo: bool = False
+    # Connection pool (in-memory SQLite keeps its single shared connection)
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_pre_ping: bool = True  # server databases only
+    database_pool_recycle: int = 3600
+    # Read-only pool for analysis GET routes, e.g. a replica; defaults to database_url
+    database_reader_url: Optional[str] = None
+    # SQLite PRAGMAs applied to every new connection. WAL lets readers run
+    # while the scheduler writes; negative cache_size is in KiB
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size: int = -65536
 
     # API
     api_title: str = "Liella Rankings API"
     api_version: str = "v1"
+    # Live analysis computations allowed to run at once per worker process
+    analysis_max_concurrency: int = 4
+    # Cache-Control max-age of analysis GETs; clients revalidate with their ETag after it
+    http_cache_max_age: int = 0
+    # gzip level of the response bodies stored with analysis results; 0 stores them uncompressed
+    stored_response_gzip_level: int = 6
+    # Rendered variants of stored analyses (compact divergence) kept per worker process, by ETag
+    rendered_response_cache_size: int = 32
 
     # Scheduler
     analysis_scheduler_enabled: bool = True
     analysis_schedule_hour: int = 0
     analysis_schedule_minute: int = 0
+    # Fold each VALID submission into stored analyses right after it is saved
+    incremental_analysis_enabled: bool = True
+    # Worker processes for recompute_analyses; 0 computes in the scheduler thread
+    analysis_parallel_workers: int = 0
+    # Maintain the submission_rankings table and aggregate community stats in SQL
+    normalized_rankings_enabled: bool = False
+    # NDJSON lines per transaction in POST /submit/bulk
+    bulk_submit_batch_size: int = 100
+    # Users per transaction in RankingsImporter.bulk_import_from_csv
+    import_chunk_size: int = 1000
 
     # Paths
     config_dir: Path = Path(__file__).parent / "seeds"
@@ -1,8 +1,12 @@
 # app/database.py
 
 import logging
-from sqlalchemy import create_engine, event, text
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.exc import (
     OperationalError,
     IntegrityError,
@@ -16,33 +20,122 @@ logger = logging.getLogger(__name__)
 
 engine = None
 SessionLocal = None
+reader_engine = None
+ReadSessionLocal = None
+# Async driver on the reader URL, for the lightweight read routes
+async_reader_engine = None
+AsyncReadSessionLocal = None
+
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Columns added after their table was first released. create_all() never
+# alters an existing table, so migrate_schema() adds them in place (and
+# creates any declared index that an older database is missing).
+ADDED_COLUMNS = {
+    "songs": ["song_index"],
+    "submissions": ["packed_rankings", "is_current"],
+    "analysis_results": ["response_body", "response_encoding"],
+}
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, read_only: bool):
+    cursor = dbapi_connection.cursor()
+    try:
+        if not read_only:
+            # Persistent in the database file; readers inherit it
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _create_engine(database_url: str, read_only: bool = False, use_async: bool = False):
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if use_async:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    connect_args = {}
+    if backend == "postgresql":
+        connect_args = {"timeout": 10} if use_async else {"connect_timeout": 10}
+    elif backend == "sqlite" and not use_async:
+        connect_args = {"check_same_thread": False}
+
+    # One shared connection: every thread must see the same in-memory database
+    pool_args = {"poolclass": StaticPool}
+    if not _is_memory_sqlite(url):
+        pool_args = {
+            "pool_size": settings.database_pool_size,
+            "max_overflow": settings.database_max_overflow,
+            "pool_recycle": settings.database_pool_recycle,  # Recycle connections periodically
+        }
+
+    new_engine = (create_async_engine if use_async else create_engine)(
+        url,
+        echo=settings.database_echo,
+        connect_args=connect_args,
+        # Verify connections before using; a SQLite file connection can't go stale
+        pool_pre_ping=settings.database_pool_pre_ping and backend != "sqlite",
+        **pool_args,
+    )
+    # Connect events fire on the sync core of an async engine
+    sync_engine = new_engine.sync_engine if use_async else new_engine
+
+    if backend == "sqlite":
+        @event.listens_for(sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, read_only)
+    elif backend == "postgresql" and read_only:
+        @event.listens_for(sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            cursor.close()
+
+    return new_engine
+
 
 def init_engine():
-    """Initializes the SQLAlchemy engine with connection pooling.
-    pool_pre_ping=True verifies connections before each query to
-    prevent 'Server has gone away' errors during idle periods."""
-    global engine, SessionLocal
+    """Initializes the SQLAlchemy engines with connection pooling.
+    `engine` takes all writes; `reader_engine` is a read-only pool for
+    analysis GET routes, so with SQLite in WAL mode those reads never wait
+    on the scheduler's long write transactions. In-memory SQLite has a
+    single database per connection pool, so both names share one engine
+    and there is no `async_reader_engine`; get_async_read_db then runs the
+    sync reader in the threadpool."""
+    global engine, SessionLocal, reader_engine, ReadSessionLocal
+    global async_reader_engine, AsyncReadSessionLocal
     
     try:
-        connect_args = {}
-        if settings.database_url.startswith("postgresql"):
-            connect_args = {"connect_timeout": 10}
-        elif settings.database_url.startswith("sqlite"):
-            connect_args = {"check_same_thread": False}
-
-        engine = create_engine(
-            settings.database_url,
-            echo=settings.database_echo,
-            connect_args=connect_args,
-            pool_pre_ping=True,  # Verify connections before using
-            pool_recycle=3600    # Recycle connections every hour
-        )
+        engine = _create_engine(settings.database_url)
         
         # Test connection
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         
+        reader_url = settings.database_reader_url or settings.database_url
+        if _is_memory_sqlite(make_url(reader_url)):
+            reader_engine = engine
+        else:
+            reader_engine = _create_engine(reader_url, read_only=True)
+            async_reader_engine = _create_engine(reader_url, read_only=True, use_async=True)
+            AsyncReadSessionLocal = async_sessionmaker(
+                async_reader_engine, autoflush=False, expire_on_commit=False
+            )
+
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reader_engine)
         logger.info("✓ Database engine initialized successfully")
         return True
     
@@ -55,14 +148,8 @@ def init_engine():
         raise DatabaseException(f"Database initialization failed: {str(e)}")
 
 
-def get_db() -> Session:
-    """FastAPI Dependency that yields a database session.
-    Automatically closes the connection after the request finishes,
-    performing a rollback if an unhandled exception occurs."""
-    if SessionLocal is None:
-        raise DatabaseException("Database not initialized. Call init_engine() first.")
-    
-    db = SessionLocal()
+def _yield_session(session_factory) -> Session:
+    db = session_factory()
     try:
         yield db
     except SQLAlchemyError as e:
@@ -77,6 +164,87 @@ def get_db() -> Session:
         db.close()
 
 
+def get_db() -> Session:
+    """FastAPI Dependency that yields a database session.
+    Automatically closes the connection after the request finishes,
+    performing a rollback if an unhandled exception occurs."""
+    if SessionLocal is None:
+        raise DatabaseException("Database not initialized. Call init_engine() first.")
+    
+    yield from _yield_session(SessionLocal)
+
+
+def get_read_db() -> Session:
+    """Like get_db, but from the read-only pool. Writes raise; routes
+    that store results must use get_session() for them."""
+    if SessionLocal is None:
+        raise DatabaseException("Database not initialized. Call init_engine() first.")
+
+    yield from _yield_session(ReadSessionLocal or SessionLocal)
+
+
+class ThreadedReadSession:
+    """
+    Stands in for an AsyncSession when there is no async engine (in-memory
+    SQLite): each call runs on a sync read session in the threadpool.
+    Results are buffered there, so the event loop can read them.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def execute(self, statement, *args, **kwargs):
+        return await run_in_threadpool(
+            lambda: self.session.execute(statement, *args, **kwargs).freeze()()
+        )
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.session.scalar, statement, *args, **kwargs)
+
+    async def rollback(self):
+        await run_in_threadpool(self.session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.session.close)
+
+
+async def get_async_read_db() -> AsyncSession:
+    """Async counterpart of get_read_db: DB round trips are awaited instead
+    of blocking the event loop. For light queries only; heavy analysis
+    stays on the threadpool with a sync session. Without an async engine
+    the session is a ThreadedReadSession."""
+    if SessionLocal is None:
+        raise DatabaseException("Database not initialized. Call init_engine() first.")
+
+    if AsyncReadSessionLocal is None:
+        db = ThreadedReadSession((ReadSessionLocal or SessionLocal)())
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database operation failed: {str(e)}")
+            await db.rollback()
+            raise DatabaseException(f"Database error: {str(e)}")
+        finally:
+            await db.close()
+        return
+
+    async with AsyncReadSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database operation failed: {str(e)}")
+            await db.rollback()
+            raise DatabaseException(f"Database error: {str(e)}")
+
+
+async def dispose_engines():
+    """Closes every pool; call on shutdown."""
+    if async_reader_engine is not None:
+        await async_reader_engine.dispose()
+    for pool_engine in {engine, reader_engine} - {None}:
+        pool_engine.dispose()
+
+
 def init_db():
     """Create all tables with error handling"""
     if engine is None:
@@ -85,6 +253,7 @@ def init_db():
     try:
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        migrate_schema()
         logger.info("✓ Database tables created/verified")
         return True
     
@@ -93,11 +262,39 @@ def init_db():
         raise DatabaseException(f"Table creation failed: {str(e)}")
 
 
+def migrate_schema():
+    """Adds missing ADDED_COLUMNS and declared indexes to existing tables."""
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table_name, column_names in ADDED_COLUMNS.items():
+            table = Base.metadata.tables[table_name]
+            existing = {col["name"] for col in inspector.get_columns(table_name)}
+
+            for column_name in column_names:
+                if column_name in existing:
+                    continue
+                col_type = table.c[column_name].type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {col_type}"))
+                logger.info(f"✓ Added column {table_name}.{column_name}")
+
+        for table in Base.metadata.sorted_tables:
+            existing_indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info(f"✓ Created index {index.name}")
+
+
 async def check_db_health() -> str:
     """Check database connectivity"""
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        if async_reader_engine is not None:
+            async with async_reader_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        else:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
         return "healthy"
     except OperationalError:
         return "unhealthy: connection refused"
@@ -109,4 +306,11 @@ def get_session():
     """Helper function to get a session (non-dependency context)"""
     if SessionLocal is None:
         raise DatabaseException("Database not initialized")
-    return SessionLocal()
\ No newline at end of file
+    return SessionLocal()
+
+
+def get_read_session():
+    """get_session from the read-only pool"""
+    if SessionLocal is None:
+        raise DatabaseException("Database not initialized")
+    return (ReadSessionLocal or SessionLocal)()
\ No newline at end of file
@@ -1,46 +1,114 @@
 # app/jobs/analysis_scheduler.py
 
 import logging
+import multiprocessing
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import NamedTuple, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 from app.config import settings
 from app import database
-from app.models import AnalysisResult, Franchise, Subgroup, Submission, SubmissionStatus
+from app.models import (AnalysisDirtyFlag, AnalysisResult, Franchise, Song,
+                        Subgroup, SubgroupAggregate, Submission,
+                        SubmissionStatus)
 from app.services.analysis import AnalysisService
+from app.services.analysis_responses import AnalysisResponseService
+from app.services.divergence_rows import DivergenceRowService
+from app.services.incremental import IncrementalAnalysisService
+from app.services.neighbors import NeighborIndexService
+from app.services.ranking_utils import RelativeRankingService
+from app.services.snapshot import RankingSnapshot
 
 logger = logging.getLogger(__name__)
 scheduler = BackgroundScheduler()
 
+# Serializes read-modify-write of aggregates within this process
+_incremental_lock = threading.Lock()
+
+# (franchise_id, subgroup_id) whose divergence rows changed since their
+# DIVERGENCE result was written, and those a thread is rewriting now
+_stale_divergence = set()
+_refreshing_divergence = set()
+_refresh_lock = threading.Lock()
+
 def update_analysis_record(db: Session, franchise_id, subgroup_id, analysis_type, data, sub_count):
-    """Safely updates or creates an analysis result record (Upsert logic)."""
+    """Safely updates or creates an analysis result record (Upsert logic).
+    Also stores the encoded GET response for the new data."""
     existing = db.query(AnalysisResult).filter(
         AnalysisResult.franchise_id == franchise_id,
         AnalysisResult.subgroup_id == subgroup_id,
         AnalysisResult.analysis_type == analysis_type
     ).first()
 
+    computed_at = datetime.utcnow()
+    body, encoding = AnalysisResponseService.encode(analysis_type, data, computed_at, sub_count)
+
     if existing:
         existing.result_data = data
-        existing.computed_at = datetime.utcnow()
+        existing.computed_at = computed_at
         existing.based_on_submissions = sub_count
+        existing.response_body = body
+        existing.response_encoding = encoding
+        return existing
     else:
         new_result = AnalysisResult(
             franchise_id=franchise_id,
             subgroup_id=subgroup_id,
             analysis_type=analysis_type,
             result_data=data,
-            computed_at=datetime.utcnow(),
-            based_on_submissions=sub_count
+            computed_at=computed_at,
+            based_on_submissions=sub_count,
+            response_body=body,
+            response_encoding=encoding,
         )
         db.add(new_result)
+        return new_result
 
-def recompute_all_analyses():
-    """Iterates through data and recomputes all metrics."""
-    logger.info("Starting background analysis recomputation job...")
+def index_divergence(db: Session, record: AnalysisResult):
+    """Rebuilds the per-user rows and neighbour index of a freshly computed DIVERGENCE result."""
+    DivergenceRowService.rebuild(
+        db, record.franchise_id, record.subgroup_id, record.result_data, record.computed_at
+    )
+    NeighborIndexService.rebuild(db, record.franchise_id, record.subgroup_id, record.result_data["matrix"])
+
+def update_aggregate_record(db: Session, franchise_id, subgroup_id, song_stats, sub_count):
+    """Upserts the running per-song aggregates for a subgroup."""
+    existing = db.query(SubgroupAggregate).filter(
+        SubgroupAggregate.franchise_id == franchise_id,
+        SubgroupAggregate.subgroup_id == subgroup_id
+    ).first()
+
+    if existing:
+        existing.song_stats = song_stats
+        flag_modified(existing, "song_stats")
+        existing.submission_count = sub_count
+        existing.updated_at = datetime.utcnow()
+        return existing
 
+    aggregate = SubgroupAggregate(
+        franchise_id=franchise_id,
+        subgroup_id=subgroup_id,
+        song_stats=song_stats,
+        submission_count=sub_count,
+        updated_at=datetime.utcnow()
+    )
+    db.add(aggregate)
+    return aggregate
+
+def apply_incremental_update(submission_id):
+    """
+    Folds one newly accepted submission into COMMUNITY_RANK, CONTROVERSY
+    and DIVERGENCE for every subgroup it touches. Per subgroup that is
+    O(S) for the aggregates and O(U·S) for the user's divergence row; the
+    stored matrix is then rewritten by refresh_divergence.
+    """
     try:
         db = database.get_session()
     except Exception as e:
@@ -48,64 +116,445 @@ def recompute_all_analyses():
         return
 
     try:
-        franchises = db.query(Franchise).all()
+        submission = db.query(Submission).filter_by(id=submission_id).first()
+        # A resubmission that was itself replaced has nothing to add
+        if not submission or submission.submission_status != SubmissionStatus.VALID or not submission.is_current:
+            return
+
+        franchise_id = submission.franchise_id
+
+        with _incremental_lock:
+            sub_count = db.query(Submission).filter(
+                Submission.franchise_id == franchise_id,
+                Submission.submission_status == SubmissionStatus.VALID,
+                Submission.is_current.is_(True)
+            ).count()
+            song_names = {
+                str(s.id): s.name
+                for s in db.query(Song.id, Song.name).filter(Song.franchise_id == franchise_id).all()
+            }
+            snapshot = None
+            refreshed = []
+            # Per subgroup only one of a user's rankings counts, and the
+            # aggregates may already hold another one of theirs
+            has_other_rankings = db.query(Submission.id).filter(
+                Submission.franchise_id == franchise_id,
+                Submission.username == submission.username,
+                Submission.submission_status == SubmissionStatus.VALID,
+                Submission.is_current.is_(True),
+                Submission.id != submission.id,
+            ).first() is not None
+
+            for subgroup in db.query(Subgroup).filter_by(franchise_id=franchise_id).all():
+                if not subgroup.song_ids:
+                    continue
+
+                rel_map = RelativeRankingService.relativize(submission.parsed_rankings, subgroup.song_ids)
+                if not rel_map:
+                    continue
+
+                aggregate = db.query(SubgroupAggregate).filter(
+                    SubgroupAggregate.franchise_id == franchise_id,
+                    SubgroupAggregate.subgroup_id == subgroup.id
+                ).with_for_update().first()
+
+                known_users = None
+                if aggregate is None or has_other_rankings:
+                    # First update since the last rebuild, or a user with other
+                    # rankings: seed from every stored submission (which already
+                    # includes this one) and use the user's effective ranking
+                    snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+                    rel_rankings = snapshot.relative_rankings(subgroup.id)
+                    rel_map = snapshot.user_rankings(subgroup.id).get(submission.username, rel_map)
+                    song_stats = IncrementalAnalysisService.stats_from_rankings(
+                        m for _, m in rel_rankings
+                    )
+                    update_aggregate_record(db, franchise_id, subgroup.id, song_stats, len(rel_rankings))
+                    known_users = {username for username, _ in rel_rankings}
+                else:
+                    song_stats = IncrementalAnalysisService.add_ranks(aggregate.song_stats or {}, rel_map)
+                    update_aggregate_record(
+                        db, franchise_id, subgroup.id, song_stats, (aggregate.submission_count or 0) + 1
+                    )
+
+                community = IncrementalAnalysisService.community_rankings(
+                    subgroup.song_ids, song_stats, song_names
+                )
+                update_analysis_record(db, franchise_id, subgroup.id, "COMMUNITY_RANK", community, sub_count)
+
+                controversy = IncrementalAnalysisService.controversy(song_stats, song_names)
+                if controversy:
+                    update_analysis_record(db, franchise_id, subgroup.id, "CONTROVERSY", controversy, sub_count)
+
+                # Only the user's own divergence row is written; the stored
+                # matrix is rewritten by refresh_divergence below
+                divergences = DivergenceRowService.update_user(
+                    db, franchise_id, subgroup.id, submission.username, rel_map, known_users
+                )
+                if divergences is not None:
+                    NeighborIndexService.update_user(
+                        db, franchise_id, subgroup.id, submission.username, divergences
+                    )
+                    refreshed.append(subgroup.id)
+
+            db.commit()
+        logger.info(f"Applied incremental analysis update for submission {submission_id}")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Incremental update failed for submission {submission_id}: {str(e)}")
+        return
+    finally:
+        db.close()
+
+    refresh_divergence(franchise_id, refreshed)
+
+def refresh_divergence(franchise_id, subgroup_ids):
+    """
+    Rewrites the stored DIVERGENCE result (matrix, encoded bodies) and the
+    neighbour index of subgroups whose divergence rows changed. That is
+    O(U²) per subgroup, so bursts are coalesced: while a thread rewrites a
+    subgroup, other callers only mark it stale and that thread rewrites it
+    once more when done, covering all of them.
+    """
+    keys = {(franchise_id, subgroup_id) for subgroup_id in subgroup_ids}
+    with _refresh_lock:
+        _stale_divergence.update(keys)
+        owned = keys - _refreshing_divergence
+        _refreshing_divergence.update(owned)
+
+    while owned:
+        with _refresh_lock:
+            batch = owned & _stale_divergence
+            _stale_divergence.difference_update(batch)
+            if not batch:
+                _refreshing_divergence.difference_update(owned)
+                return
+        _write_divergence(batch)
+
+def _write_divergence(keys):
+    try:
+        db = database.get_session()
+    except Exception as e:
+        logger.error(f"Failed to get database session: {str(e)}")
+        return
+
+    try:
+        for franchise_id in {franchise_id for franchise_id, _ in keys}:
+            sub_count = db.query(Submission).filter(
+                Submission.franchise_id == franchise_id,
+                Submission.submission_status == SubmissionStatus.VALID,
+                Submission.is_current.is_(True)
+            ).count()
+            song_names = {
+                str(s.id): s.name
+                for s in db.query(Song.id, Song.name).filter(Song.franchise_id == franchise_id).all()
+            }
+            for key_franchise, subgroup_id in keys:
+                if key_franchise != franchise_id:
+                    continue
+                data = DivergenceRowService.matrix_data(db, franchise_id, subgroup_id, song_names)
+                if data:
+                    update_analysis_record(db, franchise_id, subgroup_id, "DIVERGENCE", data, sub_count)
+                    NeighborIndexService.rebuild(db, franchise_id, subgroup_id, data["matrix"])
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Divergence refresh failed: {str(e)}")
+    finally:
+        db.close()
+
+class AnalysisScope(NamedTuple):
+    """A recompute request; None on a field means "all"."""
+    franchise: Optional[str] = None
+    subgroup: Optional[str] = None
+    analysis_type: Optional[str] = None
+    dirty_only: bool = False
+
+    def covers(self, other: "AnalysisScope") -> bool:
+        """True if running this scope also does all the work of `other`."""
+        if self.dirty_only and not other.dirty_only:
+            return False
+        return all(
+            mine is None or mine == theirs
+            for mine, theirs in (
+                (self.franchise, other.franchise),
+                (self.subgroup, other.subgroup),
+                (self.analysis_type, other.analysis_type),
+            )
+        )
+
+
+SUBGROUP_TASKS = {
+    "DIVERGENCE": AnalysisService.compute_divergence_matrix,
+    "CONTROVERSY": AnalysisService.compute_controversy,
+    "TAKES": AnalysisService.compute_hot_takes,
+    "COMMUNITY_RANK": AnalysisService.compute_community_rankings
+}
+ANALYSIS_TYPES = (*SUBGROUP_TASKS, "SPICE")
+
+# Scopes queued but not started yet, used to drop duplicate triggers
+_pending_scopes = set()
+_pending_lock = threading.Lock()
+
+def queue_scope(scope: AnalysisScope) -> bool:
+    """Registers a pending scope. Returns False if an equal or wider one is already queued."""
+    with _pending_lock:
+        if any(pending.covers(scope) for pending in _pending_scopes):
+            return False
+        _pending_scopes.add(scope)
+        return True
+
+def run_scope(scope: AnalysisScope):
+    """Background entry point for a scope registered with queue_scope."""
+    with _pending_lock:
+        _pending_scopes.discard(scope)
+    recompute_analyses(*scope)
+
+def mark_dirty(db: Session, franchise_id, subgroup_ids):
+    """
+    Flags the given subgroups, plus the franchise-wide scope, as stale.
+    Re-marking refreshes marked_at. The caller commits.
+    """
+    now = datetime.utcnow()
+    for subgroup_id in [*subgroup_ids, None]:
+        existing = db.query(AnalysisDirtyFlag).filter(
+            AnalysisDirtyFlag.franchise_id == franchise_id,
+            AnalysisDirtyFlag.subgroup_id == subgroup_id
+        ).first()
+        if existing:
+            existing.marked_at = now
+        else:
+            db.add(AnalysisDirtyFlag(franchise_id=franchise_id, subgroup_id=subgroup_id, marked_at=now))
+
+def _clear_dirty(db: Session, franchise_id, subgroup_id, started_at):
+    # Flags re-marked after the run started stay set
+    db.query(AnalysisDirtyFlag).filter(
+        AnalysisDirtyFlag.franchise_id == franchise_id,
+        AnalysisDirtyFlag.subgroup_id == subgroup_id,
+        AnalysisDirtyFlag.marked_at <= started_at
+    ).delete(synchronize_session=False)
+
+def _has_result(db: Session, franchise_id, subgroup_id) -> bool:
+    return db.query(AnalysisResult.id).filter(
+        AnalysisResult.franchise_id == franchise_id,
+        AnalysisResult.subgroup_id == subgroup_id
+    ).first() is not None
+
+def _run_analysis_task(snapshot: RankingSnapshot, analysis_type, subgroup_id):
+    """
+    Computes one analysis from a snapshot without touching the database.
+    Returns (data, wall_seconds, error) so failures can cross a process boundary.
+    """
+    started = time.perf_counter()
+    try:
+        if analysis_type == "SPICE":
+            data = AnalysisService.compute_spice_meter(snapshot.franchise_id, None, snapshot)
+        else:
+            data = SUBGROUP_TASKS[analysis_type](snapshot.franchise_id, subgroup_id, None, snapshot)
+        return data, time.perf_counter() - started, None
+    except Exception as e:
+        return None, time.perf_counter() - started, str(e)
+
+# Worker-process state set by _init_worker: pickled snapshots by franchise
+# id, and the ones this worker has already unpickled
+_worker_payloads = {}
+_worker_snapshots = {}
+
+def _init_worker(payloads: dict):
+    """Process-pool initializer; each worker receives every snapshot once."""
+    _worker_payloads.update(payloads)
+
+def _run_pooled_task(franchise_id: str, analysis_type, subgroup_id):
+    """Process-pool entry point; a worker unpickles each franchise's snapshot once."""
+    snapshot = _worker_snapshots.get(franchise_id)
+    if snapshot is None:
+        snapshot = _worker_snapshots[franchise_id] = pickle.loads(_worker_payloads.pop(franchise_id))
+    return _run_analysis_task(snapshot, analysis_type, subgroup_id)
+
+class _FranchiseRun(NamedTuple):
+    franchise: Franchise
+    snapshot: RankingSnapshot
+    target_ids: list
+    tasks: list     # (analysis_type, subgroup_id or None for SPICE)
+    futures: dict   # task -> Future; empty when computing in-process
+
+def _plan_franchise(db: Session, franchise_obj, subgroup, analysis_type, dirty_only, subgroup_types):
+    """Resolves the subgroups and types a franchise needs. Returns None if there is nothing to do."""
+    sg_query = db.query(Subgroup.id).filter(Subgroup.franchise_id == franchise_obj.id)
+    if subgroup:
+        sg_query = sg_query.filter(Subgroup.name == subgroup)
+    target_ids = [row.id for row in sg_query.all()] if subgroup_types else []
+    run_spice = subgroup is None and analysis_type in (None, "SPICE")
+
+    if dirty_only:
+        dirty = {
+            row.subgroup_id for row in
+            db.query(AnalysisDirtyFlag.subgroup_id)
+            .filter(AnalysisDirtyFlag.franchise_id == franchise_obj.id).all()
+        }
+        target_ids = [
+            sg_id for sg_id in target_ids
+            if sg_id in dirty or not _has_result(db, franchise_obj.id, sg_id)
+        ]
+        run_spice = run_spice and (None in dirty or not _has_result(db, franchise_obj.id, None))
+
+    if not target_ids and not run_spice:
+        logger.info(f"Skipping {franchise_obj.name}: nothing to recompute.")
+        return None
+
+    # Load and share one snapshot of the franchise's valid submissions
+    snapshot = RankingSnapshot.load(franchise_obj.id, db)
+    if snapshot.submission_count < 2:
+        logger.info(f"Skipping {franchise_obj.name}: insufficient franchise data.")
+        return None
+
+    # Relativize the needed subgroups (SPICE reads all) in one pass; workers get the filled cache
+    snapshot.relativize_subgroups(None if run_spice else target_ids)
+
+    tasks = [(a_type, sg_id) for sg_id in target_ids for a_type in subgroup_types]
+    if run_spice:
+        tasks.append(("SPICE", None))
+    return _FranchiseRun(franchise_obj, snapshot, target_ids, tasks, {})
+
+def recompute_analyses(franchise=None, subgroup=None, analysis_type=None, dirty_only=False):
+    """
+    Recomputes stored metrics, optionally limited to one franchise, one
+    subgroup and/or one analysis type (names, not ids). With dirty_only,
+    only scopes flagged by mark_dirty (or never computed) are processed.
+
+    With analysis_parallel_workers > 0 every (subgroup, type) task runs in
+    a process pool; this thread remains the only database writer.
+    """
+    logger.info(
+        f"Starting analysis recomputation (franchise={franchise}, subgroup={subgroup}, "
+        f"type={analysis_type}, dirty_only={dirty_only})..."
+    )
+    started_at = datetime.utcnow()
+    run_started = time.perf_counter()
+
+    try:
+        db = database.get_session()
+    except Exception as e:
+        logger.error(f"Failed to get database session: {str(e)}")
+        return
+
+    pool = None
+    try:
+        query = db.query(Franchise)
+        if franchise:
+            query = query.filter(Franchise.name == franchise)
+        franchises = query.all()
         if not franchises:
             return
 
-        for franchise in franchises:
-            f_id_str = str(franchise.id)
-            logger.info(f"--- Processing Franchise: {franchise.name} ---")
+        subgroup_types = [t for t in SUBGROUP_TASKS if analysis_type in (None, t)]
+        full_subgroup_run = len(subgroup_types) == len(SUBGROUP_TASKS)
 
+        runs = []
+        for franchise_obj in franchises:
             try:
-                # Get the count of all valid submissions in this franchise
-                franchise_valid_count = db.query(Submission).filter(
-                    Submission.franchise_id == franchise.id,
-                    Submission.submission_status == SubmissionStatus.VALID
-                ).count()
-
-                if franchise_valid_count < 2:
-                    logger.info(f"Skipping {franchise.name}: insufficient franchise data.")
-                    continue
+                run = _plan_franchise(db, franchise_obj, subgroup, analysis_type, dirty_only, subgroup_types)
+            except Exception as e:
+                logger.error(f"Critical error in franchise {franchise_obj.name} loop: {str(e)}")
+                continue
+            if run is not None:
+                runs.append(run)
+
+        if settings.analysis_parallel_workers > 0 and runs:
+            # Snapshots travel once per worker through the initializer, not with every task
+            payloads = {
+                run.snapshot.franchise_id: pickle.dumps(run.snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+                for run in runs
+            }
+            # spawn, not fork: this process runs scheduler and server threads
+            pool = ProcessPoolExecutor(
+                max_workers=settings.analysis_parallel_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(payloads,),
+            )
+            # Submit every franchise up front so workers stay busy across franchises
+            for run in runs:
+                for a_type, sg_id in run.tasks:
+                    run.futures[(a_type, sg_id)] = pool.submit(
+                        _run_pooled_task, run.snapshot.franchise_id, a_type, str(sg_id) if sg_id else None
+                    )
 
-                subgroups = db.query(Subgroup).filter_by(franchise_id=franchise.id).all()
+        for run in runs:
+            franchise_obj, snapshot = run.franchise, run.snapshot
+            franchise_valid_count = snapshot.submission_count
 
-                for subgroup in subgroups:
-                    s_id_str = str(subgroup.id)
-                    
-                    subgroup_tasks = {
-                        "DIVERGENCE": AnalysisService.compute_divergence_matrix,
-                        "CONTROVERSY": AnalysisService.compute_controversy,
-                        "TAKES": AnalysisService.compute_hot_takes,
-                        "COMMUNITY_RANK": AnalysisService.compute_community_rankings
-                    }
+            try:
+                logger.info(f"--- Processing Franchise: {franchise_obj.name} ({len(run.target_ids)} subgroups) ---")
+
+                # Rebuild running aggregates so incremental updates start from fresh totals
+                for sg_id in run.target_ids:
+                    rel_rankings = snapshot.relative_rankings(sg_id)
+                    if rel_rankings:
+                        song_stats = IncrementalAnalysisService.stats_from_rankings(
+                            m for _, m in rel_rankings
+                        )
+                        update_aggregate_record(db, franchise_obj.id, sg_id, song_stats, len(rel_rankings))
 
-                    for a_type, calc_func in subgroup_tasks.items():
+                failed = set()
+                for task in run.tasks:
+                    a_type, sg_id = task
+                    label = snapshot.get_subgroup(sg_id).name if sg_id else franchise_obj.name
+                    future = run.futures.get(task)
+                    if future is None:
+                        data, elapsed, error = _run_analysis_task(
+                            snapshot, a_type, str(sg_id) if sg_id else None
+                        )
+                    else:
                         try:
-                            data = calc_func(f_id_str, s_id_str, db)
-                            # Only save if the task returned data (relativizer found matches)
-                            if data:
-                                update_analysis_record(db, franchise.id, subgroup.id, a_type, data, franchise_valid_count)
+                            data, elapsed, error = future.result()
                         except Exception as e:
-                            logger.error(f"Error calculating {a_type} for {subgroup.name}: {str(e)}")
+                            data, elapsed, error = None, 0.0, str(e)
+
+                    if error:
+                        failed.add(sg_id)
+                        logger.error(f"Error calculating {a_type} for {label}: {error}")
+                        continue
 
-                # Franchise-wide Spice Index
-                try:
-                    spice_data = AnalysisService.compute_spice_meter(f_id_str, db)
-                    update_analysis_record(db, franchise.id, None, "SPICE", spice_data, franchise_valid_count)
-                except Exception as e:
-                    logger.error(f"Error calculating SPICE for {franchise.name}: {str(e)}")
+                    logger.info(f"Computed {a_type} for {label} in {elapsed:.3f}s")
+                    # Subgroup results are only saved when the relativizer found matches
+                    if data or a_type == "SPICE":
+                        record = update_analysis_record(
+                            db, franchise_obj.id, sg_id, a_type, data, franchise_valid_count
+                        )
+                        if a_type == "DIVERGENCE":
+                            index_divergence(db, record)
+
+                if full_subgroup_run:
+                    for sg_id in run.target_ids:
+                        if sg_id not in failed:
+                            _clear_dirty(db, franchise_obj.id, sg_id, started_at)
+                if ("SPICE", None) in run.tasks and None not in failed:
+                    _clear_dirty(db, franchise_obj.id, None, started_at)
 
                 db.commit()
-                logger.info(f"Finished recomputation for {franchise.name}")
+                logger.info(f"Finished recomputation for {franchise_obj.name}")
 
             except Exception as e:
                 db.rollback()
-                logger.error(f"Critical error in franchise {franchise.name} loop: {str(e)}")
+                logger.error(f"Critical error in franchise {franchise_obj.name} loop: {str(e)}")
 
     except Exception as e:
         logger.critical(f"Scheduler job failed: {str(e)}")
     finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
         db.close()
+        logger.info(f"Analysis recomputation finished in {time.perf_counter() - run_started:.2f}s")
+
+def recompute_all_analyses():
+    """Iterates through data and recomputes all metrics."""
+    recompute_analyses()
+
+def recompute_dirty_analyses():
+    """Recomputes only scopes flagged as stale since their last run."""
+    recompute_analyses(dirty_only=True)
 
 def start_scheduler():
     if not scheduler.running:
@@ -114,9 +563,9 @@ def start_scheduler():
             minute=settings.analysis_schedule_minute
         )
         scheduler.add_job(
-            recompute_all_analyses,
+            recompute_dirty_analyses,
             trigger=trigger,
-            id="recompute_all",
+            id="recompute_dirty",
             replace_existing=True
         )
         scheduler.start()
@@ -11,6 +11,12 @@ from app.config import settings
 from app import database  # Import module, not individual exports
 from app.models import Song, Franchise
 from app.seeds.init import DatabaseSeeder
+from app.services.analysis_responses import AnalysisResponseService
+from app.services.current_submissions import CurrentSubmissionService
+from app.services.divergence_rows import DivergenceRowService
+from app.services.neighbors import NeighborIndexService
+from app.services.normalized_rankings import NormalizedRankingService
+from app.services.packed_rankings import PackedRankingService
 from app.exceptions import LiellaException
 from app.logging_config import setup_logging
 from app.api.v1 import submissions, analysis, health, users
@@ -62,6 +68,17 @@ async def lifespan(app: FastAPI):
                 except Exception as e:
                     logger.info(f"Skipping subgroup sync for {franchise_name}: No definitions found in TOML.")
 
+            # Index new songs and pack any submissions stored before packing existed
+            PackedRankingService.backfill(db)
+            # Flag latest-per-user rows before indexing, so replaced rows are skipped
+            CurrentSubmissionService.backfill(db)
+            NormalizedRankingService.backfill(db)
+            AnalysisResponseService.backfill(db)
+            NeighborIndexService.backfill(db)
+            # Rewrite results whose incremental refresh never ran (e.g. a restart mid-burst)
+            for franchise_id, subgroup_id in DivergenceRowService.backfill(db):
+                analysis_scheduler.refresh_divergence(franchise_id, [subgroup_id])
+
             total_songs = db.query(Song).count()
             logger.info(f"Ready: {total_songs} total songs in system.")
             
@@ -89,6 +106,7 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down...")
         if settings.analysis_scheduler_enabled:
             analysis_scheduler.stop_scheduler()
+        await database.dispose_engines()
         logger.info("✓ Application shut down cleanly")
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
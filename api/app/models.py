@@ -4,9 +4,10 @@ import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import (JSON, UUID, Boolean, Column, DateTime, Enum,
-                        ForeignKey, Integer, String, UniqueConstraint, func)
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import (JSON, UUID, Boolean, Column, DateTime, Enum, Float,
+                        ForeignKey, Index, Integer, LargeBinary, String,
+                        UniqueConstraint, func)
+from sqlalchemy.orm import declarative_base, deferred, relationship
 
 Base = declarative_base()
 
@@ -39,12 +40,15 @@ class Song(Base):
     name = Column(String)
     youtube_url = Column(String, nullable=True)
     franchise_id = Column(UUID(as_uuid=True), ForeignKey("franchises.id"))
+    # Slot of this song in its franchise's packed ranking arrays
+    song_index = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     franchise = relationship("Franchise", back_populates="songs")
 
     __table_args__ = (
         UniqueConstraint("name", "franchise_id", name="uq_song_per_franchise"),
+        Index("ix_song_index_per_franchise", "franchise_id", "song_index", unique=True),
     )
 
 
@@ -65,6 +69,8 @@ class Subgroup(Base):
 
     __table_args__ = (
         UniqueConstraint("name", "franchise_id", name="uq_subgroup_per_franchise"),
+        # Listing a franchise's subgroups (the unique key leads with name)
+        Index("ix_subgroups_franchise_name", "franchise_id", "name"),
     )
 
 
@@ -87,15 +93,36 @@ class Submission(Base):
     parsed_rankings = Column(
         JSON
     )  # {song_id: rank} as strings since JSON doesn't preserve UUID
+    # Same ranks as float32 array aligned to Song.song_index (NaN = unranked)
+    packed_rankings = Column(LargeBinary, nullable=True)
 
     submission_status = Column(Enum(SubmissionStatus), default=SubmissionStatus.PENDING)
     conflict_report = Column(JSON, nullable=True)
+    # Latest VALID submission of its (username, franchise, subgroup); see
+    # CurrentSubmissionService. Analyses only load current rows.
+    is_current = Column(Boolean, default=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     franchise = relationship("Franchise", back_populates="submissions")
     subgroup = relationship("Subgroup", back_populates="submissions")
 
+    __table_args__ = (
+        # A franchise's current VALID rows by user: per-user lookups and user
+        # listings, whose pages need the id to break (username, created_at) ties
+        Index(
+            "ix_submissions_franchise_current_user_id",
+            "franchise_id", "submission_status", "is_current", "username", "created_at", "id",
+        ),
+        # The same rows oldest first: snapshot loads, counts and data versions
+        Index(
+            "ix_submissions_franchise_current_created",
+            "franchise_id", "submission_status", "is_current", "created_at", "id",
+        ),
+        # Per-user deletes, import upserts and superseding, which don't filter on status
+        Index("ix_submissions_user_franchise", "username", "franchise_id", "subgroup_id"),
+    )
+
 
 class AnalysisResult(Base):
     __tablename__ = "analysis_results"
@@ -106,6 +133,10 @@ class AnalysisResult(Base):
 
     analysis_type = Column(String)  # "DIVERGENCE", "TAKES", "CONTROVERSY", "SPICE"
     result_data = Column(JSON)
+    # The encoded GET response for result_data, see AnalysisResponseService.
+    # Deferred: only the routes read it
+    response_body = deferred(Column(LargeBinary, nullable=True))
+    response_encoding = Column(String, nullable=True)  # "gzip" or "identity"
 
     computed_at = Column(DateTime(timezone=True), server_default=func.now())
     based_on_submissions = Column(Integer, default=0)
@@ -118,3 +149,107 @@ class AnalysisResult(Base):
             "franchise_id", "subgroup_id", "analysis_type", name="uq_analysis_per_group"
         ),
     )
+
+
+class SubgroupAggregate(Base):
+    """Running per-song rank statistics used for incremental analysis updates"""
+
+    __tablename__ = "subgroup_aggregates"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    franchise_id = Column(UUID(as_uuid=True), ForeignKey("franchises.id"))
+    subgroup_id = Column(UUID(as_uuid=True), ForeignKey("subgroups.id"))
+
+    # {song_id: {"sum": float, "sum_sq": float, "count": int, "hist": {rank: count}}}
+    song_stats = Column(JSON)
+    submission_count = Column(Integer, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "franchise_id", "subgroup_id", name="uq_aggregate_per_group"
+        ),
+    )
+
+
+class DivergenceRow(Base):
+    """One user's row of a subgroup's divergence matrix, see DivergenceRowService"""
+
+    __tablename__ = "divergence_rows"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    franchise_id = Column(UUID(as_uuid=True), ForeignKey("franchises.id"))
+    subgroup_id = Column(UUID(as_uuid=True), ForeignKey("subgroups.id"))
+    username = Column(String)
+
+    ranks = Column(JSON)  # {song_id: relative rank} within the subgroup
+    divergences = Column(JSON)  # {username: divergence} as of when the row was written
+    # Of two users' rows, the one with the higher version holds their pair's value
+    version = Column(Integer, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "franchise_id", "subgroup_id", "username", name="uq_divergence_row_per_user"
+        ),
+    )
+
+
+class UserNeighbors(Base):
+    """A user's closest and farthest users in one subgroup's divergence matrix"""
+
+    __tablename__ = "user_neighbors"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    franchise_id = Column(UUID(as_uuid=True), ForeignKey("franchises.id"))
+    subgroup_id = Column(UUID(as_uuid=True), ForeignKey("subgroups.id"))
+    username = Column(String)
+
+    # [{"user": str, "div": float}], closest first / farthest first
+    soulmates = Column(JSON)
+    nemeses = Column(JSON)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "franchise_id", "subgroup_id", "username", name="uq_neighbors_per_user"
+        ),
+    )
+
+
+class AnalysisDirtyFlag(Base):
+    """Marks a scope whose stored analyses are stale and need recomputing"""
+
+    __tablename__ = "analysis_dirty_flags"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    franchise_id = Column(UUID(as_uuid=True), ForeignKey("franchises.id"))
+    # NULL = franchise-wide analyses (SPICE)
+    subgroup_id = Column(UUID(as_uuid=True), ForeignKey("subgroups.id"), nullable=True)
+
+    marked_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("franchise_id", "subgroup_id", name="uq_dirty_per_group"),
+    )
+
+
+class SubmissionRanking(Base):
+    """One row per (submission, subgroup, ranked song) for SQL-side aggregation"""
+
+    __tablename__ = "submission_rankings"
+
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("submissions.id"), primary_key=True)
+    subgroup_id = Column(UUID(as_uuid=True), ForeignKey("subgroups.id"), primary_key=True)
+    song_id = Column(UUID(as_uuid=True), ForeignKey("songs.id"), primary_key=True)
+    franchise_id = Column(UUID(as_uuid=True), ForeignKey("franchises.id"))
+
+    rank = Column(Float)  # rank in the full submission
+    relative_rank = Column(Float)  # 1..N rank within the subgroup
+
+    __table_args__ = (
+        Index("ix_submission_rankings_group_song", "franchise_id", "subgroup_id", "song_id"),
+    )
@@ -1,7 +1,7 @@
 # app/schemas.py
 
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Union
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -32,6 +32,14 @@ class SubmissionResponse(BaseModel):
     conflicts: Optional[Dict[str, ConflictDetail]] = None
 
 
+class BulkSubmissionResult(SubmissionResponse):
+    """One NDJSON line of POST /submit/bulk; status "ERROR" means nothing was stored."""
+    line_num: int
+    submission_id: Optional[UUID] = None
+    parsed_count: int = 0
+    error: Optional[str] = None
+
+
 class SongResponse(BaseModel):
     id: UUID
     name: str
@@ -66,6 +74,20 @@ class DivergenceMatrixResponse(BaseModel):
     song_names: Optional[Dict[str, str]] = None
 
 
+class CompactDivergenceResponse(BaseModel):
+    """DivergenceMatrixResponse as index-aligned flat arrays (format=compact)"""
+    metadata: AnalysisMetadata
+    users: list[str]
+    song_ids: list[str]
+    song_names: list[Optional[str]]
+    array_encoding: str  # "json", or "float16": little-endian float16 bytes in base64
+    # Upper triangle of the symmetric matrix without the diagonal, row by row:
+    # (users[i], users[j]) for i < j is at i*(2U - i - 1)/2 + (j - i - 1)
+    matrix: Union[list[float], str]
+    # Relative rank of users[u] for song_ids[s] at s*U + u; null (NaN in float16) = unranked
+    rankings: Union[list[Optional[float]], str]
+
+
 class ControversySongResult(BaseModel):
     song_id: UUID
     song_name: str
@@ -3,9 +3,20 @@
 import csv
 import logging
 import re
+import time
+import uuid
 from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.jobs.analysis_scheduler import mark_dirty
 from app.models import Franchise, Subgroup, Song, Submission, SubmissionStatus
+from app.services.current_submissions import CurrentSubmissionService
+from app.services.normalized_rankings import NormalizedRankingService
+from app.services.packed_rankings import RANK_DTYPE, PackedRankingService
 from app.services.tie_handling import TieHandlingService
 
 logger = logging.getLogger(__name__)
@@ -32,6 +43,25 @@ class RankingsImporter:
             return parts[0].strip(), parts[1].strip()
         return entry.strip(), None
     
+    @staticmethod
+    def normalize_name(name: str) -> str:
+        """Normalize song name by replacing smart quotes and other variations"""
+        # Replace smart/curly quotes with straight quotes
+        # U+2018 (') and U+2019 (') -> straight apostrophe
+        # U+201C (") and U+201D (") -> straight double quote
+        name = name.replace('\u2018', "'").replace('\u2019', "'")
+        name = name.replace('\u201c', '"').replace('\u201d', '"')
+        return name.strip()
+
+    @staticmethod
+    def build_song_map(songs) -> dict:
+        """Song name -> ID, keyed by normalized and by original names"""
+        song_by_name = {RankingsImporter.normalize_name(song.name): song.id for song in songs}
+        # Also keep original names for exact matching
+        for song in songs:
+            song_by_name[song.name] = song.id
+        return song_by_name
+
     @staticmethod
     def import_from_csv(db: Session, csv_path: Path, franchise_name: str = "liella", subgroup_name: str = "All Songs"):
         """
@@ -58,20 +88,8 @@ class RankingsImporter:
             
             # Build song name -> ID map with normalized keys
             songs = db.query(Song).filter_by(franchise_id=franchise.id).all()
-            
-            def normalize_name(name: str) -> str:
-                """Normalize song name by replacing smart quotes and other variations"""
-                # Replace smart/curly quotes with straight quotes
-                # U+2018 (') and U+2019 (') -> straight apostrophe
-                # U+201C (") and U+201D (") -> straight double quote
-                name = name.replace('\u2018', "'").replace('\u2019', "'")
-                name = name.replace('\u201c', '"').replace('\u201d', '"')
-                return name.strip()
-            
-            song_by_name = {normalize_name(song.name): song.id for song in songs}
-            # Also keep original names for exact matching
-            for song in songs:
-                song_by_name[song.name] = song.id
+            normalize_name = RankingsImporter.normalize_name
+            song_by_name = RankingsImporter.build_song_map(songs)
             
             logger.info(f"Loading rankings from {csv_path}")
             
@@ -124,25 +142,41 @@ class RankingsImporter:
             
             # Create submissions for each user
             created_count = 0
+            index_map = PackedRankingService.assign_song_indexes(db, franchise.id)
+            franchise_subgroups = db.query(Subgroup).filter(Subgroup.franchise_id == franchise.id).all()
+
+            # Convert to mean ranks for ties, every user in one batch
+            ranked_users = [username for username, rankings in user_rankings.items() if rankings]
+            final_ranks_by_user = dict(zip(
+                ranked_users,
+                TieHandlingService.convert_tied_ranks_batch([user_rankings[u] for u in ranked_users])
+            ))
+            # Rewriting a stored ranking in place replaces it as much as superseding does
+            replaced_any = False
+            imported_songs = set()
             for username, rankings in user_rankings.items():
                 if not rankings:
                     logger.warning(f"No rankings found for user {username}")
                     continue
+                imported_songs.update(rankings)
                 
-                # Check if submission already exists
+                # Check if submission already exists (the current one, if resubmitted)
                 existing = db.query(Submission).filter(
                     Submission.username == username,
                     Submission.franchise_id == franchise.id,
                     Submission.subgroup_id == subgroup.id
-                ).first()
+                ).order_by(Submission.is_current.desc()).first()
                 
                 if existing:
                     logger.info(f"Updating existing submission for {username}")
                     existing.parsed_rankings = rankings
                     existing.submission_status = SubmissionStatus.VALID
+                    PackedRankingService.pack_submission(db, existing, index_map)
+                    CurrentSubmissionService.supersede(db, [existing])
+                    NormalizedRankingService.index_submission(db, existing, franchise_subgroups)
+                    replaced_any = True
                 else:
-                    # Convert to mean ranks for ties
-                    final_ranks = TieHandlingService.convert_tied_ranks(rankings)
+                    final_ranks = final_ranks_by_user[username]
                     
                     submission = Submission(
                         username=username,
@@ -152,10 +186,21 @@ class RankingsImporter:
                         parsed_rankings=final_ranks,
                         submission_status=SubmissionStatus.VALID
                     )
+                    PackedRankingService.pack_submission(db, submission, index_map)
                     db.add(submission)
+                    replaced_any |= bool(CurrentSubmissionService.supersede(db, [submission]))
+                    NormalizedRankingService.index_submission(db, submission, franchise_subgroups)
                     created_count += 1
                     logger.info(f"Created submission for {username} with {len(rankings)} songs")
             
+            if replaced_any:
+                CurrentSubmissionService.drop_aggregates(db, franchise.id)
+            # Flag every subgroup that contains an imported song (or, if older
+            # rankings were replaced, every subgroup)
+            mark_dirty(db, franchise.id, [
+                sg.id for sg in franchise_subgroups
+                if sg.song_ids and (replaced_any or not imported_songs.isdisjoint(sg.song_ids))
+            ])
             db.commit()
             logger.info(f"✓ Successfully imported rankings for {created_count} users")
             return created_count
@@ -165,8 +210,190 @@ class RankingsImporter:
             logger.error(f"Failed to import rankings: {str(e)}")
             raise
 
+    @staticmethod
+    def _read_rank_matrix(csv_path: Path, song_by_name: dict, index_map: dict, width: int):
+        """
+        Streams the wide CSV row by row into a users x song-slot matrix of
+        raw ranks (NaN = unranked). Same matching rules as import_from_csv;
+        identical cells, common across users, are parsed once.
+        """
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return [], None
+
+            # Column i belongs to the i-th non-blank header name, as in import_from_csv
+            usernames = [h.strip() for h in header[1:] if h.strip()]
+            user_rows = {username: row for row, username in enumerate(dict.fromkeys(usernames))}
+            column_rows = [user_rows[username] for username in usernames]
+
+            ranks = np.full((len(user_rows), width), np.nan)
+            parsed_cells = {}
+            for row in reader:
+                if len(row) < 2:
+                    continue
+                for entry, user_row in zip(row[1:], column_rows):
+                    cell = parsed_cells.get(entry)
+                    if cell is None:
+                        cell = parsed_cells[entry] = RankingsImporter._parse_cell(entry, song_by_name, index_map)
+                    if cell:
+                        ranks[user_row, cell[0]] = cell[1]
+
+        return list(user_rows), ranks
+
+    @staticmethod
+    def _parse_cell(entry: str, song_by_name: dict, index_map: dict):
+        """(song slot, rank) for a ranking cell, or False if it is skipped"""
+        song_name, _ = RankingsImporter.parse_song_entry(entry)
+        if not song_name:
+            return False
+        song_id = song_by_name.get(RankingsImporter.normalize_name(song_name)) or song_by_name.get(song_name)
+        rank_match = re.match(r'^(\d+)\.', entry.strip())
+        if not song_id or not rank_match:
+            return False
+        return index_map[str(song_id)], int(rank_match.group(1))
+
+    @staticmethod
+    def bulk_import_from_csv(
+        db: Session,
+        csv_path: Path,
+        franchise_name: str = "liella",
+        subgroup_name: str = "All Songs",
+        chunk_size: Optional[int] = None,
+    ):
+        """
+        Bulk mode of import_from_csv for large archives. The CSV is read in
+        one streaming pass into a rank matrix, ties are converted for every
+        user at once, and submissions are written with executemany inserts
+        and updates, one transaction per chunk of users. Existing users'
+        submissions are replaced with mean-rank converted rankings.
+        """
+        chunk_size = chunk_size or settings.import_chunk_size
+        started = time.perf_counter()
+        try:
+            if not csv_path.exists():
+                logger.error(f"CSV file not found: {csv_path}")
+                return 0
+
+            franchise = db.query(Franchise).filter_by(name=franchise_name).first()
+            if not franchise:
+                logger.error(f"Franchise '{franchise_name}' not found")
+                return 0
+            franchise_id = franchise.id
+
+            subgroup = db.query(Subgroup).filter(
+                Subgroup.name == subgroup_name,
+                Subgroup.franchise_id == franchise_id
+            ).first()
+            if not subgroup:
+                logger.error(f"Subgroup '{subgroup_name}' not found")
+                return 0
+            subgroup_id = subgroup.id
+
+            songs = db.query(Song).filter_by(franchise_id=franchise_id).all()
+            song_by_name = RankingsImporter.build_song_map(songs)
+            index_map = PackedRankingService.assign_song_indexes(db, franchise_id)
+            song_order = PackedRankingService.song_order(index_map)
+            franchise_subgroups = db.query(Subgroup).filter(Subgroup.franchise_id == franchise_id).all()
+            db.commit()
+
+            logger.info(f"Bulk loading rankings from {csv_path}")
+            usernames, raw_ranks = RankingsImporter._read_rank_matrix(
+                csv_path, song_by_name, index_map, len(song_order)
+            )
+            if not usernames:
+                logger.error("CSV file is empty or malformed")
+                return 0
+
+            ranked = ~np.isnan(raw_ranks).all(axis=1)
+            for username, has_rankings in zip(usernames, ranked.tolist()):
+                if not has_rankings:
+                    logger.warning(f"No rankings found for user {username}")
+            usernames = [username for username, has_rankings in zip(usernames, ranked.tolist()) if has_rankings]
+            # Convert to mean ranks for ties, every user in one pass
+            final_ranks = TieHandlingService.average_ranks(raw_ranks[ranked])
+
+            # Update each user's current submission in place
+            existing_ids = {}
+            for row in db.query(Submission.username, Submission.id).filter(
+                Submission.franchise_id == franchise_id,
+                Submission.subgroup_id == subgroup_id,
+                Submission.username.in_(usernames),
+            ).order_by(Submission.is_current.desc()):
+                existing_ids.setdefault(row.username, row.id)
+
+            created_count = updated_count = 0
+            replaced_any = False
+            for start in range(0, len(usernames), chunk_size):
+                chunk = final_ranks[start:start + chunk_size]
+                rank_maps = PackedRankingService.matrix_to_maps(chunk, song_order)
+                packed = chunk.astype(RANK_DTYPE)
+
+                new_rows, updated_rows, current = [], [], {}
+                for username, rank_map, packed_row in zip(usernames[start:start + chunk_size], rank_maps, packed):
+                    values = {
+                        "parsed_rankings": rank_map,
+                        "packed_rankings": packed_row.tobytes(),
+                        "submission_status": SubmissionStatus.VALID,
+                        "is_current": True,
+                    }
+                    submission_id = existing_ids.get(username)
+                    if submission_id:
+                        updated_rows.append({"id": submission_id, **values})
+                    else:
+                        submission_id = uuid.uuid4()
+                        new_rows.append({
+                            "id": submission_id,
+                            "username": username,
+                            "franchise_id": franchise_id,
+                            "subgroup_id": subgroup_id,
+                            "raw_ranking_text": f"Imported from CSV - {len(rank_map)} songs",
+                            **values,
+                        })
+                    current[username] = submission_id
+
+                if new_rows:
+                    db.execute(insert(Submission), new_rows)
+                if updated_rows:
+                    db.execute(update(Submission), updated_rows)
+                    # Rewritten in place, so replace() below won't see them
+                    CurrentSubmissionService.drop_aggregates(db, franchise_id)
+                    replaced_any = True
+                replaced_any |= bool(CurrentSubmissionService.replace(db, franchise_id, subgroup_id, current))
+                NormalizedRankingService.reindex_users(db, franchise_id, list(current), franchise_subgroups)
+                db.commit()
+
+                created_count += len(new_rows)
+                updated_count += len(updated_rows)
+                logger.info(f"  Stored {start + len(chunk)}/{len(usernames)} users")
+
+            # Flag every subgroup that contains an imported song (or, if older
+            # rankings were replaced, every subgroup)
+            imported_songs = {song_order[idx] for idx in np.flatnonzero(~np.isnan(final_ranks).all(axis=0))}
+            mark_dirty(db, franchise_id, [
+                sg.id for sg in franchise_subgroups
+                if sg.song_ids and (replaced_any or not imported_songs.isdisjoint(sg.song_ids))
+            ])
+            db.commit()
+
+            elapsed = time.perf_counter() - started
+            logger.info(
+                f"✓ Bulk-imported rankings for {created_count + updated_count} users "
+                f"({created_count} new, {updated_count} updated) in {elapsed:.2f}s "
+                f"({(created_count + updated_count) / max(elapsed, 1e-9):.0f} rows/sec)"
+            )
+            return created_count
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to bulk import rankings: {str(e)}")
+            raise
+
 
-def import_user_rankings(db: Session):
+def import_user_rankings(db: Session, bulk: bool = False, chunk_size: Optional[int] = None):
     """Main function to import user rankings"""
     csv_path = Path(__file__).parent / "user_rankings.csv"
+    if bulk:
+        return RankingsImporter.bulk_import_from_csv(db, csv_path, "liella", "All Songs", chunk_size)
     return RankingsImporter.import_from_csv(db, csv_path, "liella", "All Songs")
@@ -8,6 +8,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from app.models import Franchise, Song, Subgroup
 from app.exceptions import SeedingException, ConfigException, DataIntegrityException
+from app.jobs.analysis_scheduler import mark_dirty
+from app.services.current_submissions import CurrentSubmissionService
+from app.services.matching import StrictSongMatcher
+from app.services.normalized_rankings import NormalizedRankingService
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +177,7 @@ class DatabaseSeeder:
                     skipped_count += 1
             
             db.commit()
+            StrictSongMatcher.invalidate(franchise_name)
             logger.info(f"✓ Created {created_count} songs for {franchise_name} (skipped: {skipped_count})")
             
             if created_count == 0:
@@ -257,7 +262,14 @@ class DatabaseSeeder:
                     
                     try:
                         if existing:
+                            songs_changed = existing.song_ids != song_ids
                             existing.song_ids = song_ids
+                            if songs_changed:
+                                # Relative ranks depend on the song list, and so
+                                # do the stored analyses and running aggregates
+                                NormalizedRankingService.rebuild_subgroup(db, existing)
+                                CurrentSubmissionService.drop_aggregates(db, franchise.id)
+                                mark_dirty(db, franchise.id, [existing.id])
                             existing.is_custom = is_custom
                             existing.is_subunit = is_subunit
                             logger.info(f"  Updated subgroup '{subgroup_name}' with {len(song_ids)} songs, is_subunit = {is_subunit}")
@@ -270,6 +282,8 @@ class DatabaseSeeder:
                                 is_subunit=is_subunit
                             )
                             db.add(new_subgroup)
+                            db.flush()
+                            NormalizedRankingService.rebuild_subgroup(db, new_subgroup)
                             created_count += 1
                             logger.info(f"  Created subgroup '{subgroup_name}' with {len(song_ids)} songs, is_subunit = {is_subunit}")
                         
@@ -284,6 +298,7 @@ class DatabaseSeeder:
                     logger.error(f"  Unexpected error for subgroup '{subgroup_key}': {str(e)}")
                     continue
             
+            StrictSongMatcher.invalidate(franchise_name)
             logger.info(f"✓ Created {created_count} subgroups for {franchise_name}")
             return created_count
         
@@ -4,13 +4,18 @@ import statistics
 import json
 import os
 from collections import defaultdict
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 from uuid import UUID
 import math
 
+import numpy as np
 from sqlalchemy.orm import Session
 from app.models import Song, Subgroup, Submission, SubmissionStatus
+from app.services.neighbors import NeighborIndexService
+from app.services.normalized_rankings import NormalizedRankingService
+from app.services.rank_matrix import DivergenceEngine, RankMatrix
 from app.services.ranking_utils import RelativeRankingService
+from app.services.snapshot import RankingSnapshot
 
 
 def to_uuid(val: Union[str, UUID]) -> UUID:
@@ -22,55 +27,19 @@ def to_uuid(val: Union[str, UUID]) -> UUID:
 class AnalysisService:
     @staticmethod
     def compute_divergence_matrix(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> Dict[str, any]:
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return {"matrix": {}, "rankings": {}, "song_names": {}}
 
-        # Fetch ALL valid submissions for this franchise
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
+        user_rel_rankings = snapshot.user_rankings(subgroup.id)
 
-        user_rel_rankings = {}
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings[sub.username] = rel_map
-
-        users = sorted(list(user_rel_rankings.keys()))
-        
-        # Build user-vs-user divergence matrix
-        matrix = {}
-        for user1 in users:
-            matrix[user1] = {}
-            for user2 in users:
-                if user1 == user2:
-                    matrix[user1][user2] = 0.0
-                    continue
-
-                shared_songs = set(user_rel_rankings[user1].keys()) & set(
-                    user_rel_rankings[user2].keys()
-                )
-                if not shared_songs:
-                    matrix[user1][user2] = 0.0
-                    continue
-
-                sq_diffs = [
-                    (user_rel_rankings[user1][sid] - user_rel_rankings[user2][sid]) ** 2
-                    for sid in shared_songs
-                ]
-                rms = (sum(sq_diffs) / len(sq_diffs)) ** 0.5
-                matrix[user1][user2] = round(rms, 2)
+        # Build user-vs-user divergence matrix (masked RMS over shared songs)
+        rank_matrix = RankMatrix.from_rank_maps(user_rel_rankings, subgroup.song_ids)
+        matrix = DivergenceEngine.divergence_dict(rank_matrix)
 
         # Build song-vs-user rankings matrix for loading calculations
         # Format: {song_id: {username: relative_rank}}
@@ -86,8 +55,9 @@ class AnalysisService:
                     song_rankings[str(song_id)][username] = rel_map[song_id]
         
         # Get song names for display
-        song_objs = db.query(Song).filter(Song.id.in_([to_uuid(s) for s in all_songs])).all()
-        song_names = {str(s.id): s.name for s in song_objs}
+        song_names = {
+            sid: snapshot.song_names[sid] for sid in all_songs if sid in snapshot.song_names
+        }
 
         return {
             "matrix": matrix,
@@ -97,29 +67,15 @@ class AnalysisService:
 
     @staticmethod
     def compute_controversy(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> list[dict]:
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return []
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = []
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings.append(rel_map)
+        user_rel_rankings = [rel_map for _, rel_map in snapshot.relative_rankings(subgroup.id)]
 
         if not user_rel_rankings:
             return []
@@ -129,9 +85,13 @@ class AnalysisService:
             for song_id, rank in rel_map.items():
                 song_rank_collections[song_id].append(rank)
 
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
-        
+        return AnalysisService.build_controversy(song_rank_collections, snapshot.song_names)
+
+    @staticmethod
+    def build_controversy(
+        song_rank_collections: Dict[str, List[float]], song_name_map: Dict[str, str]
+    ) -> list[dict]:
+        """Controversy rows from {song_id: [relative ranks]}"""
         results = []
         for song_id, ranks in song_rank_collections.items():
             if len(ranks) < 2:
@@ -152,29 +112,15 @@ class AnalysisService:
 
     @staticmethod
     def compute_hot_takes(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> list[dict]:
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return []
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = {}
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings[sub.username] = rel_map
+        user_rel_rankings = snapshot.user_rankings(subgroup.id)
 
         if not user_rel_rankings:
             return []
@@ -188,8 +134,7 @@ class AnalysisService:
             sid: statistics.mean(ranks) for sid, ranks in song_ranks.items()
         }
 
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
+        song_name_map = snapshot.song_names
         
         results = []
         song_count = len(subgroup.song_ids)
@@ -213,8 +158,12 @@ class AnalysisService:
         return sorted(results, key=lambda x: abs(x["score"]), reverse=True)
 
     @staticmethod
-    def compute_spice_meter(franchise_id: str, db: Session) -> list[dict]:
-        subgroups = db.query(Subgroup).filter_by(franchise_id=to_uuid(franchise_id)).all()
+    def compute_spice_meter(
+        franchise_id: str, db: Session, snapshot: Optional[RankingSnapshot] = None
+    ) -> list[dict]:
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        snapshot.relativize_subgroups()
+        subgroups = snapshot.subgroups
         user_raw_data = defaultdict(dict)
         user_extreme_picks = defaultdict(list)
         all_usernames = set()
@@ -224,67 +173,52 @@ class AnalysisService:
                 continue
             
             song_count = len(sg.song_ids)
-            # Fetch all franchise data to determine if this user has songs for this group
-            submissions = (
-                db.query(Submission)
-                .filter(
-                    Submission.franchise_id == to_uuid(franchise_id),
-                    Submission.submission_status == SubmissionStatus.VALID
-                ).all()
-            )
-
-            user_rel_map = {}
-            for sub in submissions:
-                rel = RelativeRankingService.relativize(sub.parsed_rankings, sg.song_ids)
-                if rel:
-                    user_rel_map[sub.username] = rel
-                    all_usernames.add(sub.username)
-
-            # Pre-calculate averages for this subgroup (AFTER all submissions are processed)
-            sg_song_averages = {}
-            for sid in sg.song_ids:
-                o_ranks = [rks[sid] for uname, rks in user_rel_map.items() if sid in rks]
-                if o_ranks:
-                    sg_song_averages[sid] = statistics.mean(o_ranks)
-
-            # Batch fetch song names for this subgroup
-            songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in sg.song_ids])).all()
-            song_name_map = {str(s.id): s.name for s in songs}
+            user_rel_map = snapshot.user_rankings(sg.id)
+            if not user_rel_map:
+                continue
+            all_usernames.update(user_rel_map.keys())
+
+            # Column-wise community averages over the users x songs rank matrix
+            rank_matrix = RankMatrix.from_rank_maps(user_rel_map, sg.song_ids)
+            col_means = rank_matrix.column_means()
+            col_counts = rank_matrix.column_counts()
+            sg_song_averages = {
+                sid: avg
+                for sid, avg, count in zip(rank_matrix.song_ids, col_means.tolist(), col_counts.tolist())
+                if count
+            }
+
+            # Row-wise RMS of each user's deviation from those averages
+            deviations = np.where(rank_matrix.mask, rank_matrix.ranks - col_means, 0.0)
+            row_counts = rank_matrix.mask.sum(axis=1)
+            row_rms = np.sqrt((deviations ** 2).sum(axis=1) / np.maximum(row_counts, 1))
+            rms_by_user = dict(zip(rank_matrix.users, row_rms.tolist()))
+
+            song_name_map = snapshot.song_names
+            # Max RMS for perfectly inverted rankings = N/sqrt(3)
+            max_rms = song_count / math.sqrt(3)
 
             for target_user, target_ranks in user_rel_map.items():
-                sq_diffs = []
                 for song_id, user_rank in target_ranks.items():
-                    avg_others = sg_song_averages.get(song_id)
-                    if avg_others is not None:
-                        # Note: To be strictly "spice", it should be avg of OTHERS.
-                        # But community avg is a close and faster proxy for large N.
-                        # For precision, the rms calculation already excludes self in the original logic.
-                        # Let's stick to the original rms logic but optimize the "extreme picks" pass.
-                        sq_diffs.append((user_rank - avg_others) ** 2)
-                        
-                        dev = abs(user_rank - avg_others)
-                        # Collect ALL deviations - we'll take top N per group later
-                        user_extreme_picks[target_user].append({
-                            "song": song_name_map.get(song_id, "Unknown"),
-                            "group": sg.name,
-                            "user_rank": round(user_rank, 1),
-                            "avg_rank": round(avg_others, 1),
-                            "deviation": round(dev, 1)
-                        })
+                    avg_rank = sg_song_averages[song_id]
+                    # Collect ALL deviations - frontend takes top N per group
+                    user_extreme_picks[target_user].append({
+                        "song": song_name_map.get(song_id, "Unknown"),
+                        "group": sg.name,
+                        "user_rank": round(user_rank, 1),
+                        "avg_rank": round(avg_rank, 1),
+                        "deviation": round(abs(user_rank - avg_rank), 1)
+                    })
 
-                if sq_diffs:
-                    rms = math.sqrt(statistics.mean(sq_diffs))
-                    # Normalize to 0-100 range where 100 = theoretical maximum
-                    # Max RMS for perfectly inverted rankings = N/sqrt(3)
-                    # So: norm_spice = (rms / (N/sqrt(3))) * 100 = (rms * sqrt(3) / N) * 100
-                    max_rms = song_count / math.sqrt(3)
-                    norm_spice = (rms / max_rms) * 100 if max_rms > 0 else 0
-                    norm_spice = min(norm_spice, 100.0)  # Clamp to 100
-                    
-                    user_raw_data[target_user][sg.name] = {
-                        "spice": round(norm_spice, 2),
-                        "weight": song_count
-                    }
+                # Normalize to 0-100 range where 100 = theoretical maximum
+                # So: norm_spice = (rms / (N/sqrt(3))) * 100 = (rms * sqrt(3) / N) * 100
+                norm_spice = (rms_by_user[target_user] / max_rms) * 100 if max_rms > 0 else 0
+                norm_spice = min(norm_spice, 100.0)  # Clamp to 100
+
+                user_raw_data[target_user][sg.name] = {
+                    "spice": round(norm_spice, 2),
+                    "weight": song_count
+                }
 
         final_results = []
         for username in all_usernames:
@@ -318,98 +252,101 @@ class AnalysisService:
 
     @staticmethod
     def compute_community_rankings(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> list[dict]:
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        if snapshot is None and NormalizedRankingService.enabled():
+            return AnalysisService.compute_community_rankings_sql(franchise_id, subgroup_id, db)
+
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return []
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = []
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings.append(rel_map)
+        user_rel_rankings = [rel_map for _, rel_map in snapshot.relative_rankings(subgroup.id)]
 
         # Early return if no valid rankings
         if not user_rel_rankings:
             return []
 
-        # Map to store ranks by song_id
-        song_stats = defaultdict(list)
+        # Map to store (sum of ranks, count) by song_id
+        song_totals = {}
         for rel_map in user_rel_rankings:
             for song_id, rank in rel_map.items():
-                song_stats[song_id].append(rank)
+                pts, count = song_totals.get(song_id, (0.0, 0))
+                song_totals[song_id] = (pts + rank, count + 1)
 
-        # Get all songs in the subgroup to ensure full count
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
-        
+        return AnalysisService.build_community_rankings(
+            subgroup.song_ids, song_totals, snapshot.song_names
+        )
+
+    @staticmethod
+    def compute_community_rankings_sql(franchise_id: str, subgroup_id: str, db: Session) -> list[dict]:
+        """Same leaderboard as compute_community_rankings, aggregated by the database."""
+        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        if not subgroup or not subgroup.song_ids:
+            return []
+
+        song_totals = {
+            sid: (total, count)
+            for sid, (total, count, _) in NormalizedRankingService.song_stats(db, franchise_id, subgroup_id).items()
+        }
+        if not song_totals:
+            return []
+
+        song_name_map = {
+            str(s.id): s.name
+            for s in db.query(Song.id, Song.name).filter(Song.franchise_id == to_uuid(franchise_id)).all()
+        }
+        return AnalysisService.build_community_rankings(subgroup.song_ids, song_totals, song_name_map)
+
+    @staticmethod
+    def build_community_rankings(
+        song_ids: List[str],
+        song_totals: Dict[str, tuple],
+        song_name_map: Dict[str, str],
+    ) -> list[dict]:
+        """Leaderboard rows from {song_id: (sum of ranks, count)}"""
         # Calculate rank count as the fallback for completely unranked songs
-        total_songs_in_subgroup = len(subgroup.song_ids)
+        total_songs_in_subgroup = len(song_ids)
         
         results = []
-        # Iterate over subgroup.song_ids instead of song_stats keys to ensure 100% coverage
-        for sid in subgroup.song_ids:
+        # Iterate over song_ids instead of song_totals keys to ensure 100% coverage
+        for sid in song_ids:
             # Ensure consistent sid format for lookup
             sid_str = str(sid)
-            ranks = song_stats.get(sid_str, [])
+            pts, count = song_totals.get(sid_str, (0.0, 0))
             
-            if not ranks:
+            if not count:
                 # If no one ranked it, it gets the worst possible average (bottom of the pack)
                 avg = float(total_songs_in_subgroup)
                 pts = float(total_songs_in_subgroup)
             else:
-                avg = statistics.mean(ranks)
-                pts = sum(ranks)
+                # Relative ranks are multiples of 0.5, so the running sum is exact
+                avg = pts / count
                 
             results.append({
                 "song_id": sid_str,
                 "song_name": song_name_map.get(sid_str, "Unknown"),
                 "points": round(pts, 2),
                 "average": round(avg, 2),
-                "submission_count": len(ranks)
+                "submission_count": count
             })
 
         return sorted(results, key=lambda x: x["average"])
 
     @staticmethod
     def compute_most_disputed(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> list[dict]:
         """Find songs with the largest rank gap between users"""
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return []
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = []
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings.append(rel_map)
+        user_rel_rankings = [rel_map for _, rel_map in snapshot.relative_rankings(subgroup.id)]
 
         if not user_rel_rankings:
             return []
@@ -420,8 +357,7 @@ class AnalysisService:
                 song_ranks[song_id].append(rank)
 
 
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
+        song_name_map = snapshot.song_names
         
         results = []
         for song_id, ranks in song_ranks.items():
@@ -445,30 +381,16 @@ class AnalysisService:
 
     @staticmethod
     def compute_top_bottom_consensus(
-        franchise_id: str, subgroup_id: str, db: Session, limit: int = 10
+        franchise_id: str, subgroup_id: str, db: Session, limit: int = 10,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> dict:
         """Find songs universally ranked high or low (low std dev)"""
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return {"top": [], "bottom": []}
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = []
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings.append(rel_map)
+        user_rel_rankings = [rel_map for _, rel_map in snapshot.relative_rankings(subgroup.id)]
 
         if not user_rel_rankings:
             return {"top": [], "bottom": []}
@@ -478,8 +400,7 @@ class AnalysisService:
             for song_id, rank in rel_map.items():
                 song_ranks[song_id].append(rank)
 
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
+        song_name_map = snapshot.song_names
         
         # Calculate consistency for each song
         song_data = []
@@ -511,30 +432,16 @@ class AnalysisService:
 
     @staticmethod
     def compute_outlier_users(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> list[dict]:
         """Identify users with the most extreme rankings"""
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return []
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = {}
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings[sub.username] = rel_map
+        user_rel_rankings = snapshot.user_rankings(subgroup.id)
 
         if not user_rel_rankings:
             return []
@@ -549,8 +456,7 @@ class AnalysisService:
             sid: statistics.mean(ranks) for sid, ranks in song_ranks.items()
         }
 
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
+        song_name_map = snapshot.song_names
 
         # Calculate outlier score for each user
         results = []
@@ -585,30 +491,16 @@ class AnalysisService:
 
     @staticmethod
     def compute_comeback_songs(
-        franchise_id: str, subgroup_id: str, db: Session
+        franchise_id: str, subgroup_id: str, db: Session,
+        snapshot: Optional[RankingSnapshot] = None,
     ) -> list[dict]:
         """Identify sleeper/comeback songs - ranked very low by some, high by others"""
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
         if not subgroup or not subgroup.song_ids:
             return []
 
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
-
-        user_rel_rankings = []
-        for sub in submissions:
-            rel_map = RelativeRankingService.relativize(
-                sub.parsed_rankings, 
-                subgroup.song_ids
-            )
-            if rel_map:
-                user_rel_rankings.append(rel_map)
+        user_rel_rankings = [rel_map for _, rel_map in snapshot.relative_rankings(subgroup.id)]
 
         if not user_rel_rankings:
             return []
@@ -618,8 +510,7 @@ class AnalysisService:
             for song_id, rank in rel_map.items():
                 song_ranks[song_id].append(rank)
 
-        songs = db.query(Song).filter(Song.id.in_([UUID(sid) for sid in subgroup.song_ids])).all()
-        song_name_map = {str(s.id): s.name for s in songs}
+        song_name_map = snapshot.song_names
         
         results = []
         for song_id, ranks in song_ranks.items():
@@ -650,23 +541,19 @@ class AnalysisService:
 
     @staticmethod
     def compute_subunit_popularity(
-        franchise_id: str, db: Session
+        franchise_id: str, db: Session, snapshot: Optional[RankingSnapshot] = None
     ) -> list[dict]:
         """Aggregate rankings by subunit/artist to find strongest groups"""
+        if snapshot is None and NormalizedRankingService.enabled():
+            return AnalysisService.compute_subunit_popularity_sql(franchise_id, db)
+
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
         # Get all subunits for this franchise
-        subgroups = db.query(Subgroup).filter_by(franchise_id=to_uuid(franchise_id)).all()
-        
-        submissions = (
-            db.query(Submission)
-            .filter(
-                Submission.franchise_id == to_uuid(franchise_id),
-                Submission.submission_status == SubmissionStatus.VALID,
-            )
-            .all()
-        )
+        subgroups = snapshot.subgroups
 
-        if not submissions:
+        if not snapshot.submissions:
             return []
+        snapshot.relativize_subgroups()
 
         results = []
         
@@ -677,13 +564,8 @@ class AnalysisService:
             # Calculate average rank for songs in this subunit
             all_ranks = []
             
-            for sub in submissions:
-                rel_map = RelativeRankingService.relativize(
-                    sub.parsed_rankings,
-                    subgroup.song_ids
-                )
-                if rel_map:
-                    all_ranks.extend(rel_map.values())
+            for _, rel_map in snapshot.relative_rankings(subgroup.id):
+                all_ranks.extend(rel_map.values())
             
             if all_ranks:
                 avg_rank = statistics.mean(all_ranks)
@@ -697,6 +579,27 @@ class AnalysisService:
 
         return sorted(results, key=lambda x: x["avg_rank"])
 
+    @staticmethod
+    def compute_subunit_popularity_sql(franchise_id: str, db: Session) -> list[dict]:
+        """Same output as compute_subunit_popularity, aggregated by the database."""
+        totals = NormalizedRankingService.subgroup_stats(db, franchise_id)
+
+        results = []
+        for subgroup in db.query(Subgroup).filter_by(franchise_id=to_uuid(franchise_id)).all():
+            if not subgroup.song_ids:
+                continue
+            total, count = totals.get(str(subgroup.id), (0.0, 0))
+            if count:
+                results.append({
+                    "subgroup_name": subgroup.name,
+                    "song_count": len(subgroup.song_ids),
+                    "avg_rank": round(total / count, 2),
+                    "total_rankings": count,
+                    "is_subunit": getattr(subgroup, 'is_subunit', False)
+                })
+
+        return sorted(results, key=lambda x: x["avg_rank"])
+
 
 class ControversyIndexService:
     @staticmethod
@@ -743,14 +646,16 @@ class ControversyIndexService:
         users = db.query(Submission).filter(
             Submission.franchise_id == to_uuid(franchise_id),
             Submission.submission_status == SubmissionStatus.VALID,
+            Submission.is_current.is_(True),
             Submission.username.in_([user_a, user_b])
-        ).all()
-        
-        rank_maps = {}
+        ).order_by(Submission.created_at, Submission.id).all()
+
+        entries = []
         for sub in users:
-             rank_maps[sub.username] = RelativeRankingService.relativize(
-                sub.parsed_rankings, subgroup.song_ids
-             )
+            rel_map = RelativeRankingService.relativize(sub.parsed_rankings, subgroup.song_ids)
+            if rel_map:
+                entries.append((sub.username, sub.subgroup_id == subgroup.id, (sub.username, rel_map)))
+        rank_maps = dict(RelativeRankingService.pick_effective(entries))
 
         if user_a not in rank_maps or user_b not in rank_maps:
              return {"error": "One or both users have no data for this view."}
@@ -794,33 +699,32 @@ class ControversyIndexService:
 
     @staticmethod
     def compute_user_match(
-         franchise_id: str, subgroup_id: str, target_user: str, db: Session
+         franchise_id: str, subgroup_id: str, target_user: str, db: Session,
+         snapshot: Optional[RankingSnapshot] = None,
     ) -> dict:
-        # Reuse existing divergence calculation
-        result = AnalysisService.compute_divergence_matrix(franchise_id, subgroup_id, db)
-        matrix = result.get("matrix", {})
-        if target_user not in matrix:
+        # Only the target user's row is needed: O(U·S) instead of the full matrix
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
+        subgroup = snapshot.get_subgroup(subgroup_id)
+        if not subgroup or not subgroup.song_ids:
             return {"error": "User not found"}
-        
-        row = matrix[target_user]
-        # Remove self and sort
-        others = [(u, val) for u, val in row.items() if u != target_user]
-        others.sort(key=lambda x: x[1]) # Ascending divergence (Lower is better match)
-        
-        if not others:
-            return {"soulmates": [], "nemeses": []}
-            
-        return {
-            "soulmates": [{"user": u, "div": v} for u, v in others[:3]],
-            "nemeses": [{"user": u, "div": v} for u, v in others[-3:][::-1]]
-        }
+
+        user_rankings = snapshot.user_rankings(subgroup.id)
+        if target_user not in user_rankings:
+            return {"error": "User not found"}
+
+        rank_matrix = RankMatrix.from_rank_maps(user_rankings, subgroup.song_ids)
+        row = DivergenceEngine.divergence_row(rank_matrix, target_user)
+        soulmates, nemeses = NeighborIndexService.top_k(row, target_user)
+        return {"soulmates": soulmates, "nemeses": nemeses}
 
     @staticmethod
     def compute_conformity(
-         franchise_id: str, subgroup_id: str, db: Session
+         franchise_id: str, subgroup_id: str, db: Session,
+         snapshot: Optional[RankingSnapshot] = None,
     ) -> dict:
+        snapshot = snapshot or RankingSnapshot.load(franchise_id, db)
         # Get Consensus
-        community_ranks = AnalysisService.compute_community_rankings(franchise_id, subgroup_id, db)
+        community_ranks = AnalysisService.compute_community_rankings(franchise_id, subgroup_id, db, snapshot)
         if not community_ranks:
             return {}
         
@@ -829,15 +733,8 @@ class ControversyIndexService:
         # compute_community_rankings returns List[dict(song_id, rank, ...)]
         consensus_map = {str(r['song_id']): float(r['rank']) for r in community_ranks}
         
-        subgroup = db.query(Subgroup).filter_by(id=to_uuid(subgroup_id)).first()
-        subs = db.query(Submission).filter(
-             Submission.franchise_id == to_uuid(franchise_id),
-             Submission.submission_status == SubmissionStatus.VALID
-        ).all()
-        
         user_scores = []
-        for sub in subs:
-            user_map = RelativeRankingService.relativize(sub.parsed_rankings, subgroup.song_ids)
+        for username, user_map in snapshot.relative_rankings(subgroup_id):
             common = set(user_map.keys()) & set(consensus_map.keys())
             if len(common) < 5: continue
             
@@ -846,7 +743,7 @@ class ControversyIndexService:
             avg_diff = sum(diffs) / len(diffs)
             
             user_scores.append({
-                "username": sub.username,
+                "username": username,
                 "score": round(avg_diff, 2),
                 "song_count": len(common)
             })
@@ -887,6 +784,7 @@ class ControversyIndexService:
         sub = db.query(Submission).filter(
             Submission.franchise_id == to_uuid(franchise_id),
             Submission.submission_status == SubmissionStatus.VALID,
+            Submission.is_current.is_(True),
             Submission.username == username
         ).order_by(Submission.created_at.desc()).first()
 
@@ -0,0 +1,175 @@
+# app/services/analysis_responses.py
+
+import base64
+import gzip
+import logging
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import AnalysisResult
+from app.schemas import (AnalysisMetadata, CommunityRankResponse,
+                         CompactDivergenceResponse, ControversyResponse,
+                         DivergenceMatrixResponse,
+                         HotTakesResponse, SpiceMeterResponse)
+
+logger = logging.getLogger(__name__)
+
+
+def _divergence_parts(data):
+    """(matrix, rankings, song_names) of stored DIVERGENCE data."""
+    # Handle cached results (legacy check)
+    # If it's the new format, it has "matrix" key. If old, the top level is the matrix.
+    # We can check if "matrix" is in the keys, but user names might be keys too.
+    # A safe heuristic: New format keys are "matrix", "rankings", "song_names".
+    # Old format keys are usernames (strings).
+    is_new_format = "matrix" in data and isinstance(data["matrix"], dict)
+
+    if is_new_format:
+        return data["matrix"], data.get("rankings"), data.get("song_names")
+    else:
+        return data, None, None
+
+
+def _render_divergence(data, metadata: AnalysisMetadata) -> DivergenceMatrixResponse:
+    matrix, rankings, song_names = _divergence_parts(data)
+    return DivergenceMatrixResponse(
+        metadata=metadata,
+        matrix=matrix,
+        rankings=rankings,
+        song_names=song_names,
+    )
+
+
+class AnalysisResponseService:
+    """
+    Builds the GET response of a stored analysis type, and its encoded
+    bytes for AnalysisResult.response_body.
+
+    Encoding once when the result is stored means a GET streams the bytes
+    as they are instead of parsing result_data and re-validating and
+    re-serializing it through the response model on every request.
+    """
+
+    RENDERERS = {
+        "COMMUNITY_RANK": lambda data, metadata: CommunityRankResponse(metadata=metadata, rankings=data),
+        "DIVERGENCE": _render_divergence,
+        "CONTROVERSY": lambda data, metadata: ControversyResponse(metadata=metadata, results=data),
+        "TAKES": lambda data, metadata: HotTakesResponse(metadata=metadata, takes=data),
+        "SPICE": lambda data, metadata: SpiceMeterResponse(metadata=metadata, results=data),
+    }
+
+    @staticmethod
+    def render(analysis_type: str, data: Any, computed_at: datetime, based_on_submissions: int) -> BaseModel:
+        metadata = AnalysisMetadata(computed_at=computed_at, based_on_submissions=based_on_submissions)
+        return AnalysisResponseService.RENDERERS[analysis_type](data, metadata)
+
+    @staticmethod
+    def encode(
+        analysis_type: str, data: Any, computed_at: datetime, based_on_submissions: int
+    ) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        (body, content encoding) to store with a result: gzip unless
+        stored_response_gzip_level is 0, then "identity". (None, None) when
+        the type has no response model or the data doesn't fit it; routes
+        then render result_data per request as before.
+        """
+        if analysis_type not in AnalysisResponseService.RENDERERS:
+            return None, None
+        try:
+            model = AnalysisResponseService.render(analysis_type, data, computed_at, based_on_submissions)
+        except Exception as e:
+            logger.warning(f"Could not encode {analysis_type} response: {str(e)}")
+            return None, None
+        return AnalysisResponseService.encode_model(model)
+
+    @staticmethod
+    def response_encoding(accepts_gzip: bool) -> str:
+        """The content encoding encode_model produces for a client: "gzip"
+        when it accepts gzip and stored_response_gzip_level is above 0."""
+        return "gzip" if accepts_gzip and settings.stored_response_gzip_level > 0 else "identity"
+
+    @staticmethod
+    def encode_model(model: BaseModel, gzip_level: Optional[int] = None) -> Tuple[bytes, str]:
+        """(JSON bytes, content encoding) of a response model. gzip_level
+        defaults to stored_response_gzip_level; 0 leaves the body uncompressed."""
+        body = model.model_dump_json().encode()
+        if gzip_level is None:
+            gzip_level = settings.stored_response_gzip_level
+        if gzip_level <= 0:
+            return body, "identity"
+        # mtime=0 keeps the bytes a pure function of the body
+        return gzip.compress(body, compresslevel=gzip_level, mtime=0), "gzip"
+
+    @staticmethod
+    def compact_divergence(
+        data: Any, computed_at: datetime, based_on_submissions: int, array_encoding: str = "json"
+    ) -> CompactDivergenceResponse:
+        """
+        A stored DIVERGENCE result as CompactDivergenceResponse: each username
+        and song id is sent once and the symmetric matrix only by its upper
+        triangle. float16 keeps 11 significant bits: half-step relative
+        ranks below 1024 are exact, but a divergence is only kept to within
+        1/2048 of its value (±0.016 at 32, ±0.031 at 64), so divergences of
+        16 and up lose their second decimal.
+        """
+        full_matrix, rankings, song_names = _divergence_parts(data)
+        rankings, song_names = rankings or {}, song_names or {}
+        users = list(full_matrix)
+        song_ids = list(rankings)
+
+        matrix = []
+        for i, user in enumerate(users):
+            row = full_matrix[user]
+            matrix.extend(row.get(other, 0.0) for other in users[i + 1:])
+        ranks = [rankings[song_id].get(user) for song_id in song_ids for user in users]
+
+        if array_encoding == "float16":
+            matrix = AnalysisResponseService._float16_base64(matrix)
+            ranks = AnalysisResponseService._float16_base64(ranks)
+
+        return CompactDivergenceResponse(
+            metadata=AnalysisMetadata(computed_at=computed_at, based_on_submissions=based_on_submissions),
+            users=users,
+            song_ids=song_ids,
+            song_names=[song_names.get(song_id) for song_id in song_ids],
+            array_encoding=array_encoding,
+            matrix=matrix,
+            rankings=ranks,
+        )
+
+    @staticmethod
+    def _float16_base64(values: list) -> str:
+        array = np.array([np.nan if v is None else v for v in values], dtype="<f2")
+        return base64.b64encode(array.tobytes()).decode()
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """Encodes stored results saved before response bodies existed. Returns how many were encoded."""
+        pending = [
+            row.id for row in db.query(AnalysisResult.id).filter(
+                AnalysisResult.response_encoding.is_(None),
+                AnalysisResult.analysis_type.in_(list(AnalysisResponseService.RENDERERS)),
+            )
+        ]
+        encoded = 0
+        # One at a time: a body can be several MB
+        for result_id in pending:
+            result = db.get(AnalysisResult, result_id)
+            body, encoding = AnalysisResponseService.encode(
+                result.analysis_type, result.result_data, result.computed_at, result.based_on_submissions
+            )
+            if body is None:
+                continue
+            result.response_body, result.response_encoding = body, encoding
+            db.commit()
+            db.expunge(result)
+            encoded += 1
+
+        if encoded:
+            logger.info(f"✓ Encoded response bodies for {encoded} stored analyses")
+        return encoded
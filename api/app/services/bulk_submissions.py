@@ -0,0 +1,177 @@
+# app/services/bulk_submissions.py
+
+import logging
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.jobs.analysis_scheduler import mark_dirty
+from app.models import Franchise, Subgroup, Submission, SubmissionStatus
+from app.schemas import BulkSubmissionResult, SubmitRankingRequest
+from app.services.current_submissions import CurrentSubmissionService
+from app.services.matching import StrictSongMatcher
+from app.services.normalized_rankings import NormalizedRankingService
+from app.services.packed_rankings import PackedRankingService
+from app.services.tie_handling import TieHandlingService
+
+logger = logging.getLogger(__name__)
+
+
+class _SubgroupInfo(NamedTuple):
+    id: UUID
+    name: str
+    song_ids: list
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'line'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+
+class BulkSubmissionIngest:
+    """
+    Stores NDJSON submission lines the same way POST /submit does, one
+    transaction per batch instead of one per ranking.
+
+    Franchise and subgroup lookups, song slot maps and the matcher's song
+    index are shared by every line of the request. Lookups are kept as
+    plain values so commits between batches don't force reloads.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.accepted_ids: List[UUID] = []
+        # Names of franchises whose stored analyses this ingest made dirty
+        self.franchises: Set[str] = set()
+        self._franchise_ids: Dict[str, Optional[UUID]] = {}
+        self._subgroups: Dict[UUID, List[_SubgroupInfo]] = {}
+        self._index_maps: Dict[UUID, Dict[str, int]] = {}
+
+    def _franchise_id(self, name: str) -> Optional[UUID]:
+        if name not in self._franchise_ids:
+            row = self.db.query(Franchise.id).filter(Franchise.name == name).first()
+            self._franchise_ids[name] = row.id if row else None
+        return self._franchise_ids[name]
+
+    def _franchise_subgroups(self, franchise_id: UUID) -> List[_SubgroupInfo]:
+        if franchise_id not in self._subgroups:
+            self._subgroups[franchise_id] = [
+                _SubgroupInfo(row.id, row.name, row.song_ids)
+                for row in self.db.query(Subgroup.id, Subgroup.name, Subgroup.song_ids).filter(
+                    Subgroup.franchise_id == franchise_id
+                ).all()
+            ]
+        return self._subgroups[franchise_id]
+
+    def _index_map(self, franchise_id: UUID) -> Dict[str, int]:
+        if franchise_id not in self._index_maps:
+            self._index_maps[franchise_id] = PackedRankingService.song_index_map(self.db, franchise_id)
+        return self._index_maps[franchise_id]
+
+    def process(self, lines: List[Tuple[int, str]]) -> List[BulkSubmissionResult]:
+        """Stores one batch of (line_num, json) lines and commits. Results keep input order."""
+        results: Dict[int, BulkSubmissionResult] = {}
+        pending = []  # (line_num, submission, matched, conflicts)
+        franchise_names: Dict[UUID, str] = {}
+
+        for line_num, line in lines:
+            try:
+                request = SubmitRankingRequest.model_validate_json(line)
+            except ValidationError as e:
+                results[line_num] = BulkSubmissionResult(line_num=line_num, status="ERROR", error=_describe(e))
+                continue
+
+            franchise_id = self._franchise_id(request.franchise)
+            if not franchise_id:
+                results[line_num] = BulkSubmissionResult(
+                    line_num=line_num, status="ERROR", error="Franchise not found"
+                )
+                continue
+            franchise_names[franchise_id] = request.franchise
+            subgroup = next(
+                (sg for sg in self._franchise_subgroups(franchise_id) if sg.name == request.subgroup_name), None
+            )
+            if not subgroup:
+                results[line_num] = BulkSubmissionResult(
+                    line_num=line_num, status="ERROR", error="Subgroup not found"
+                )
+                continue
+
+            matched, conflicts = StrictSongMatcher.parse_ranking_text(
+                request.ranking_list, request.franchise, self.db
+            )
+            submission = Submission(
+                username=request.username,
+                franchise_id=franchise_id,
+                subgroup_id=subgroup.id,
+                raw_ranking_text=request.ranking_list,
+            )
+            if conflicts:
+                submission.submission_status = SubmissionStatus.CONFLICTED
+                submission.conflict_report = conflicts
+            self.db.add(submission)
+            pending.append((line_num, submission, matched, conflicts))
+
+        valid = [entry for entry in pending if not entry[3]]
+        final_ranks = TieHandlingService.convert_tied_ranks_batch([matched for _, _, matched, _ in valid])
+        valid_by_franchise = defaultdict(list)
+        for (_, submission, _, _), ranks in zip(valid, final_ranks):
+            submission.parsed_rankings = ranks
+            submission.submission_status = SubmissionStatus.VALID
+            franchise_id = submission.franchise_id
+            PackedRankingService.pack_submission(self.db, submission, self._index_map(franchise_id))
+            valid_by_franchise[franchise_id].append(submission)
+
+        try:
+            self.db.flush()
+            accepted = []
+            for franchise_id, submissions in valid_by_franchise.items():
+                subgroups = self._subgroups[franchise_id]
+                # A later line for the same user and subgroup replaces an earlier one
+                replaced = CurrentSubmissionService.supersede(self.db, submissions)
+                current = [s for s in submissions if s.is_current]
+                NormalizedRankingService.index_new_submissions(self.db, current, subgroups)
+                touched = [
+                    sg.id for sg in subgroups
+                    if sg.song_ids and (
+                        replaced or any(not s.parsed_rankings.keys().isdisjoint(sg.song_ids) for s in submissions)
+                    )
+                ]
+                mark_dirty(self.db, franchise_id, touched)
+                accepted.extend(s.id for s in current)
+
+            # Read back before commit expires the instances
+            stored = [
+                (line_num, submission.id, submission.submission_status.name,
+                 len(submission.parsed_rankings or matched), conflicts)
+                for line_num, submission, matched, conflicts in pending
+            ]
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            # Slots assigned inside the failed transaction are gone
+            self._index_maps.clear()
+            logger.error(f"Bulk submission batch failed: {str(e)}")
+            for line_num, _, _, _ in pending:
+                results[line_num] = BulkSubmissionResult(
+                    line_num=line_num, status="ERROR", error="Batch could not be stored"
+                )
+            return [results[line_num] for line_num, _ in lines]
+
+        for line_num, submission_id, status, parsed_count, conflicts in stored:
+            results[line_num] = BulkSubmissionResult(
+                line_num=line_num,
+                submission_id=submission_id,
+                status=status,
+                parsed_count=parsed_count,
+                conflicts=conflicts or None,
+            )
+        self.accepted_ids.extend(accepted)
+        self.franchises.update(franchise_names[franchise_id] for franchise_id in valid_by_franchise)
+        return [results[line_num] for line_num, _ in lines]
@@ -0,0 +1,123 @@
+# app/services/compute_gate.py
+
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import database
+from app.config import settings
+
+
+class ComputeGate:
+    """
+    Runs blocking work on the threadpool so the event loop keeps serving
+    other requests while an analysis is being computed.
+
+    At most `limit` calls run at once. A call whose key matches one that
+    is already in flight awaits that result instead of computing again.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def run(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._execute(key, func, args, kwargs))
+            # Nobody may be left awaiting a failed task (all clients gone)
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._in_flight[key] = task
+        # Shielded: one disconnecting caller must not cancel the shared work
+        return await asyncio.shield(task)
+
+    async def _execute(self, key, func, args, kwargs):
+        try:
+            async with self._semaphore:
+                return await run_in_threadpool(func, *args, **kwargs)
+        finally:
+            self._in_flight.pop(key, None)
+
+
+class SingleFlight:
+    """
+    Thread-safe counterpart of ComputeGate's coalescing for code that is
+    already off the event loop: the first caller for a key runs `func`,
+    concurrent callers with the same key block and receive its result
+    (or its exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+analysis_gate = ComputeGate(settings.analysis_max_concurrency)
+
+
+def offloaded(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Turns a synchronous route handler into an async one that runs through
+    `analysis_gate`. Concurrent calls with the same query parameters share
+    one execution.
+
+    Session parameters are not injected per request: the shared execution
+    opens its own read session and closes it when done. A request-scoped
+    session would be closed by its request's teardown if that client
+    disconnected, while joined callers were still using it.
+    """
+    signature = inspect.signature(func)
+    session_params = [name for name, param in signature.parameters.items() if param.annotation is Session]
+
+    def call(**kwargs):
+        sessions = {name: database.get_read_session() for name in session_params}
+        try:
+            return func(**kwargs, **sessions)
+        finally:
+            for session in sessions.values():
+                session.close()
+
+    @functools.wraps(func)
+    async def wrapper(**kwargs):
+        key = (func.__qualname__, *sorted(kwargs.items()))
+        return await analysis_gate.run(key, call, **kwargs)
+
+    # FastAPI reads this signature, so it no longer opens a session per request
+    wrapper.__signature__ = signature.replace(parameters=[
+        param for name, param in signature.parameters.items() if name not in session_params
+    ])
+    return wrapper
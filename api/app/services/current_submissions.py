@@ -0,0 +1,138 @@
+# app/services/current_submissions.py
+
+import logging
+from collections import defaultdict
+from typing import Dict, List
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.jobs.analysis_scheduler import mark_dirty
+from app.models import Subgroup, SubgroupAggregate, Submission, SubmissionStatus
+from app.services.normalized_rankings import NormalizedRankingService
+
+logger = logging.getLogger(__name__)
+
+
+class CurrentSubmissionService:
+    """
+    Maintains Submission.is_current: set on the latest VALID submission of
+    each (username, franchise, subgroup) and cleared on every other row.
+
+    Submissions stay append-only, but analyses load current rows only, so
+    a user who resubmits is counted once. Replaced rows also lose their
+    submission_rankings rows, and the franchise's running aggregates are
+    dropped so the next incremental update reseeds without them.
+    """
+
+    # Ids per IN (...) list during backfill
+    UPDATE_BATCH = 500
+
+    @staticmethod
+    def drop_aggregates(db: Session, franchise_id: UUID):
+        """
+        Drops the franchise's running aggregates, for writes that take a
+        ranking back out of them. Does not commit.
+        """
+        # Running aggregates can't subtract a ranking
+        db.query(SubgroupAggregate).filter(
+            SubgroupAggregate.franchise_id == franchise_id
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def _forget(db: Session, franchise_id: UUID, replaced: List[UUID]):
+        NormalizedRankingService.remove_submissions(db, replaced)
+        CurrentSubmissionService.drop_aggregates(db, franchise_id)
+
+    @staticmethod
+    def replace(db: Session, franchise_id: UUID, subgroup_id: UUID, current: Dict[str, UUID]) -> List[UUID]:
+        """
+        Clears is_current on the stored rows of every username in `current`
+        (within one franchise and subgroup) except current[username].
+        Returns the ids that stopped being current. Does not commit.
+        """
+        if not current:
+            return []
+        replaced = [
+            row.id for row in db.query(Submission.id).filter(
+                Submission.username.in_(list(current)),
+                Submission.franchise_id == franchise_id,
+                Submission.subgroup_id == subgroup_id,
+                Submission.is_current.is_(True),
+                Submission.id.notin_(list(current.values())),
+            )
+        ]
+        if replaced:
+            db.query(Submission).filter(Submission.id.in_(replaced)).update(
+                {Submission.is_current: False}, synchronize_session=False
+            )
+            CurrentSubmissionService._forget(db, franchise_id, replaced)
+        return replaced
+
+    @staticmethod
+    def supersede(db: Session, submissions: List[Submission]) -> List[UUID]:
+        """
+        Makes new VALID submissions current. Of several with the same key
+        the last one wins. Flushes, does not commit; returns the ids of
+        stored rows that were replaced.
+        """
+        latest = {}
+        for submission in submissions:
+            latest[(submission.username, submission.franchise_id, submission.subgroup_id)] = submission
+        for submission in submissions:
+            submission.is_current = latest[(submission.username, submission.franchise_id, submission.subgroup_id)] is submission
+        db.flush()
+
+        by_group = defaultdict(dict)
+        for (username, franchise_id, subgroup_id), submission in latest.items():
+            by_group[(franchise_id, subgroup_id)][username] = submission.id
+
+        replaced = []
+        for (franchise_id, subgroup_id), current in by_group.items():
+            replaced.extend(CurrentSubmissionService.replace(db, franchise_id, subgroup_id, current))
+        return replaced
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """Flags rows stored before is_current existed. Returns how many rows were replaced."""
+        if db.query(Submission.id).filter(Submission.is_current.is_(None)).first() is None:
+            return 0
+
+        rows = db.query(
+            Submission.id, Submission.username, Submission.franchise_id, Submission.subgroup_id
+        ).filter(
+            Submission.submission_status == SubmissionStatus.VALID
+        ).order_by(Submission.created_at, Submission.id).all()
+
+        latest = {}
+        for row in rows:
+            latest[(row.username, row.franchise_id, row.subgroup_id)] = row.id
+        current_ids = list(latest.values())
+
+        batch = CurrentSubmissionService.UPDATE_BATCH
+        for start in range(0, len(current_ids), batch):
+            db.query(Submission).filter(Submission.id.in_(current_ids[start:start + batch])).update(
+                {Submission.is_current: True}, synchronize_session=False
+            )
+        db.query(Submission).filter(Submission.is_current.isnot(True)).update(
+            {Submission.is_current: False}, synchronize_session=False
+        )
+
+        replaced = defaultdict(list)
+        current = set(current_ids)
+        for row in rows:
+            if row.id not in current:
+                replaced[row.franchise_id].append(row.id)
+        for franchise_id, submission_ids in replaced.items():
+            for start in range(0, len(submission_ids), batch):
+                CurrentSubmissionService._forget(db, franchise_id, submission_ids[start:start + batch])
+            mark_dirty(
+                db,
+                franchise_id,
+                [row.id for row in db.query(Subgroup.id).filter(Subgroup.franchise_id == franchise_id).all()]
+            )
+        db.commit()
+
+        replaced_count = sum(len(ids) for ids in replaced.values())
+        logger.info(f"✓ Flagged {len(current_ids)} current submissions ({replaced_count} superseded)")
+        return replaced_count
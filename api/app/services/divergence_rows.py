@@ -0,0 +1,214 @@
+# app/services/divergence_rows.py
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import and_, exists, func, insert
+from sqlalchemy.orm import Session
+
+from app.models import AnalysisResult, DivergenceRow
+from app.services.rank_matrix import DivergenceEngine, RankMatrix
+
+logger = logging.getLogger(__name__)
+
+
+class DivergenceRowService:
+    """
+    Stores a subgroup's divergence matrix as one divergence_rows row per
+    user, so an incremental update writes only the submitting user's row.
+
+    The user's column is not rewritten. Each row carries a version, and
+    the value of a pair is read from whichever of its two rows is newer:
+    a fresh row holds current values against every user, while older
+    rows still hold stale ones for that user. matrix_data reassembles the
+    full DIVERGENCE payload; the scheduler does that once per burst of
+    submissions, not once per submission.
+    """
+
+    INSERT_BATCH = 500
+
+    @staticmethod
+    def _filter(query, franchise_id: UUID, subgroup_id: UUID):
+        return query.filter(
+            DivergenceRow.franchise_id == franchise_id,
+            DivergenceRow.subgroup_id == subgroup_id,
+        )
+
+    @staticmethod
+    def rebuild(db: Session, franchise_id: UUID, subgroup_id: UUID, data: dict, computed_at: datetime):
+        """
+        Replaces a subgroup's rows with a freshly computed DIVERGENCE payload,
+        stamped with the stored result's computed_at. Does not commit.
+        """
+        DivergenceRowService._filter(db.query(DivergenceRow), franchise_id, subgroup_id).delete(
+            synchronize_session=False
+        )
+
+        user_ranks = {username: {} for username in data["matrix"]}
+        for song_id, per_user in (data.get("rankings") or {}).items():
+            for username, rank in per_user.items():
+                user_ranks.setdefault(username, {})[song_id] = rank
+
+        rows = []
+        for username, row in data["matrix"].items():
+            rows.append({
+                "franchise_id": franchise_id,
+                "subgroup_id": subgroup_id,
+                "username": username,
+                "ranks": user_ranks[username],
+                "divergences": row,
+                "version": 0,
+                "updated_at": computed_at,
+            })
+            if len(rows) >= DivergenceRowService.INSERT_BATCH:
+                db.execute(insert(DivergenceRow), rows)
+                rows = []
+        if rows:
+            db.execute(insert(DivergenceRow), rows)
+
+    @staticmethod
+    def update_user(
+        db: Session, franchise_id: UUID, subgroup_id: UUID, username: str,
+        rel_map: Dict[str, float], known_users: Optional[Set[str]] = None,
+    ) -> Optional[Dict[str, float]]:
+        """
+        Computes and stores `username`'s row in O(U·S) from every user's
+        ranks. Rows of users outside `known_users`, when given, are dropped.
+        Returns the new row, or None if the subgroup has no rows yet (no
+        full recompute has run). Does not commit.
+        """
+        rows = DivergenceRowService._filter(
+            db.query(DivergenceRow.username, DivergenceRow.ranks, DivergenceRow.version),
+            franchise_id, subgroup_id,
+        ).all()
+        if not rows:
+            return None
+
+        user_maps = {
+            row.username: row.ranks or {} for row in rows
+            if row.username != username and (known_users is None or row.username in known_users)
+        }
+        user_maps[username] = dict(rel_map)
+        divergences = DivergenceEngine.divergence_row(RankMatrix.from_rank_maps(user_maps), username)
+
+        if known_users is not None:
+            gone = [row.username for row in rows if row.username not in user_maps]
+            if gone:
+                DivergenceRowService._filter(db.query(DivergenceRow), franchise_id, subgroup_id).filter(
+                    DivergenceRow.username.in_(gone)
+                ).delete(synchronize_session=False)
+
+        version = max(row.version or 0 for row in rows) + 1
+        entry = DivergenceRowService._filter(db.query(DivergenceRow), franchise_id, subgroup_id).filter(
+            DivergenceRow.username == username
+        ).first()
+        if entry is None:
+            entry = DivergenceRow(franchise_id=franchise_id, subgroup_id=subgroup_id, username=username)
+            db.add(entry)
+        entry.ranks, entry.divergences = dict(rel_map), divergences
+        entry.version, entry.updated_at = version, datetime.utcnow()
+        return divergences
+
+    @staticmethod
+    def matrix_data(
+        db: Session, franchise_id: UUID, subgroup_id: UUID, song_name_map: Dict[str, str]
+    ) -> Optional[dict]:
+        """
+        The DIVERGENCE payload ({"matrix", "rankings", "song_names"}, rows in
+        sorted username order) assembled from the stored rows, or None if
+        there are none. O(U²); run it once per burst of updates.
+        """
+        rows = DivergenceRowService._filter(
+            db.query(DivergenceRow.username, DivergenceRow.ranks, DivergenceRow.divergences, DivergenceRow.version),
+            franchise_id, subgroup_id,
+        ).all()
+        if not rows:
+            return None
+        rows.sort(key=lambda row: row.username)
+
+        users = [row.username for row in rows]
+        values = np.array([DivergenceRowService._aligned(row.divergences or {}, users) for row in rows])
+        versions = np.array([row.version or 0 for row in rows])
+        # Each pair comes from the newer of its two rows, which was computed
+        # against the other user's current ranks
+        values = np.where(versions[:, None] >= versions[None, :], values, values.T)
+        np.fill_diagonal(values, 0.0)
+        matrix = {user: dict(zip(users, row)) for user, row in zip(users, values.tolist())}
+
+        rankings = {}
+        for row in rows:
+            for song_id, rank in (row.ranks or {}).items():
+                rankings.setdefault(song_id, {})[row.username] = rank
+
+        return {
+            "matrix": matrix,
+            "rankings": rankings,
+            "song_names": {sid: song_name_map[sid] for sid in rankings if sid in song_name_map},
+        }
+
+    @staticmethod
+    def _aligned(divergences: Dict[str, float], users: list) -> list:
+        # Rows written together share the same keys in the same order
+        if len(divergences) == len(users) and list(divergences) == users:
+            return list(divergences.values())
+        return [divergences.get(user, 0.0) for user in users]
+
+    @staticmethod
+    def remove_user(db: Session, franchise_id: UUID, username: str):
+        """Drops a user's rows in every subgroup of a franchise. Does not commit."""
+        db.query(DivergenceRow).filter(
+            DivergenceRow.franchise_id == franchise_id,
+            DivergenceRow.username == username,
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def backfill(db: Session) -> list:
+        """
+        Builds rows for stored DIVERGENCE results that have none. Returns
+        the (franchise_id, subgroup_id) scopes whose rows are newer than
+        their stored result, i.e. updates whose rewrite never ran.
+        """
+        pending = db.query(AnalysisResult.id).filter(
+            AnalysisResult.analysis_type == "DIVERGENCE",
+            AnalysisResult.subgroup_id.isnot(None),
+            ~exists().where(and_(
+                DivergenceRow.franchise_id == AnalysisResult.franchise_id,
+                DivergenceRow.subgroup_id == AnalysisResult.subgroup_id,
+            )),
+        ).all()
+
+        built = 0
+        for row in pending:
+            result = db.get(AnalysisResult, row.id)
+            data = result.result_data or {}
+            # The legacy matrix-only format is replaced on the next recompute
+            if isinstance(data.get("matrix"), dict) and data.get("rankings") is not None:
+                DivergenceRowService.rebuild(
+                    db, result.franchise_id, result.subgroup_id, data, result.computed_at
+                )
+                built += 1
+            db.expunge(result)
+        db.commit()
+        if built:
+            logger.info(f"✓ Built divergence rows for {built} subgroups")
+
+        latest = (
+            db.query(
+                DivergenceRow.franchise_id, DivergenceRow.subgroup_id,
+                func.max(DivergenceRow.updated_at).label("updated_at"),
+            )
+            .group_by(DivergenceRow.franchise_id, DivergenceRow.subgroup_id)
+            .subquery()
+        )
+        return [
+            (row.franchise_id, row.subgroup_id) for row in db.query(latest.c.franchise_id, latest.c.subgroup_id)
+            .join(AnalysisResult, and_(
+                AnalysisResult.franchise_id == latest.c.franchise_id,
+                AnalysisResult.subgroup_id == latest.c.subgroup_id,
+                AnalysisResult.analysis_type == "DIVERGENCE",
+            ))
+            .filter(latest.c.updated_at > AnalysisResult.computed_at)
+        ]
@@ -0,0 +1,56 @@
+# app/services/incremental.py
+
+from typing import Dict, Iterable, List
+
+from app.services.analysis import AnalysisService
+
+
+class IncrementalAnalysisService:
+    """
+    Folds a single new submission into stored analysis data instead of
+    recomputing a whole franchise.
+
+    Per-song running aggregates (sum, sum of squares, count and a rank
+    histogram) rebuild COMMUNITY_RANK and CONTROVERSY in O(S). DIVERGENCE
+    is updated through DivergenceRowService.
+    """
+
+    @staticmethod
+    def add_ranks(song_stats: Dict[str, dict], rel_map: Dict[str, float]) -> Dict[str, dict]:
+        """Adds one user's relative ranks to the running aggregates (in place)."""
+        for song_id, rank in rel_map.items():
+            entry = song_stats.setdefault(
+                song_id, {"sum": 0.0, "sum_sq": 0.0, "count": 0, "hist": {}}
+            )
+            entry["sum"] += rank
+            entry["sum_sq"] += rank * rank
+            entry["count"] += 1
+            # JSON object keys must be strings
+            key = str(rank)
+            entry["hist"][key] = entry["hist"].get(key, 0) + 1
+        return song_stats
+
+    @staticmethod
+    def stats_from_rankings(rel_maps: Iterable[Dict[str, float]]) -> Dict[str, dict]:
+        song_stats = {}
+        for rel_map in rel_maps:
+            IncrementalAnalysisService.add_ranks(song_stats, rel_map)
+        return song_stats
+
+    @staticmethod
+    def community_rankings(
+        song_ids: List[str], song_stats: Dict[str, dict], song_name_map: Dict[str, str]
+    ) -> list[dict]:
+        song_totals = {sid: (entry["sum"], entry["count"]) for sid, entry in song_stats.items()}
+        return AnalysisService.build_community_rankings(song_ids, song_totals, song_name_map)
+
+    @staticmethod
+    def controversy(song_stats: Dict[str, dict], song_name_map: Dict[str, str]) -> list[dict]:
+        # Expand histograms back into rank lists so quartiles match a full recompute
+        song_ranks = {}
+        for sid, entry in song_stats.items():
+            ranks = []
+            for rank, count in entry["hist"].items():
+                ranks.extend([float(rank)] * count)
+            song_ranks[sid] = ranks
+        return AnalysisService.build_controversy(song_ranks, song_name_map)
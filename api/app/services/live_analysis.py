@@ -0,0 +1,100 @@
+# app/services/live_analysis.py
+
+import logging
+from datetime import datetime
+from typing import Any, Callable, NamedTuple, Tuple
+from uuid import UUID
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from app import database
+from app.jobs.analysis_scheduler import index_divergence, update_analysis_record
+from app.models import Submission, SubmissionStatus
+from app.services.compute_gate import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_live_flight = SingleFlight()
+
+
+class LiveResult(NamedTuple):
+    data: Any
+    computed_at: datetime
+    based_on_submissions: int
+
+
+class LiveAnalysisService:
+    """
+    Fallback for analyses that have no stored AnalysisResult yet.
+
+    Concurrent requests for the same (franchise, subgroup, analysis type,
+    data version) share a single computation, and the result is written
+    back so later requests are served from storage.
+    """
+
+    @staticmethod
+    def data_version_query(franchise_id: UUID) -> Select:
+        """data_version as a statement, for async sessions."""
+        return select(func.count(Submission.id), func.max(Submission.created_at)).filter(
+            Submission.franchise_id == franchise_id,
+            Submission.submission_status == SubmissionStatus.VALID,
+            Submission.is_current.is_(True),
+        )
+
+    @staticmethod
+    def data_version(franchise_id: UUID, db: Session) -> Tuple[int, Any]:
+        """(valid submission count, latest submission time) for a franchise."""
+        return tuple(db.execute(LiveAnalysisService.data_version_query(franchise_id)).one())
+
+    @staticmethod
+    def get_or_compute(
+        franchise_id: UUID,
+        subgroup_id,
+        analysis_type: str,
+        compute: Callable[[], Any],
+        db: Session,
+    ) -> LiveResult:
+        """
+        `compute` takes no arguments and returns the result data.
+        subgroup_id is None for franchise-wide analyses (SPICE).
+        """
+        version = LiveAnalysisService.data_version(franchise_id, db)
+        key = (
+            str(franchise_id),
+            str(subgroup_id) if subgroup_id else None,
+            analysis_type,
+            version,
+        )
+        return _live_flight.do(
+            key, LiveAnalysisService._compute_and_store,
+            franchise_id, subgroup_id, analysis_type, compute, version[0], db,
+        )
+
+    @staticmethod
+    def _compute_and_store(franchise_id, subgroup_id, analysis_type, compute, sub_count, db: Session) -> LiveResult:
+        data = compute()
+        live = LiveResult(data, datetime.utcnow(), sub_count)
+
+        # Same rule as the scheduler: empty subgroup results are not stored
+        if not data and analysis_type != "SPICE":
+            return live
+
+        # `db` may come from the read-only pool; the write gets its own session
+        writer = database.get_session()
+        try:
+            record = update_analysis_record(
+                writer, franchise_id, subgroup_id, analysis_type, data, live.based_on_submissions
+            )
+            if analysis_type == "DIVERGENCE":
+                index_divergence(writer, record)
+            # Report the stored timestamp so this response matches later cached ones
+            live = live._replace(computed_at=record.computed_at)
+            writer.commit()
+        except Exception as e:
+            # Another process may have stored it first; the computed data is still valid
+            writer.rollback()
+            logger.warning(f"Could not store live {analysis_type} result: {str(e)}")
+        finally:
+            writer.close()
+        return live
@@ -1,12 +1,28 @@
 # app/services/matching.py
 
-import difflib
 import re
-from typing import Dict, Tuple
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
 from app.models import Franchise, Song
+from app.services.suggestions import SuggestionIndex
+
+
+class SongIndex(NamedTuple):
+    """Immutable per-franchise lookup: normalized name -> (song id, display name)."""
+    version: int
+    songs: Dict[str, Tuple[str, str]]
+    suggestions: SuggestionIndex
+
+
+# Process-wide cache, keyed by franchise name. A franchise's version is bumped
+# by StrictSongMatcher.invalidate; an index built under an older version is
+# rebuilt on next use.
+_indexes: Dict[str, SongIndex] = {}
+_versions: Dict[str, int] = {}
+_index_lock = threading.Lock()
 
 
 class StrictSongMatcher:
@@ -27,16 +43,45 @@ class StrictSongMatcher:
             .replace("—", "-")  # Em-dash
         )
 
+    @staticmethod
+    def invalidate(franchise: Optional[str] = None):
+        """Drops the cached index of one franchise (or all). Call after Song rows change."""
+        with _index_lock:
+            names = [franchise] if franchise else list(set(_indexes) | set(_versions))
+            for name in names:
+                _versions[name] = _versions.get(name, 0) + 1
+                _indexes.pop(name, None)
+
+    @staticmethod
+    def get_index(franchise: str, db: Session) -> Optional[SongIndex]:
+        """The franchise's song index, built from the database on first use. None if unknown."""
+        with _index_lock:
+            version = _versions.get(franchise, 0)
+            index = _indexes.get(franchise)
+        if index is not None and index.version == version:
+            return index
+
+        franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
+        if not franchise_obj:
+            return None
+        songs = db.query(Song.id, Song.name).filter(Song.franchise_id == franchise_obj.id).all()
+        lookup = {StrictSongMatcher._normalize(s.name): (str(s.id), s.name) for s in songs}
+        index = SongIndex(version, lookup, SuggestionIndex(list(lookup)))
+
+        with _index_lock:
+            # Don't cache an index that was invalidated while it was being built
+            if _versions.get(franchise, 0) == version:
+                _indexes[franchise] = index
+        return index
+
     @staticmethod
     def parse_ranking_text(
         text: str, franchise: str, db: Session
     ) -> Tuple[Dict[str, float], Dict[str, dict]]:
-        # Load franchise and associated songs
-        franchise_obj = db.query(Franchise).filter_by(name=franchise).first()
-        songs = db.query(Song).filter_by(franchise_id=franchise_obj.id).all()
-
-        # Build normalized lookup map: {normalized_name: SongObject}
-        song_lookup = {StrictSongMatcher._normalize(s.name): s for s in songs}
+        index = StrictSongMatcher.get_index(franchise, db)
+        # {normalized_name: (song_id, name)}
+        song_lookup = index.songs if index else {}
+        suggester = index.suggestions if index else SuggestionIndex([])
 
         matched: Dict[str, float] = {}
         conflicts: Dict[str, dict] = {}
@@ -66,19 +111,19 @@ class StrictSongMatcher:
 
             if not song:
                 # Fuzzy suggestions using normalized keys but returning original names
-                close_matches = difflib.get_close_matches(
-                    normalized_input, song_lookup.keys(), n=3, cutoff=0.7
-                )
+                close_matches = suggester.close_matches(normalized_input, n=3, cutoff=0.7)
                 conflicts[song_name_clean] = {
                     "reason": "song_not_found",
                     "line_num": idx,
                     "raw_text": line,
-                    "suggestions": [song_lookup[c].name for c in close_matches],
+                    "suggestions": [song_lookup[c][1] for c in close_matches],
                 }
                 continue
 
+            song_id = song[0]
+
             # Error 3: Duplicate in the current list
-            if str(song.id) in seen_song_ids:
+            if song_id in seen_song_ids:
                 conflicts[f"{song_name_clean}_dup_{idx}"] = {
                     "reason": "duplicate_song",
                     "line_num": idx,
@@ -87,7 +132,7 @@ class StrictSongMatcher:
                 continue
 
             # Success
-            matched[str(song.id)] = float(rank_str)
-            seen_song_ids.add(str(song.id))
+            matched[song_id] = float(rank_str)
+            seen_song_ids.add(song_id)
 
         return matched, conflicts
\ No newline at end of file
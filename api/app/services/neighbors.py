@@ -0,0 +1,113 @@
+# app/services/neighbors.py
+
+import heapq
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, exists, insert
+from sqlalchemy.orm import Session
+
+from app.models import AnalysisResult, UserNeighbors
+
+logger = logging.getLogger(__name__)
+
+
+class NeighborIndexService:
+    """
+    Persisted top-K soulmates (smallest divergence) and nemeses (largest)
+    of every user in a subgroup's divergence matrix, so
+    /analysis/user-match is a single-row lookup.
+
+    The index is rebuilt whenever a subgroup's full DIVERGENCE result is
+    stored; an incremental update rewrites only the submitting user's
+    lists until then. Ties are broken by username, which matches a stable
+    sort of a matrix row (rows are in sorted username order).
+    """
+
+    K = 3
+    INSERT_BATCH = 500
+
+    @staticmethod
+    def top_k(row: Dict[str, float], username: str, k: int = K) -> Tuple[List[dict], List[dict]]:
+        """(soulmates, nemeses) of `username` from its {user: divergence} row."""
+        others = [(div, user) for user, div in row.items() if user != username]
+        soulmates = heapq.nsmallest(k, others)
+        nemeses = heapq.nlargest(k, others)
+        return (
+            [{"user": user, "div": div} for div, user in soulmates],
+            [{"user": user, "div": div} for div, user in nemeses],
+        )
+
+    @staticmethod
+    def rebuild(db: Session, franchise_id: UUID, subgroup_id: UUID, matrix: Dict[str, Dict[str, float]]):
+        """Replaces a subgroup's index with one built from its full matrix. Does not commit."""
+        db.query(UserNeighbors).filter(
+            UserNeighbors.franchise_id == franchise_id,
+            UserNeighbors.subgroup_id == subgroup_id,
+        ).delete(synchronize_session=False)
+
+        rows = []
+        for username, row in matrix.items():
+            soulmates, nemeses = NeighborIndexService.top_k(row, username)
+            rows.append({
+                "franchise_id": franchise_id,
+                "subgroup_id": subgroup_id,
+                "username": username,
+                "soulmates": soulmates,
+                "nemeses": nemeses,
+            })
+            if len(rows) >= NeighborIndexService.INSERT_BATCH:
+                db.execute(insert(UserNeighbors), rows)
+                rows = []
+        if rows:
+            db.execute(insert(UserNeighbors), rows)
+
+    @staticmethod
+    def update_user(db: Session, franchise_id: UUID, subgroup_id: UUID, username: str, row: Dict[str, float]):
+        """
+        Rewrites one user's own lists from their new divergence row, in
+        O(U). Other users' lists catch up when the subgroup's matrix is
+        next rewritten and rebuild runs. Does not commit.
+        """
+        soulmates, nemeses = NeighborIndexService.top_k(row, username)
+        entry = db.query(UserNeighbors).filter(
+            UserNeighbors.franchise_id == franchise_id,
+            UserNeighbors.subgroup_id == subgroup_id,
+            UserNeighbors.username == username,
+        ).first()
+        if entry is None:
+            db.add(UserNeighbors(
+                franchise_id=franchise_id, subgroup_id=subgroup_id, username=username,
+                soulmates=soulmates, nemeses=nemeses,
+            ))
+        else:
+            entry.soulmates, entry.nemeses, entry.updated_at = soulmates, nemeses, datetime.utcnow()
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """Indexes stored DIVERGENCE results that have no index yet. Returns how many subgroups were indexed."""
+        pending = db.query(AnalysisResult.id).filter(
+            AnalysisResult.analysis_type == "DIVERGENCE",
+            AnalysisResult.subgroup_id.isnot(None),
+            ~exists().where(and_(
+                UserNeighbors.franchise_id == AnalysisResult.franchise_id,
+                UserNeighbors.subgroup_id == AnalysisResult.subgroup_id,
+            )),
+        ).all()
+
+        indexed = 0
+        for row in pending:
+            result = db.get(AnalysisResult, row.id)
+            matrix = (result.result_data or {}).get("matrix")
+            # The legacy matrix-only format is replaced on the next recompute
+            if isinstance(matrix, dict):
+                NeighborIndexService.rebuild(db, result.franchise_id, result.subgroup_id, matrix)
+                indexed += 1
+            db.expunge(result)
+        db.commit()
+
+        if indexed:
+            logger.info(f"✓ Built user-match neighbor index for {indexed} subgroups")
+        return indexed
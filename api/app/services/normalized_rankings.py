@@ -0,0 +1,222 @@
+# app/services/normalized_rankings.py
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from uuid import UUID
+
+from sqlalchemy import exists, func, insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Subgroup, Submission, SubmissionRanking, SubmissionStatus
+from app.services.ranking_utils import RelativeRankingService
+
+logger = logging.getLogger(__name__)
+
+
+def _as_uuid(val: Union[str, UUID]) -> UUID:
+    return val if isinstance(val, UUID) else UUID(val)
+
+
+class NormalizedRankingService:
+    """
+    Maintains the submission_rankings table: one row per (submission,
+    subgroup, ranked song) with the raw and the subgroup-relative rank,
+    so per-song and per-subgroup aggregates can run as GROUP BY queries
+    instead of loading every submission into Python.
+
+    Writes are no-ops unless settings.normalized_rankings_enabled is set.
+    Rows exist for current VALID submissions only, and per subgroup only
+    for the one ranking of each user that analyses count (see
+    RelativeRankingService.pick_effective), so a user's rows are always
+    rewritten together.
+    """
+
+    # Rows per executemany during backfill
+    INSERT_BATCH = 10000
+    # Usernames per IN (...) list
+    USER_BATCH = 500
+
+    @staticmethod
+    def enabled() -> bool:
+        return settings.normalized_rankings_enabled
+
+    @staticmethod
+    def build_effective_rows(franchise_id: UUID, submissions: list, subgroups: Iterable[Subgroup]) -> List[dict]:
+        """
+        Rows for `submissions` (id, username, subgroup_id, parsed_rankings;
+        oldest first), keeping per subgroup only each user's effective
+        ranking.
+        """
+        subgroups = [sg for sg in subgroups if sg.song_ids]
+        membership = RelativeRankingService.build_membership([sg.song_ids for sg in subgroups])
+        rel_maps = [
+            RelativeRankingService.relativize_all(sub.parsed_rankings or {}, membership, len(subgroups))
+            for sub in submissions
+        ]
+
+        rows = []
+        for position, subgroup in enumerate(subgroups):
+            chosen = RelativeRankingService.pick_effective(
+                (sub.username, sub.subgroup_id == subgroup.id, index)
+                for index, sub in enumerate(submissions) if rel_maps[index][position]
+            )
+            for index in chosen:
+                sub = submissions[index]
+                for song_id, rel_rank in rel_maps[index][position].items():
+                    rows.append({
+                        "submission_id": sub.id,
+                        "subgroup_id": subgroup.id,
+                        "song_id": UUID(song_id),
+                        "franchise_id": franchise_id,
+                        "rank": sub.parsed_rankings[song_id],
+                        "relative_rank": rel_rank,
+                    })
+        return rows
+
+    @staticmethod
+    def _current_query(db: Session, franchise_id: UUID):
+        return db.query(
+            Submission.id, Submission.username, Submission.subgroup_id, Submission.parsed_rankings
+        ).filter(
+            Submission.franchise_id == franchise_id,
+            Submission.submission_status == SubmissionStatus.VALID,
+            Submission.is_current.is_(True),
+        ).order_by(Submission.created_at, Submission.id)
+
+    @staticmethod
+    def reindex_users(db: Session, franchise_id: UUID, usernames: Iterable[str], subgroups: List[Subgroup]):
+        """(Re)writes the rows of every current submission of `usernames` in one franchise. Flushes, does not commit."""
+        if not NormalizedRankingService.enabled():
+            return
+        usernames = list(dict.fromkeys(usernames))
+        if not usernames:
+            return
+        db.flush()
+
+        batch = NormalizedRankingService.USER_BATCH
+        for start in range(0, len(usernames), batch):
+            submissions = NormalizedRankingService._current_query(db, franchise_id).filter(
+                Submission.username.in_(usernames[start:start + batch])
+            ).all()
+            NormalizedRankingService.remove_submissions(db, [sub.id for sub in submissions])
+            rows = NormalizedRankingService.build_effective_rows(franchise_id, submissions, subgroups)
+            if rows:
+                db.execute(insert(SubmissionRanking), rows)
+
+    @staticmethod
+    def index_submission(db: Session, submission: Submission, subgroups: Optional[List[Subgroup]] = None):
+        """(Re)writes the rows of one submission's user. Flushes, does not commit."""
+        if not NormalizedRankingService.enabled():
+            return
+        if submission.id is None:
+            db.flush()
+
+        # A submission that stopped being VALID keeps no rows
+        NormalizedRankingService.remove_submissions(db, [submission.id])
+        if subgroups is None:
+            subgroups = db.query(Subgroup).filter(Subgroup.franchise_id == submission.franchise_id).all()
+        NormalizedRankingService.reindex_users(db, submission.franchise_id, [submission.username], subgroups)
+
+    @staticmethod
+    def index_new_submissions(db: Session, submissions: List[Submission], subgroups: List[Subgroup]):
+        """index_submission for freshly inserted VALID submissions of one franchise. Flushes, does not commit."""
+        if not NormalizedRankingService.enabled() or not submissions:
+            return
+        NormalizedRankingService.reindex_users(
+            db, submissions[0].franchise_id, [submission.username for submission in submissions], subgroups
+        )
+
+    @staticmethod
+    def remove_submissions(db: Session, submission_ids: List[UUID]):
+        """Call before deleting submissions in bulk (bulk deletes skip ORM cascades)."""
+        if not NormalizedRankingService.enabled() or not submission_ids:
+            return
+        db.query(SubmissionRanking).filter(
+            SubmissionRanking.submission_id.in_(submission_ids)
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def rebuild_subgroup(db: Session, subgroup: Subgroup):
+        """Recomputes a subgroup's rows, e.g. after its song list changed. Does not commit."""
+        if not NormalizedRankingService.enabled():
+            return
+
+        db.query(SubmissionRanking).filter(
+            SubmissionRanking.subgroup_id == subgroup.id
+        ).delete(synchronize_session=False)
+
+        submissions = NormalizedRankingService._current_query(db, subgroup.franchise_id).all()
+        rows = NormalizedRankingService.build_effective_rows(subgroup.franchise_id, submissions, [subgroup])
+        if rows:
+            db.execute(insert(SubmissionRanking), rows)
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """
+        Indexes users with VALID submissions that have no rows yet (existing
+        data, or the flag was just enabled) and users indexed before rows
+        were kept for one ranking per subgroup. Returns how many users were
+        indexed.
+        """
+        if not NormalizedRankingService.enabled():
+            return 0
+
+        pending = db.query(Submission.franchise_id, Submission.username).filter(
+            Submission.submission_status == SubmissionStatus.VALID,
+            Submission.is_current.is_(True),
+            ~exists().where(SubmissionRanking.submission_id == Submission.id),
+        ).distinct().all()
+        duplicated = (
+            db.query(Submission.franchise_id, Submission.username)
+            .join(SubmissionRanking, SubmissionRanking.submission_id == Submission.id)
+            .group_by(Submission.franchise_id, Submission.username, SubmissionRanking.subgroup_id)
+            .having(func.count(func.distinct(Submission.id)) > 1)
+            .distinct()
+            .all()
+        )
+
+        users_by_franchise = {}
+        for franchise_id, username in {*pending, *duplicated}:
+            users_by_franchise.setdefault(franchise_id, []).append(username)
+        for franchise_id, usernames in users_by_franchise.items():
+            subgroups = db.query(Subgroup).filter(Subgroup.franchise_id == franchise_id).all()
+            NormalizedRankingService.reindex_users(db, franchise_id, sorted(usernames), subgroups)
+        db.commit()
+
+        indexed = sum(len(usernames) for usernames in users_by_franchise.values())
+        if indexed:
+            logger.info(f"✓ Indexed the submissions of {indexed} users into submission_rankings")
+        return indexed
+
+    @staticmethod
+    def song_stats(
+        db: Session, franchise_id: Union[str, UUID], subgroup_id: Union[str, UUID]
+    ) -> Dict[str, Tuple[float, int, float]]:
+        """{song_id: (sum, count, sum of squares)} of relative ranks, via GROUP BY."""
+        rel = SubmissionRanking.relative_rank
+        query = (
+            db.query(
+                SubmissionRanking.song_id,
+                func.sum(rel),
+                func.count(rel),
+                func.sum(rel * rel),
+            )
+            .filter(
+                SubmissionRanking.franchise_id == _as_uuid(franchise_id),
+                SubmissionRanking.subgroup_id == _as_uuid(subgroup_id),
+            )
+            .group_by(SubmissionRanking.song_id)
+        )
+        return {str(song_id): (total, count, total_sq) for song_id, total, count, total_sq in query}
+
+    @staticmethod
+    def subgroup_stats(db: Session, franchise_id: Union[str, UUID]) -> Dict[str, Tuple[float, int]]:
+        """{subgroup_id: (sum, count)} of relative ranks over every song in the subgroup."""
+        rel = SubmissionRanking.relative_rank
+        query = (
+            db.query(SubmissionRanking.subgroup_id, func.sum(rel), func.count(rel))
+            .filter(SubmissionRanking.franchise_id == _as_uuid(franchise_id))
+            .group_by(SubmissionRanking.subgroup_id)
+        )
+        return {str(subgroup_id): (total, count) for subgroup_id, total, count in query}
@@ -0,0 +1,134 @@
+# app/services/packed_rankings.py
+
+import logging
+from typing import Dict, List, Optional, Sequence, Union
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Franchise, Song, Submission, SubmissionStatus
+
+logger = logging.getLogger(__name__)
+
+# Little-endian float32; NaN marks a song the user did not rank
+RANK_DTYPE = np.dtype("<f4")
+_NAN_BYTES = np.array([np.nan], dtype=RANK_DTYPE).tobytes()
+
+
+class PackedRankingService:
+    """
+    Compact storage for parsed rankings.
+
+    Every song gets a small per-franchise integer (Song.song_index) and a
+    submission's ranks are stored as a float32 array aligned to it. Slots
+    are append-only, so arrays packed before a song was added simply
+    decode with NaN for it. Ranks are multiples of 0.5 well below 2^22,
+    so float32 holds them exactly.
+    """
+
+    @staticmethod
+    def assign_song_indexes(db: Session, franchise_id: Union[str, UUID]) -> Dict[str, int]:
+        """Gives unindexed songs the next free slots and returns {song_id: index}. Flushes, does not commit."""
+        songs = db.query(Song).filter(Song.franchise_id == franchise_id).all()
+        next_index = max((s.song_index for s in songs if s.song_index is not None), default=-1) + 1
+
+        for song in sorted((s for s in songs if s.song_index is None), key=lambda s: s.name or ""):
+            song.song_index = next_index
+            next_index += 1
+        db.flush()
+
+        return {str(s.id): s.song_index for s in songs}
+
+    @staticmethod
+    def song_index_map(db: Session, franchise_id: Union[str, UUID]) -> Dict[str, int]:
+        return {
+            str(row.id): row.song_index
+            for row in db.query(Song.id, Song.song_index).filter(
+                Song.franchise_id == franchise_id, Song.song_index.isnot(None)
+            ).all()
+        }
+
+    @staticmethod
+    def song_order(index_map: Dict[str, int]) -> List[Optional[str]]:
+        """Song ids by slot; None for slots whose song no longer exists."""
+        order = [None] * (max(index_map.values(), default=-1) + 1)
+        for song_id, idx in index_map.items():
+            order[idx] = song_id
+        return order
+
+    @staticmethod
+    def pack(parsed_rankings: Dict[str, float], index_map: Dict[str, int]) -> Optional[bytes]:
+        """Returns None if a ranked song has no slot yet."""
+        ranks = np.full(max(index_map.values(), default=-1) + 1, np.nan, dtype=RANK_DTYPE)
+        for song_id, rank in parsed_rankings.items():
+            idx = index_map.get(song_id)
+            if idx is None:
+                return None
+            ranks[idx] = rank
+        return ranks.tobytes()
+
+    @staticmethod
+    def unpack_matrix(blobs: Sequence[bytes], width: int) -> np.ndarray:
+        """Decodes many packed rows with one buffer read into a (rows, width) float32 matrix."""
+        row_bytes = width * RANK_DTYPE.itemsize
+        buffer = b"".join(
+            blob[:row_bytes] + _NAN_BYTES * max(0, width - len(blob) // RANK_DTYPE.itemsize)
+            for blob in blobs
+        )
+        return np.frombuffer(buffer, dtype=RANK_DTYPE).reshape(len(blobs), width)
+
+    @staticmethod
+    def matrix_to_maps(matrix: np.ndarray, song_order: List[Optional[str]]) -> List[Dict[str, float]]:
+        """
+        {song_id: rank} per decoded row, in rank order like the JSON form.
+        Sorting happens once for the whole matrix (NaN sorts last).
+        """
+        order = np.argsort(matrix, axis=1, kind="stable")
+        sorted_ranks = np.take_along_axis(matrix, order, axis=1).tolist()
+        counts = np.count_nonzero(~np.isnan(matrix), axis=1).tolist()
+        song_ids = np.array(song_order, dtype=object)
+        has_gaps = None in song_order
+
+        rank_maps = []
+        for cols, ranks, count in zip(order, sorted_ranks, counts):
+            rank_map = dict(zip(song_ids[cols[:count]].tolist(), ranks[:count]))
+            if has_gaps:
+                rank_map.pop(None, None)
+            rank_maps.append(rank_map)
+        return rank_maps
+
+    @staticmethod
+    def pack_submission(db: Session, submission: Submission, index_map: Optional[Dict[str, int]] = None):
+        """Fills submission.packed_rankings from parsed_rankings, assigning slots to new songs."""
+        if not submission.parsed_rankings:
+            submission.packed_rankings = None
+            return
+
+        if index_map is None:
+            index_map = PackedRankingService.song_index_map(db, submission.franchise_id)
+        packed = PackedRankingService.pack(submission.parsed_rankings, index_map)
+        if packed is None:
+            index_map.update(PackedRankingService.assign_song_indexes(db, submission.franchise_id))
+            packed = PackedRankingService.pack(submission.parsed_rankings, index_map)
+        submission.packed_rankings = packed
+
+    @staticmethod
+    def backfill(db: Session) -> int:
+        """Migrates existing rows: indexes every song and packs unpacked submissions."""
+        packed_count = 0
+        for franchise in db.query(Franchise).all():
+            index_map = PackedRankingService.assign_song_indexes(db, franchise.id)
+            pending = db.query(Submission).filter(
+                Submission.franchise_id == franchise.id,
+                Submission.submission_status == SubmissionStatus.VALID,
+                Submission.packed_rankings.is_(None),
+            ).all()
+            for submission in pending:
+                PackedRankingService.pack_submission(db, submission, index_map)
+                packed_count += submission.packed_rankings is not None
+        db.commit()
+
+        if packed_count:
+            logger.info(f"✓ Packed rankings for {packed_count} submissions")
+        return packed_count
@@ -0,0 +1,162 @@
+# app/services/rank_matrix.py
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class RankMatrix:
+    """
+    Dense users x songs matrix of relative ranks.
+
+    Missing entries are stored as 0.0 in `ranks` and flagged False in
+    `mask`, so masked sums can be taken with plain matrix products.
+    """
+
+    def __init__(
+        self,
+        users: List[str],
+        song_ids: List[str],
+        ranks: np.ndarray,
+        mask: np.ndarray,
+    ):
+        self.users = users
+        self.song_ids = song_ids
+        self.ranks = ranks
+        self.mask = mask
+
+    @staticmethod
+    def from_rank_maps(
+        rank_maps: Dict[str, Dict[str, float]],
+        song_ids: Optional[List[str]] = None,
+    ) -> "RankMatrix":
+        """
+        Build a matrix from {username: {song_id: rank}}.
+        Rows follow sorted usernames; columns follow `song_ids` when given,
+        otherwise every song seen in first-appearance order.
+        """
+        users = sorted(rank_maps.keys())
+
+        if song_ids is None:
+            seen = {}
+            for rel_map in rank_maps.values():
+                for sid in rel_map:
+                    seen.setdefault(sid, None)
+            song_ids = list(seen)
+
+        col_index = {sid: idx for idx, sid in enumerate(song_ids)}
+        ranks = np.zeros((len(users), len(song_ids)), dtype=np.float64)
+        mask = np.zeros((len(users), len(song_ids)), dtype=bool)
+
+        for row, username in enumerate(users):
+            for sid, rank in rank_maps[username].items():
+                col = col_index.get(sid)
+                if col is not None:
+                    ranks[row, col] = rank
+                    mask[row, col] = True
+
+        return RankMatrix(users, list(song_ids), ranks, mask)
+
+    def column_counts(self) -> np.ndarray:
+        """Number of users that ranked each song."""
+        return self.mask.sum(axis=0)
+
+    def column_means(self) -> np.ndarray:
+        """Mean rank per song over the users that ranked it (NaN if nobody did)."""
+        counts = self.column_counts()
+        sums = self.ranks.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+class DivergenceEngine:
+    """Masked pairwise RMS distance between the rows of a RankMatrix."""
+
+    # Rows processed per block; bounds peak memory at block_size x users.
+    BLOCK_SIZE = 512
+
+    @staticmethod
+    def pairwise_sums(
+        rank_matrix: RankMatrix, block_size: int = BLOCK_SIZE
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (sq_sums, counts) where for i < j:
+            sq_sums[i, j] = sum over shared songs of (r_i - r_j)^2
+            counts[i, j]  = number of shared songs
+
+        Uses sum((a - b)^2 * m_a * m_b) = A²·Mbᵀ + Ma·B²ᵀ - 2·A·Bᵀ and only
+        fills the upper triangle (lower triangle and diagonal stay zero).
+        Relative ranks are multiples of 0.5, so every partial sum is exact
+        in float64 regardless of summation order.
+        """
+        ranks = rank_matrix.ranks
+        mask = rank_matrix.mask.astype(np.float64)
+        squares = ranks * ranks
+        n_users = ranks.shape[0]
+
+        sq_sums = np.zeros((n_users, n_users), dtype=np.float64)
+        counts = np.zeros((n_users, n_users), dtype=np.int64)
+
+        for start in range(0, n_users, block_size):
+            stop = min(start + block_size, n_users)
+            # Columns before `start` belong to the lower triangle of this block
+            r_blk, m_blk, s_blk = ranks[start:stop], mask[start:stop], squares[start:stop]
+            r_rest, m_rest, s_rest = ranks[start:], mask[start:], squares[start:]
+
+            block_sq = s_blk @ m_rest.T + m_blk @ s_rest.T - 2.0 * (r_blk @ r_rest.T)
+            block_counts = np.rint(m_blk @ m_rest.T).astype(np.int64)
+
+            # Keep strictly-upper entries only
+            upper = np.triu(np.ones((stop - start, n_users - start), dtype=bool), k=1)
+            sq_sums[start:stop, start:] = np.where(upper, block_sq, 0.0)
+            counts[start:stop, start:] = np.where(upper, block_counts, 0)
+
+        return sq_sums, counts
+
+    @staticmethod
+    def divergence_dict(rank_matrix: RankMatrix) -> Dict[str, Dict[str, float]]:
+        """
+        Symmetric {user: {user: rms}} dict rounded to 2 decimals, with 0.0 on
+        the diagonal and for pairs without shared songs.
+        """
+        users = rank_matrix.users
+        sq_sums, counts = DivergenceEngine.pairwise_sums(rank_matrix)
+        sq_rows = sq_sums.tolist()
+        count_rows = counts.tolist()
+
+        # Rows are filled left-to-right so every inner dict keeps sorted user order
+        matrix = {user: {} for user in users}
+        for i, user1 in enumerate(users):
+            row = matrix[user1]
+            row[user1] = 0.0
+            sq_row, count_row = sq_rows[i], count_rows[i]
+            for j in range(i + 1, len(users)):
+                n_shared = count_row[j]
+                # Python float ops so rounding matches the legacy per-pair loop
+                value = round((sq_row[j] / n_shared) ** 0.5, 2) if n_shared else 0.0
+                row[users[j]] = value
+                matrix[users[j]][user1] = value
+
+        return matrix
+
+    @staticmethod
+    def divergence_row(rank_matrix: RankMatrix, username: str) -> Dict[str, float]:
+        """
+        {user: rms} for a single user against every row, in O(U·S).
+        Same values as the corresponding row of divergence_dict.
+        """
+        row = rank_matrix.users.index(username)
+        ranks = rank_matrix.ranks
+        mask = rank_matrix.mask.astype(np.float64)
+        target, target_mask = ranks[row], mask[row]
+
+        sq_sums = (ranks * ranks) @ target_mask + mask @ (target * target) - 2.0 * (ranks @ target)
+        counts = np.rint(mask @ target_mask).astype(np.int64)
+
+        result = {}
+        for user, sq_sum, n_shared in zip(rank_matrix.users, sq_sums.tolist(), counts.tolist()):
+            if user == username or not n_shared:
+                result[user] = 0.0
+            else:
+                result[user] = round((sq_sum / n_shared) ** 0.5, 2)
+        return result
@@ -1,7 +1,12 @@
 # app/services/ranking_utils.py
 
 from collections import defaultdict
-from typing import Dict, List
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.tie_handling import TieHandlingService
 
 
 class RelativeRankingService:
@@ -40,4 +45,90 @@ class RelativeRankingService:
                 result[song_id] = mean_rel_rank
             current_position += count
 
-        return result
\ No newline at end of file
+        return result
+
+    @staticmethod
+    def pick_effective(entries: Iterable[Tuple[str, bool, Any]]) -> List[Any]:
+        """
+        Keeps one value per username from (username, made_for_subgroup,
+        value) entries of one subgroup, listed oldest first: the user's
+        latest ranking made for that subgroup, else their latest ranking
+        that covers it. Kept values stay in listing order.
+        """
+        chosen = {}
+        for position, (username, own, value) in enumerate(entries):
+            best = chosen.get(username)
+            if best is None or own or not best[1]:
+                chosen[username] = (position, own, value)
+        return [value for _, _, value in sorted(chosen.values(), key=itemgetter(0))]
+
+    @staticmethod
+    def build_membership(subgroups_song_ids: Sequence[List[str]]) -> Dict[str, Tuple[int, ...]]:
+        """
+        song_id -> positions (in `subgroups_song_ids`) of every subgroup
+        containing it. Build once per franchise and reuse for every user.
+        """
+        membership = defaultdict(set)
+        for position, song_ids in enumerate(subgroups_song_ids):
+            for song_id in song_ids or ():
+                membership[song_id].add(position)
+        return {song_id: tuple(sorted(positions)) for song_id, positions in membership.items()}
+
+    @staticmethod
+    def relativize_all(
+        master_rankings: Dict[str, float],
+        membership: Dict[str, Tuple[int, ...]],
+        group_count: int,
+    ) -> List[Dict[str, float]]:
+        """
+        relativize() for every subgroup at once: one sort of the master
+        ranking, then each tie block is split across the subgroups its
+        songs belong to. Returns one relative map per subgroup position,
+        identical (including key order) to calling relativize per subgroup.
+        """
+        results = [{} for _ in range(group_count)]
+        # Next free relative position per subgroup (floats, like relativize's means)
+        positions = [1.0] * group_count
+
+        # Stable sort keeps tied songs in master order, as relativize does
+        ranked = sorted(
+            ((song_id, rank) for song_id, rank in master_rankings.items() if song_id in membership),
+            key=itemgetter(1)
+        )
+
+        start, total = 0, len(ranked)
+        while start < total:
+            song_id, rank = ranked[start]
+            end = start + 1
+            while end < total and ranked[end][1] == rank:
+                end += 1
+
+            if end == start + 1:
+                # Untied song: next position in each of its subgroups
+                for group in membership[song_id]:
+                    results[group][song_id] = positions[group]
+                    positions[group] += 1
+            else:
+                counts = defaultdict(int)
+                for tied_id, _ in ranked[start:end]:
+                    for group in membership[tied_id]:
+                        counts[group] += 1
+                means = {group: positions[group] + (count - 1) / 2 for group, count in counts.items()}
+                for tied_id, _ in ranked[start:end]:
+                    for group in membership[tied_id]:
+                        results[group][tied_id] = means[group]
+                for group, count in counts.items():
+                    positions[group] += count
+
+            start = end
+
+        return results
+
+    @staticmethod
+    def relativize_matrix(matrix: np.ndarray, subgroup_columns: Sequence[int]) -> np.ndarray:
+        """
+        relativize() for every row of a users x songs matrix (NaN = unranked)
+        at once: the subgroup's columns, re-ranked 1..N with averaged ties.
+        Rows with no song in the subgroup come back all-NaN.
+        """
+        return TieHandlingService.average_ranks(np.asarray(matrix)[:, list(subgroup_columns)])
@@ -0,0 +1,155 @@
+# app/services/snapshot.py
+
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.models import Song, Subgroup, Submission, SubmissionStatus
+from app.services.packed_rankings import PackedRankingService
+from app.services.ranking_utils import RelativeRankingService
+
+
+class SubmissionRecord(NamedTuple):
+    username: str
+    parsed_rankings: Dict[str, float]
+    subgroup_id: Optional[str] = None  # the subgroup the ranking was submitted for
+
+
+class SubgroupRecord(NamedTuple):
+    id: str
+    name: str
+    song_ids: list
+    is_subunit: bool
+
+
+class RankingSnapshot:
+    """
+    Plain-data view of a franchise's current VALID submissions (one per
+    user and submitted subgroup), oldest first.
+
+    Submissions, subgroups and song names are loaded once; relative
+    rankings are computed lazily and cached per subgroup, so every
+    analysis sharing the snapshot reuses the same relativized maps.
+    relativize_subgroups fills the cache for many subgroups in one pass.
+    A user with several submissions counts once per subgroup, see
+    RelativeRankingService.pick_effective.
+    Holds no ORM objects or session, so it can be pickled.
+    """
+
+    def __init__(
+        self,
+        franchise_id: str,
+        submissions: List[SubmissionRecord],
+        subgroups: List[SubgroupRecord],
+        song_names: Dict[str, str],
+    ):
+        self.franchise_id = franchise_id
+        self.submissions = submissions
+        self.subgroups = subgroups
+        self.song_names = song_names
+        self._subgroups_by_id = {sg.id: sg for sg in subgroups}
+        self._relative_cache: Dict[str, List[Tuple[str, Dict[str, float]]]] = {}
+
+    @staticmethod
+    def load(franchise_id: Union[str, UUID], db: Session) -> "RankingSnapshot":
+        f_uuid = franchise_id if isinstance(franchise_id, UUID) else UUID(franchise_id)
+
+        rows = (
+            db.query(Submission.id, Submission.username, Submission.subgroup_id, Submission.packed_rankings)
+            .filter(
+                Submission.franchise_id == f_uuid,
+                Submission.submission_status == SubmissionStatus.VALID,
+                Submission.is_current.is_(True),
+            )
+            .order_by(Submission.created_at, Submission.id)
+            .all()
+        )
+
+        # Packed rows decode in one pass; rows not yet migrated fall back to JSON
+        song_order = PackedRankingService.song_order(PackedRankingService.song_index_map(db, f_uuid))
+        packed_rows = [r for r in rows if r.packed_rankings is not None]
+        matrix = PackedRankingService.unpack_matrix([r.packed_rankings for r in packed_rows], len(song_order))
+        rank_maps = dict(zip(
+            (r.id for r in packed_rows),
+            PackedRankingService.matrix_to_maps(matrix, song_order)
+        ))
+
+        legacy_ids = [r.id for r in rows if r.packed_rankings is None]
+        if legacy_ids:
+            rank_maps.update(
+                db.query(Submission.id, Submission.parsed_rankings)
+                .filter(Submission.id.in_(legacy_ids))
+                .all()
+            )
+
+        submissions = [
+            SubmissionRecord(r.username, rank_maps[r.id] or {}, str(r.subgroup_id) if r.subgroup_id else None)
+            for r in rows
+        ]
+
+        subgroups = [
+            SubgroupRecord(str(sg.id), sg.name, sg.song_ids, sg.is_subunit)
+            for sg in db.query(Subgroup).filter_by(franchise_id=f_uuid).all()
+        ]
+
+        song_names = {
+            str(s.id): s.name
+            for s in db.query(Song.id, Song.name).filter(Song.franchise_id == f_uuid).all()
+        }
+
+        return RankingSnapshot(str(f_uuid), submissions, subgroups, song_names)
+
+    @property
+    def submission_count(self) -> int:
+        return len(self.submissions)
+
+    def get_subgroup(self, subgroup_id: Union[str, UUID]) -> Optional[SubgroupRecord]:
+        return self._subgroups_by_id.get(str(subgroup_id))
+
+    def relative_rankings(self, subgroup_id: Union[str, UUID]) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        (username, relative ranks) for every user with at least one song in
+        the subgroup, one entry per user, in load order. Cached per subgroup.
+        """
+        key = str(subgroup_id)
+        if key not in self._relative_cache:
+            subgroup = self._subgroups_by_id.get(key)
+            entries = []
+            if subgroup and subgroup.song_ids:
+                for sub in self.submissions:
+                    rel_map = RelativeRankingService.relativize(sub.parsed_rankings, subgroup.song_ids)
+                    if rel_map:
+                        entries.append((sub.username, sub.subgroup_id == key, (sub.username, rel_map)))
+            self._relative_cache[key] = RelativeRankingService.pick_effective(entries)
+        return self._relative_cache[key]
+
+    def relativize_subgroups(self, subgroup_ids: Optional[List[Union[str, UUID]]] = None):
+        """
+        Fills the relative_rankings cache for the given subgroups (default:
+        all) with one sort per submission instead of one per subgroup.
+        """
+        keys = [str(sg_id) for sg_id in (self._subgroups_by_id if subgroup_ids is None else subgroup_ids)]
+        pending = [
+            self._subgroups_by_id[key] for key in dict.fromkeys(keys)
+            if key not in self._relative_cache and key in self._subgroups_by_id
+        ]
+        if not pending:
+            return
+
+        membership = RelativeRankingService.build_membership([sg.song_ids for sg in pending])
+        entries = [[] for _ in pending]
+        for sub in self.submissions:
+            rel_maps = RelativeRankingService.relativize_all(sub.parsed_rankings, membership, len(pending))
+            for position, rel_map in enumerate(rel_maps):
+                if rel_map:
+                    own = sub.subgroup_id == pending[position].id
+                    entries[position].append((sub.username, own, (sub.username, rel_map)))
+
+        for subgroup, subgroup_entries in zip(pending, entries):
+            self._relative_cache[subgroup.id] = RelativeRankingService.pick_effective(subgroup_entries)
+
+    def user_rankings(self, subgroup_id: Union[str, UUID]) -> Dict[str, Dict[str, float]]:
+        """Relative ranks keyed by username."""
+        return dict(self.relative_rankings(subgroup_id))
+
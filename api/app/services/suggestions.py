@@ -0,0 +1,86 @@
+# app/services/suggestions.py
+
+import heapq
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import List, Sequence
+
+import numpy as np
+
+
+class SuggestionIndex:
+    """
+    Precomputed replacement for difflib.get_close_matches over a fixed
+    list of names, returning exactly the same suggestions.
+
+    An inverted character index (unigram postings with per-name counts)
+    gives every name's quick_ratio against the query in one vectorized
+    pass: 2 * |shared characters| / (len(a) + len(b)), the bound difflib
+    itself checks before scoring. Only names passing the cutoff are scored
+    with SequenceMatcher.ratio, best bound first, stopping once no
+    remaining bound can beat the current top n. Longer n-grams would
+    narrow further but are not a safe bound on ratio, so they would drop
+    valid suggestions.
+    """
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+        self._lengths = np.array([len(name) for name in self.names], dtype=np.int64)
+
+        postings = defaultdict(lambda: ([], []))
+        for position, name in enumerate(self.names):
+            for char, count in Counter(name).items():
+                positions, counts = postings[char]
+                positions.append(position)
+                counts.append(count)
+        self._postings = {
+            char: (np.array(positions, dtype=np.int64), np.array(counts, dtype=np.int64))
+            for char, (positions, counts) in postings.items()
+        }
+
+    def quick_ratios(self, word: str) -> np.ndarray:
+        """difflib's quick_ratio of `word` against every name."""
+        shared = np.zeros(len(self.names), dtype=np.int64)
+        for char, count in Counter(word).items():
+            posting = self._postings.get(char)
+            if posting is not None:
+                positions, counts = posting
+                shared[positions] += np.minimum(counts, count)
+
+        total = self._lengths + len(word)
+        # Same float expression as difflib's _calculate_ratio (1.0 for two empty strings)
+        ratios = np.ones(len(self.names), dtype=np.float64)
+        np.divide(2.0 * shared, total, out=ratios, where=total > 0)
+        return ratios
+
+    def close_matches(self, word: str, n: int = 3, cutoff: float = 0.6) -> List[str]:
+        """Same contract and result order as difflib.get_close_matches(word, names, n, cutoff)."""
+        if not n > 0:
+            raise ValueError("n must be > 0: %r" % (n,))
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError("cutoff must be in [0.0, 1.0]: %r" % (cutoff,))
+        if not self.names:
+            return []
+
+        bounds = self.quick_ratios(word)
+        candidates = np.flatnonzero(bounds >= cutoff)
+        # Highest bound first; ratio never exceeds quick_ratio
+        candidates = candidates[np.argsort(-bounds[candidates], kind="stable")]
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        top = []  # min-heap of the best n (score, name) so far
+        for position in candidates.tolist():
+            if len(top) == n and bounds[position] < top[0][0]:
+                break
+            name = self.names[position]
+            matcher.set_seq1(name)
+            score = matcher.ratio()
+            if score >= cutoff:
+                if len(top) < n:
+                    heapq.heappush(top, (score, name))
+                else:
+                    heapq.heappushpop(top, (score, name))
+
+        # difflib orders by (score, name), both descending
+        return [name for _, name in sorted(top, reverse=True)]
@@ -1,5 +1,8 @@
 from collections import defaultdict
-from typing import Dict
+from itertools import chain
+from typing import Dict, List, Tuple
+
+import numpy as np
 
 
 class TieHandlingService:
@@ -36,3 +39,74 @@ class TieHandlingService:
             position += count
 
         return result
+
+    @staticmethod
+    def average_ranks(matrix: np.ndarray) -> np.ndarray:
+        """
+        Row-wise convert_tied_ranks for a users x songs matrix where NaN
+        marks an unranked song (scipy's rankdata 'average' per row, with
+        NaN left out). Returns float64 mean ranks, NaN where unranked.
+        """
+        order, means = TieHandlingService._sorted_average_ranks(matrix)
+        result = np.full(means.shape, np.nan)
+        np.put_along_axis(result, order, means, axis=1)
+        return result
+
+    @staticmethod
+    def _sorted_average_ranks(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (order, means): each row's stable argsort and its mean ranks in
+        that sorted order. A value is (first + last + 2) / 2 over the
+        0-based positions of its tie block, the same exact half-integer
+        the dict version produces.
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.ndim != 2:
+            raise ValueError("average_ranks expects a 2-D matrix")
+        n_rows, n_cols = matrix.shape
+        if n_rows == 0 or n_cols == 0:
+            return np.zeros(matrix.shape, dtype=np.intp), np.full(matrix.shape, np.nan)
+
+        # NaN sorts last, so every row's ranked entries form a prefix
+        order = np.argsort(matrix, axis=1, kind="stable")
+        ranks = np.take_along_axis(matrix, order, axis=1)
+        columns = np.arange(n_cols)
+
+        # A tie block starts where the value differs from its left neighbour
+        # and ends where it differs from its right neighbour
+        changes = ranks[:, 1:] != ranks[:, :-1]
+        edge = np.ones((n_rows, 1), dtype=bool)
+        block_start = np.maximum.accumulate(
+            np.where(np.hstack([edge, changes]), columns, 0), axis=1
+        )
+        block_end = np.minimum.accumulate(
+            np.where(np.hstack([changes, edge]), columns, n_cols - 1)[:, ::-1], axis=1
+        )[:, ::-1]
+
+        means = (block_start + block_end + 2) / 2
+        means[np.isnan(ranks)] = np.nan
+        return order, means
+
+    @staticmethod
+    def convert_tied_ranks_batch(rankings_list: List[Dict[str, float]]) -> List[Dict[str, float]]:
+        """
+        convert_tied_ranks for many rankings with one sort over a users x
+        songs matrix. Values are identical; keys come out in rank order
+        (ties by first appearance of the song across the batch).
+        """
+        song_ids = list(dict.fromkeys(chain.from_iterable(rankings_list)))
+        col_index = {sid: idx for idx, sid in enumerate(song_ids)}
+
+        lengths = [len(rankings) for rankings in rankings_list]
+        matrix = np.full((len(rankings_list), len(song_ids)), np.nan)
+        matrix[
+            np.repeat(np.arange(len(rankings_list)), lengths),
+            list(map(col_index.__getitem__, chain.from_iterable(rankings_list))),
+        ] = list(chain.from_iterable(rankings.values() for rankings in rankings_list))
+
+        order, means = TieHandlingService._sorted_average_ranks(matrix)
+        means = means.tolist()
+        return [
+            dict(zip(map(song_ids.__getitem__, cols[:length].tolist()), values[:length]))
+            for length, cols, values in zip(lengths, order, means)
+        ]
@@ -0,0 +1,97 @@
+# app/utils/http_cache.py
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi import Response
+
+from app.config import settings
+
+
+class HttpCache:
+    """
+    ETag / If-None-Match handling for GET routes.
+
+    Stored analyses get a strong ETag from (result id, computed_at,
+    content encoding): the body is a pure function of that row. Live
+    responses get a weak ETag from the franchise's data version, since
+    their timestamps may differ between two renders of the same data.
+
+    Bodies rendered from a stored result can be kept by their strong ETag
+    (remember / recall): a recompute changes the tag, so a kept body never
+    goes stale. The cache is per process and holds the
+    rendered_response_cache_size most recently used bodies.
+    """
+
+    _bodies: "OrderedDict[str, bytes]" = OrderedDict()
+    _bodies_lock = threading.Lock()
+
+    @staticmethod
+    def etag(*parts, weak: bool = False) -> str:
+        digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+        return f'W/"{digest}"' if weak else f'"{digest}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        """If-None-Match uses the weak comparison: W/ prefixes are ignored."""
+        if not if_none_match:
+            return False
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag.removeprefix("W/") in candidates
+
+    @staticmethod
+    def accepts(accept_encoding: Optional[str], coding: str) -> bool:
+        """Whether an Accept-Encoding header allows `coding` (q=0 refuses it)."""
+        for item in (accept_encoding or "").split(","):
+            name, _, params = item.partition(";")
+            if name.strip().lower() not in (coding, "*"):
+                continue
+            params = params.strip()
+            if not params.startswith("q="):
+                return True
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return False
+
+    @staticmethod
+    def recall(etag: str) -> Optional[bytes]:
+        with HttpCache._bodies_lock:
+            body = HttpCache._bodies.get(etag)
+            if body is not None:
+                HttpCache._bodies.move_to_end(etag)
+            return body
+
+    @staticmethod
+    def remember(etag: str, body: bytes):
+        with HttpCache._bodies_lock:
+            HttpCache._bodies[etag] = body
+            HttpCache._bodies.move_to_end(etag)
+            while len(HttpCache._bodies) > max(settings.rendered_response_cache_size, 0):
+                HttpCache._bodies.popitem(last=False)
+
+    @staticmethod
+    def headers(etag: str, vary: bool = False) -> Dict[str, str]:
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={settings.http_cache_max_age}, must-revalidate",
+        }
+        if vary:
+            # The same URL is served compressed or not
+            headers["Vary"] = "Accept-Encoding"
+        return headers
+
+    @staticmethod
+    def not_modified(etag: str, vary: bool = False) -> Response:
+        return Response(status_code=304, headers=HttpCache.headers(etag, vary))
+
+    @staticmethod
+    def encoded_response(body: bytes, etag: str, content_encoding: str) -> Response:
+        """A JSON body encoded ahead of time, sent as is."""
+        headers = HttpCache.headers(etag, vary=True)
+        if content_encoding != "identity":
+            headers["Content-Encoding"] = content_encoding
+        return Response(content=body, media_type="application/json", headers=headers)
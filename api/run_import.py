@@ -1,7 +1,13 @@
+import argparse
 from app.database import init_engine, get_session
 from app.seeds.import_rankings import import_user_rankings
 import logging
 
+parser = argparse.ArgumentParser(description="Import user_rankings.csv")
+parser.add_argument("--bulk", action="store_true", help="streaming matrix import with batched inserts")
+parser.add_argument("--chunk-size", type=int, default=None, help="users per transaction in --bulk mode")
+args = parser.parse_args()
+
 # Configure logging to see output
 logging.basicConfig(level=logging.INFO)
 
@@ -11,7 +17,7 @@ db = get_session()
 
 try:
     print("Starting rankings import manually...")
-    import_user_rankings(db)
+    import_user_rankings(db, bulk=args.bulk, chunk_size=args.chunk_size)
     print("Import complete.")
 except Exception as e:
     print(f"Error: {e}")
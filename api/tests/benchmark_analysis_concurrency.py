@@ -0,0 +1,71 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+
+BASE_URL = "http://localhost:8000/api/v1"
+FRANCHISE = "liella"
+SUBGROUP = "All Songs"
+
+HEAVY_PATHS = ["/analysis/divergence", "/analysis/spice", "/analysis/controversy"]
+
+
+async def timed_get(client, path, params=None):
+    start = time.perf_counter()
+    resp = await client.get(f"{BASE_URL}{path}", params=params)
+    return resp.status_code, time.perf_counter() - start
+
+
+async def probe_latency(client, stop: asyncio.Event):
+    """Hits a cheap endpoint repeatedly while heavy requests are in flight."""
+    samples = []
+    while not stop.is_set():
+        _, elapsed = await timed_get(client, "/health")
+        samples.append(elapsed)
+        await asyncio.sleep(0.05)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    print(
+        f"   {label:<28} n={len(samples):<4} "
+        f"p50={statistics.median(samples) * 1000:7.1f}ms  "
+        f"p95={p95 * 1000:7.1f}ms  max={samples[-1] * 1000:7.1f}ms"
+    )
+
+
+async def run_benchmark(concurrency=10):
+    print(f"🚀 Firing {concurrency} identical requests per heavy endpoint...")
+
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        for path in HEAVY_PATHS:
+            params = {"franchise": FRANCHISE}
+            if path != "/analysis/spice":
+                params["subgroup"] = SUBGROUP
+
+            stop = asyncio.Event()
+            probe = asyncio.create_task(probe_latency(client, stop))
+
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(timed_get(client, path, params) for _ in range(concurrency))
+            )
+            wall = time.perf_counter() - start
+            stop.set()
+            probe_samples = await probe
+
+            statuses = sorted({status for status, _ in results})
+            print(f"\n📊 {path} (statuses {statuses}, wall {wall:.2f}s)")
+            report("heavy request latency", [elapsed for _, elapsed in results])
+            if probe_samples:
+                report("/health during load", probe_samples)
+
+    print("\n✨ Benchmark finished.")
+    print("👉 A responsive server keeps /health p95 near its idle latency.")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(10))
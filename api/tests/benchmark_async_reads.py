@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+BASE_URL = "http://localhost:8000/api/v1"
+FRANCHISE = "liella"
+SUBGROUP = "All Songs"
+
+# The read routes served through get_async_read_db, with the share of
+# `total` each gets (/users/rankings returns every user's full list)
+LIGHT_REQUESTS = [
+    ("/health", {}, 1.0),
+    ("/subgroups", {"franchise": FRANCHISE}, 1.0),
+    ("/analysis/rankings", {"franchise": FRANCHISE, "subgroup": SUBGROUP}, 1.0),
+    ("/users/rankings", {"franchise": FRANCHISE, "subgroup": SUBGROUP}, 0.1),
+]
+
+# Routes a client re-polls with If-None-Match; a 304 skips the body
+REVALIDATED_REQUESTS = [
+    ("/analysis/divergence", {"franchise": FRANCHISE, "subgroup": SUBGROUP}, 1.0),
+    ("/analysis/spice", {"franchise": FRANCHISE}, 1.0),
+    ("/users/rankings", {"franchise": FRANCHISE, "subgroup": SUBGROUP}, 1.0),
+]
+
+
+async def worker(client, path, params, remaining, latencies, statuses, headers):
+    while remaining:
+        remaining.pop()
+        start = time.perf_counter()
+        resp = await client.get(f"{BASE_URL}{path}", params=params, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        statuses.add(resp.status_code)
+
+
+async def load(client, path, params, concurrency, total, headers=None):
+    """`total` GETs of one route, `concurrency` in flight at a time."""
+    remaining = list(range(total))
+    latencies, statuses = [], set()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, path, params, remaining, latencies, statuses, headers) for _ in range(concurrency)
+    ))
+    return time.perf_counter() - start, sorted(latencies), statuses
+
+
+async def run_benchmark(concurrency=16, total=200):
+    print(f"🚀 Up to {total} requests per route, {concurrency} concurrent, against {BASE_URL}\n")
+
+    # No keep-alive: a server busy past its keep-alive timeout may close a
+    # connection just as it is reused, which would count as a failure
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    etags = {}
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        # Warm up: stored results, connection pools
+        for path, params, _ in LIGHT_REQUESTS:
+            await client.get(f"{BASE_URL}{path}", params=params)
+        for path, params, _ in REVALIDATED_REQUESTS:
+            # The first GET may compute and store a missing result, changing its ETag
+            await client.get(f"{BASE_URL}{path}", params=params)
+            resp = await client.get(f"{BASE_URL}{path}", params=params)
+            etags[path] = resp.headers.get("etag")
+
+    total_requests, total_wall = 0, 0.0
+    for path, params, share in LIGHT_REQUESTS:
+        count = int(total * share)
+        async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+            wall, latencies, statuses = await load(client, path, params, concurrency, count)
+        total_requests += count
+        total_wall += wall
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        print(
+            f"📊 {path:<22} {count / wall:8.1f} req/s  "
+            f"p50={statistics.median(latencies) * 1000:7.1f}ms  "
+            f"p95={p95 * 1000:7.1f}ms  status={statuses}"
+        )
+
+    print(f"\n✨ Overall: {total_requests / total_wall:.1f} req/s")
+
+    # Light requests while /users/rankings calls are in flight
+    heavy_path, heavy_params, share = LIGHT_REQUESTS[-1]
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+        heavy = asyncio.ensure_future(load(client, heavy_path, heavy_params, 4, int(total * share)))
+        light_path, light_params, _ = LIGHT_REQUESTS[1]
+        wall, latencies, statuses = await load(client, light_path, light_params, concurrency - 4, total)
+        await heavy
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(
+        f"📊 {light_path} beside {heavy_path}: {total / wall:.1f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms  p95={p95 * 1000:.1f}ms  status={statuses}"
+    )
+
+    print()
+    for path, params, share in REVALIDATED_REQUESTS:
+        if not etags[path]:
+            print(f"📊 {path:<22} no ETag; skipped")
+            continue
+        count = int(total * share)
+        async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+            wall, latencies, statuses = await load(
+                client, path, params, concurrency, count, {"If-None-Match": etags[path]}
+            )
+        print(
+            f"📊 {path:<22} revalidated {count / wall:8.1f} req/s  "
+            f"p50={statistics.median(latencies) * 1000:7.1f}ms  status={statuses}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        BASE_URL = sys.argv[1]
+    asyncio.run(run_benchmark())
@@ -0,0 +1,74 @@
+import difflib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.matching import StrictSongMatcher
+from app.services.suggestions import SuggestionIndex
+
+SEEDS_DIR = Path(__file__).parent.parent / "app" / "seeds"
+QUERIES_PER_FRANCHISE = 150  # one badly formatted list's worth of unmatched lines
+NOISE = "abcdefgあいうえおのに君夢 !-'"
+
+
+def load_names(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return list(dict.fromkeys(StrictSongMatcher._normalize(s["name"]) for s in json.load(f)))
+
+
+def misspell(name, rnd):
+    """Typos, dropped characters and stray kana, like a hand-typed list."""
+    chars = list(name)
+    for _ in range(rnd.randint(1, 3)):
+        pos = rnd.randrange(len(chars) + 1)
+        roll = rnd.random()
+        if roll < 0.35 and chars:
+            chars.pop(min(pos, len(chars) - 1))
+        elif roll < 0.7:
+            chars.insert(pos, rnd.choice(NOISE))
+        elif chars:
+            chars[min(pos, len(chars) - 1)] = rnd.choice(NOISE)
+    return "".join(chars)
+
+
+def timed(func, queries):
+    start = time.perf_counter()
+    results = [func(q) for q in queries]
+    return results, time.perf_counter() - start
+
+
+def run_benchmark(seed=0):
+    rnd = random.Random(seed)
+    print("🚀 Fuzzy suggestions: difflib.get_close_matches vs SuggestionIndex (n=3, cutoff=0.7)\n")
+
+    total_old = total_new = 0.0
+    for path in sorted(SEEDS_DIR.glob("*_songs.json")):
+        names = load_names(path)
+        queries = [misspell(rnd.choice(names), rnd) for _ in range(QUERIES_PER_FRANCHISE)]
+        # Titles nobody has heard of: no suggestion clears the cutoff
+        queries += ["".join(rnd.choice(NOISE) for _ in range(rnd.randint(5, 30))) for _ in range(20)]
+
+        build_start = time.perf_counter()
+        index = SuggestionIndex(names)
+        build = time.perf_counter() - build_start
+
+        expected, old = timed(lambda q: difflib.get_close_matches(q, names, n=3, cutoff=0.7), queries)
+        actual, new = timed(lambda q: index.close_matches(q, n=3, cutoff=0.7), queries)
+        total_old += old
+        total_new += new
+
+        status = "✅ identical" if expected == actual else "❌ MISMATCH"
+        print(
+            f"📊 {path.stem:<20} songs={len(names):<4} queries={len(queries):<4} "
+            f"difflib={old * 1000:8.1f}ms  index={new * 1000:7.1f}ms (+{build * 1000:.1f}ms build)  {status}"
+        )
+
+    print(f"\n✨ Total: difflib {total_old:.3f}s, index {total_new:.3f}s ({total_old / total_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,33 @@
+"""Rank-map strategies and divergence results shared by the property tests."""
+
+from hypothesis import strategies as st
+
+from app.services.rank_matrix import DivergenceEngine, RankMatrix
+
+SONGS = [f"song{i}" for i in range(12)]
+USERS = [f"user{i}" for i in range(12)]
+
+# Relative ranks as stored: whole or half steps, up to a few hundred songs
+stored_ranks = st.integers(min_value=2, max_value=800).map(lambda r: r / 2)
+# Few distinct ranks, so divergence ties are common
+tied_ranks = st.integers(min_value=1, max_value=4).map(float)
+
+
+def rank_map(ranks):
+    """{song_id: rank} for at least one of SONGS"""
+    return st.dictionaries(st.sampled_from(SONGS), ranks, min_size=1)
+
+
+def rank_maps(ranks, min_users=0):
+    """{username: {song_id: rank}} over USERS"""
+    return st.dictionaries(st.sampled_from(USERS), rank_map(ranks), min_size=min_users)
+
+
+def divergence_data(user_rankings, songs=SONGS):
+    """The stored DIVERGENCE result for `user_rankings`"""
+    matrix = DivergenceEngine.divergence_dict(RankMatrix.from_rank_maps(user_rankings, songs))
+    rankings = {}
+    for username, rel_map in user_rankings.items():
+        for song_id, rank in rel_map.items():
+            rankings.setdefault(song_id, {})[username] = rank
+    return {"matrix": matrix, "rankings": rankings, "song_names": {s: s.upper() for s in rankings}}
@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime
+
+import numpy as np
+from hypothesis import given, settings
+
+from app.services.analysis_responses import AnalysisResponseService
+from conftest import divergence_data, rank_maps, stored_ranks
+
+
+def expand(compact):
+    """Rebuilds the legacy matrix and rankings dicts from a compact response."""
+    matrix_values, rank_values = compact.matrix, compact.rankings
+    if compact.array_encoding == "float16":
+        matrix_values = np.frombuffer(base64.b64decode(matrix_values), dtype="<f2").astype(float).tolist()
+        rank_values = [
+            None if np.isnan(v) else v
+            for v in np.frombuffer(base64.b64decode(rank_values), dtype="<f2").astype(float).tolist()
+        ]
+
+    users = compact.users
+    matrix = {user: {user: 0.0} for user in users}
+    flat = iter(matrix_values)
+    for i, user1 in enumerate(users):
+        for user2 in users[i + 1:]:
+            matrix[user1][user2] = matrix[user2][user1] = next(flat)
+    assert next(flat, None) is None
+
+    rankings = {}
+    for s, song_id in enumerate(compact.song_ids):
+        row = rank_values[s * len(users):(s + 1) * len(users)]
+        rankings[song_id] = {user: rank for user, rank in zip(users, row) if rank is not None}
+    return matrix, rankings
+
+
+@settings(max_examples=200)
+@given(rank_maps(stored_ranks))
+def test_compact_json_round_trips_exactly(user_rankings):
+    data = divergence_data(user_rankings)
+    compact = AnalysisResponseService.compact_divergence(data, datetime(2024, 1, 1), len(user_rankings))
+
+    matrix, rankings = expand(compact)
+    assert matrix == data["matrix"]
+    assert rankings == data["rankings"]
+    assert compact.song_names == [data["song_names"][s] for s in compact.song_ids]
+
+
+def assert_float16_close(matrix, expected):
+    for user1, row in expected.items():
+        for user2, value in row.items():
+            # 11 significant bits: round to nearest is within 2**-11 of the value
+            assert abs(matrix[user1][user2] - value) <= abs(value) / 2048
+
+
+@settings(max_examples=200)
+@given(rank_maps(stored_ranks))
+def test_compact_float16_keeps_ranks_exact_and_divergences_close(user_rankings):
+    data = divergence_data(user_rankings)
+    compact = AnalysisResponseService.compact_divergence(
+        data, datetime(2024, 1, 1), len(user_rankings), "float16"
+    )
+
+    matrix, rankings = expand(compact)
+    # Half-step ranks below 1024 are exact in float16
+    assert rankings == data["rankings"]
+    assert_float16_close(matrix, data["matrix"])
+
+
+def test_compact_float16_with_large_divergences():
+    songs = [f"song{i}" for i in range(300)]
+    user_rankings = {
+        "fan": {song: float(rank) for rank, song in enumerate(songs, start=1)},
+        "contrarian": {song: float(rank) for rank, song in enumerate(reversed(songs), start=1)},
+        "shuffler": {song: float((rank * 7) % 300 + 1) for rank, song in enumerate(songs)},
+    }
+    data = divergence_data(user_rankings, songs)
+    matrix = data["matrix"]
+    assert max(max(row.values()) for row in matrix.values()) >= 64
+
+    compact = AnalysisResponseService.compact_divergence(data, datetime(2024, 1, 1), 3, "float16")
+    expanded, _ = expand(compact)
+    assert_float16_close(expanded, matrix)
+
+
+def test_compact_accepts_legacy_matrix_only_results():
+    data = {"a": {"a": 0.0, "b": 1.5}, "b": {"a": 1.5, "b": 0.0}}
+    compact = AnalysisResponseService.compact_divergence(data, datetime(2024, 1, 1), 2)
+    assert (compact.users, compact.matrix, compact.song_ids, compact.rankings) == (["a", "b"], [1.5], [], [])
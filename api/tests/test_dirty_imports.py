@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.jobs.analysis_scheduler import recompute_analyses, recompute_dirty_analyses
+from app.models import AnalysisResult, Base, Franchise, Song, SubgroupAggregate
+from app.seeds.import_rankings import RankingsImporter
+from app.seeds.init import DatabaseSeeder
+
+SONGS = ["Starlight Prologue", "Aspire", "Dazzling Game", "Sing!Shine!Smile!"]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # One shared connection, so the scheduler's own sessions see the data
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    session = database.SessionLocal()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def franchise(db, monkeypatch):
+    monkeypatch.setattr(DatabaseSeeder, "load_subgroups_toml", lambda: subgroups_config(SONGS))
+    franchise = Franchise(name="liella")
+    db.add(franchise)
+    db.flush()
+    db.add_all([Song(name=name, franchise_id=franchise.id) for name in SONGS])
+    db.commit()
+    DatabaseSeeder.seed_subgroups(db, "liella")
+    return franchise
+
+
+def subgroups_config(song_names):
+    return {"liella": {"all": {"name": "All Songs", "songs": song_names}}}
+
+
+def write_csv(path, rankings):
+    """Wide format: a header of usernames, then one row per rank"""
+    usernames = list(rankings)
+    lines = ["," + ",".join(usernames)]
+    for position in range(len(SONGS)):
+        cells = [f"{position + 1}. {rankings[username][position]} - Liella!" for username in usernames]
+        lines.append("," + ",".join(cells))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def community_rank(db):
+    db.expire_all()
+    return db.query(AnalysisResult).filter_by(analysis_type="COMMUNITY_RANK").one().result_data
+
+
+@pytest.mark.parametrize("import_csv", [RankingsImporter.import_from_csv, RankingsImporter.bulk_import_from_csv])
+def test_reimported_rankings_are_picked_up_by_the_dirty_recompute(db, franchise, tmp_path, import_csv):
+    import_csv(db, write_csv(tmp_path / "first.csv", {"alice": SONGS, "bob": SONGS}), "liella")
+    recompute_analyses()
+    before = community_rank(db)
+    assert before[0]["song_name"] == SONGS[0]
+
+    # alice's existing submission is rewritten in place
+    import_csv(db, write_csv(tmp_path / "second.csv", {"alice": SONGS[::-1]}), "liella")
+    assert db.query(SubgroupAggregate).count() == 0
+
+    recompute_dirty_analyses()
+    after = community_rank(db)
+    assert after != before
+    assert {row["song_name"]: row["average"] for row in after}[SONGS[-1]] == 2.5
+
+
+def test_changed_subgroup_songs_are_picked_up_by_the_dirty_recompute(db, franchise, tmp_path, monkeypatch):
+    RankingsImporter.import_from_csv(db, write_csv(tmp_path / "rankings.csv", {"alice": SONGS, "bob": SONGS}), "liella")
+    recompute_analyses()
+    assert [row["song_name"] for row in community_rank(db)] == SONGS
+
+    monkeypatch.setattr(DatabaseSeeder, "load_subgroups_toml", lambda: subgroups_config(SONGS[:2]))
+    DatabaseSeeder.seed_subgroups(db, "liella")
+    assert db.query(SubgroupAggregate).count() == 0
+
+    recompute_dirty_analyses()
+    assert [row["song_name"] for row in community_rank(db)] == SONGS[:2]
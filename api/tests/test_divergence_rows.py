@@ -0,0 +1,56 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from hypothesis import HealthCheck, given, settings, strategies as st
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, UserNeighbors
+from app.services.divergence_rows import DivergenceRowService
+from app.services.neighbors import NeighborIndexService
+from conftest import USERS, divergence_data, rank_map, rank_maps, tied_ranks
+
+FRANCHISE_ID = uuid.uuid4()
+SUBGROUP_ID = uuid.uuid4()
+
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@settings(max_examples=100, suppress_health_check=[HealthCheck.function_scoped_fixture])
+@given(rank_maps(tied_ranks, min_users=1), st.lists(st.tuples(st.sampled_from(USERS), rank_map(tied_ranks), st.booleans()), min_size=1, max_size=4))
+def test_updated_rows_assemble_the_recomputed_matrix(db, user_rankings, submissions):
+    DivergenceRowService.rebuild(db, FRANCHISE_ID, SUBGROUP_ID, divergence_data(user_rankings), datetime(2024, 1, 1))
+
+    current = dict(user_rankings)
+    for username, rel_map, drop_first in submissions:
+        # Optionally drop the first other user, as a reseed after a deletion would
+        known = set(current) | {username}
+        if drop_first:
+            known -= set(sorted(u for u in current if u != username)[:1])
+        current = {u: m for u, m in current.items() if u in known}
+        current[username] = rel_map
+
+        row = DivergenceRowService.update_user(db, FRANCHISE_ID, SUBGROUP_ID, username, rel_map, known)
+        NeighborIndexService.update_user(db, FRANCHISE_ID, SUBGROUP_ID, username, row)
+        db.flush()
+
+        expected = divergence_data(current)
+        assert row == expected["matrix"][username]
+        entry = db.query(UserNeighbors).filter_by(subgroup_id=SUBGROUP_ID, username=username).one()
+        assert (entry.soulmates, entry.nemeses) == NeighborIndexService.top_k(expected["matrix"][username], username)
+
+    data = DivergenceRowService.matrix_data(db, FRANCHISE_ID, SUBGROUP_ID, {})
+    expected = divergence_data(current)
+    assert data["matrix"] == expected["matrix"]
+    assert list(data["matrix"]) == sorted(current)
+    assert data["rankings"] == expected["rankings"]
+    db.rollback()
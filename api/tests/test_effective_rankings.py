@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models import Base, Franchise, Song, Subgroup, Submission, SubmissionStatus
+from app.services.normalized_rankings import NormalizedRankingService
+from app.services.snapshot import RankingSnapshot
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_a_user_ranking_two_subgroups_counts_once_per_subgroup(db, monkeypatch):
+    monkeypatch.setattr(settings, "normalized_rankings_enabled", True)
+
+    franchise = Franchise(name="liella")
+    db.add(franchise)
+    db.flush()
+    songs = [Song(name=f"song{i}", franchise_id=franchise.id) for i in range(6)]
+    db.add_all(songs)
+    db.flush()
+    ids = [str(song.id) for song in songs]
+    everything = Subgroup(name="All Songs", franchise_id=franchise.id, song_ids=ids)
+    unit = Subgroup(name="Unit", franchise_id=franchise.id, song_ids=ids[:3])
+    # Covered by both of alice's rankings, made for neither
+    pair = Subgroup(name="Pair", franchise_id=franchise.id, song_ids=ids[2:4])
+    subgroups = [everything, unit, pair]
+    db.add_all(subgroups)
+    db.flush()
+
+    started = datetime(2024, 1, 1)
+
+    def submit(username, subgroup, order, minutes):
+        submission = Submission(
+            username=username,
+            franchise_id=franchise.id,
+            subgroup_id=subgroup.id,
+            parsed_rankings={ids[song]: float(rank) for rank, song in enumerate(order, start=1)},
+            submission_status=SubmissionStatus.VALID,
+            is_current=True,
+            created_at=started + timedelta(minutes=minutes),
+        )
+        db.add(submission)
+        db.flush()
+        NormalizedRankingService.index_submission(db, submission, subgroups)
+
+    # Stored out of submission order: load order must follow created_at
+    submit("alice", unit, [2, 1, 0], minutes=1)
+    submit("alice", everything, [0, 1, 2, 3, 4, 5], minutes=0)
+    submit("bob", everything, [5, 4, 3, 2, 1, 0], minutes=2)
+    db.commit()
+
+    snapshot = RankingSnapshot.load(franchise.id, db)
+    for subgroup in subgroups:
+        assert [username for username, _ in snapshot.relative_rankings(subgroup.id)] == ["alice", "bob"]
+    assert snapshot.user_rankings(everything.id)["alice"] == {ids[i]: i + 1.0 for i in range(6)}
+    assert snapshot.user_rankings(unit.id)["alice"] == {ids[2]: 1.0, ids[1]: 2.0, ids[0]: 3.0}
+    assert snapshot.user_rankings(pair.id)["alice"] == {ids[2]: 1.0}
+
+    batched = RankingSnapshot.load(franchise.id, db)
+    batched.relativize_subgroups()
+    for subgroup in subgroups:
+        assert batched.relative_rankings(subgroup.id) == snapshot.relative_rankings(subgroup.id)
+
+    # The SQL aggregates see the same rankings
+    for subgroup in subgroups:
+        expected = {}
+        for _, rel_map in snapshot.relative_rankings(subgroup.id):
+            for song_id, rank in rel_map.items():
+                total, count, total_sq = expected.get(song_id, (0.0, 0, 0.0))
+                expected[song_id] = (total + rank, count + 1, total_sq + rank * rank)
+        assert NormalizedRankingService.song_stats(db, franchise.id, subgroup.id) == expected
@@ -0,0 +1,212 @@
+import gzip
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.api.v1 import analysis
+from app.config import settings
+from app.jobs.analysis_scheduler import update_analysis_record
+from app.models import Base, Franchise, Subgroup
+from app.utils.http_cache import HttpCache
+
+RANKINGS_URL = "/api/v1/analysis/rankings"
+DIVERGENCE_URL = "/api/v1/analysis/divergence"
+PARAMS = {"franchise": "liella", "subgroup": "All Songs"}
+
+
+def community_rank(points):
+    return [{
+        "song_id": str(uuid.UUID(int=1)),
+        "song_name": "Starlight Prologue",
+        "points": points,
+        "average": points / 2,
+        "submission_count": 2,
+    }]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # In-memory, so the async routes run on ThreadedReadSession
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(database, "ReadSessionLocal", None)
+    monkeypatch.setattr(database, "AsyncReadSessionLocal", None)
+    session = database.SessionLocal()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def scope(db):
+    franchise = Franchise(name="liella")
+    db.add(franchise)
+    db.flush()
+    subgroup = Subgroup(name="All Songs", franchise_id=franchise.id, song_ids=[])
+    db.add(subgroup)
+    db.commit()
+    return franchise.id, subgroup.id
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(analysis.router)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("if_none_match, matched", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ('"xyz",  "abc" ', True),
+    ("*", True),
+    ('"xyz"', False),
+    ('"ab"', False),
+])
+def test_matches_uses_weak_comparison(if_none_match, matched):
+    assert HttpCache.matches(if_none_match, '"abc"') is matched
+    assert HttpCache.matches(if_none_match, 'W/"abc"') is matched
+
+
+@pytest.mark.parametrize("accept_encoding, accepted", [
+    (None, False),
+    ("", False),
+    ("gzip", True),
+    ("GZIP", True),
+    ("deflate, gzip;q=0.5", True),
+    ("gzip;q=0", False),
+    ("gzip;q=0.0, identity", False),
+    ("gzip;q=bad", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("br, deflate", False),
+])
+def test_accepts_honours_q_values(accept_encoding, accepted):
+    assert HttpCache.accepts(accept_encoding, "gzip") is accepted
+
+
+def test_stored_result_revalidates_until_recomputed(db, scope, client):
+    update_analysis_record(db, *scope, "COMMUNITY_RANK", community_rank(3.0), 2)
+    db.commit()
+
+    first = client.get(RANKINGS_URL, params=PARAMS)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert "must-revalidate" in first.headers["Cache-Control"]
+
+    revalidated = client.get(RANKINGS_URL, params=PARAMS, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+
+    # A recompute stores a new computed_at, so the old tag stops matching
+    update_analysis_record(db, *scope, "COMMUNITY_RANK", community_rank(5.0), 2)
+    db.commit()
+    refreshed = client.get(RANKINGS_URL, params=PARAMS, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["ETag"] != etag
+    assert refreshed.json()["rankings"][0]["points"] == 5.0
+
+
+def test_stored_gzip_body_is_sent_as_is_or_decoded(db, scope, client):
+    record = update_analysis_record(db, *scope, "COMMUNITY_RANK", community_rank(3.0), 2)
+    db.commit()
+    assert record.response_encoding == "gzip"
+    stored_body = gzip.decompress(record.response_body)
+
+    compressed = client.get(RANKINGS_URL, params=PARAMS, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert compressed.content == stored_body
+
+    # Without gzip in Accept-Encoding the stored body is decompressed
+    identity = client.get(RANKINGS_URL, params=PARAMS, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+    assert identity.content == stored_body
+    assert identity.headers["ETag"] != compressed.headers["ETag"]
+
+    refused = client.get(RANKINGS_URL, params=PARAMS, headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in refused.headers
+    assert refused.headers["ETag"] == identity.headers["ETag"]
+
+
+def test_result_without_stored_body_is_rendered(db, scope, client):
+    record = update_analysis_record(db, *scope, "COMMUNITY_RANK", community_rank(3.0), 2)
+    record.response_body = record.response_encoding = None
+    db.commit()
+
+    response = client.get(RANKINGS_URL, params=PARAMS)
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.json()["rankings"] == community_rank(3.0)
+    assert response.json()["metadata"]["based_on_submissions"] == 2
+
+
+def test_rendered_bodies_are_kept_by_etag(monkeypatch):
+    monkeypatch.setattr(settings, "rendered_response_cache_size", 2)
+    tags = [HttpCache.etag(uuid.uuid4()) for _ in range(3)]
+    for position, tag in enumerate(tags):
+        HttpCache.remember(tag, bytes([position]))
+    assert HttpCache.recall(tags[0]) is None
+    assert HttpCache.recall(tags[1]) == b"\x01"
+    assert HttpCache.recall(tags[2]) == b"\x02"
+
+
+def test_compact_divergence_is_rendered_once_per_result(db, scope, client):
+    data = {"matrix": {"a": {"a": 0.0, "b": 40.5}, "b": {"a": 40.5, "b": 0.0}}, "rankings": {}, "song_names": {}}
+    record = update_analysis_record(db, *scope, "DIVERGENCE", data, 2)
+    db.commit()
+    params = {**PARAMS, "format": "compact"}
+
+    first = client.get(DIVERGENCE_URL, params=params)
+    assert first.json()["matrix"] == [40.5]
+
+    # Same computed_at, so the same ETag: the kept body is sent without
+    # reading result_data again
+    record.result_data = {**data, "matrix": {"a": {"a": 0.0, "b": 1.0}, "b": {"a": 1.0, "b": 0.0}}}
+    db.commit()
+    cached = client.get(DIVERGENCE_URL, params=params)
+    assert cached.headers["ETag"] == first.headers["ETag"]
+    assert cached.content == first.content
+
+    update_analysis_record(db, *scope, "DIVERGENCE", record.result_data, 2)
+    db.commit()
+    recomputed = client.get(DIVERGENCE_URL, params=params)
+    assert recomputed.headers["ETag"] != first.headers["ETag"]
+    assert recomputed.json()["matrix"] == [1.0]
+
+
+def test_compact_divergence_revalidates_without_gzip(db, scope, client, monkeypatch):
+    monkeypatch.setattr(settings, "stored_response_gzip_level", 0)
+    data = {"matrix": {"a": {"a": 0.0, "b": 2.5}, "b": {"a": 2.5, "b": 0.0}}, "rankings": {}, "song_names": {}}
+    record = update_analysis_record(db, *scope, "DIVERGENCE", data, 2)
+    db.commit()
+    assert record.response_encoding == "identity"
+    params = {**PARAMS, "format": "compact"}
+    gzip_ok = {"Accept-Encoding": "gzip"}
+
+    first = client.get(DIVERGENCE_URL, params=params, headers=gzip_ok)
+    assert "Content-Encoding" not in first.headers
+    assert first.json()["matrix"] == [2.5]
+
+    revalidated = client.get(DIVERGENCE_URL, params=params, headers={**gzip_ok, "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+    # The kept body is found under the tag it was stored with
+    record.result_data = {**data, "matrix": {"a": {"a": 0.0, "b": 1.0}, "b": {"a": 1.0, "b": 0.0}}}
+    db.commit()
+    cached = client.get(DIVERGENCE_URL, params=params, headers=gzip_ok)
+    assert cached.headers["ETag"] == first.headers["ETag"]
+    assert cached.content == first.content
@@ -0,0 +1,21 @@
+from hypothesis import given, settings
+
+from app.services.neighbors import NeighborIndexService
+from conftest import divergence_data, rank_maps, tied_ranks
+
+
+def legacy_match(matrix, username):
+    others = [(u, val) for u, val in matrix[username].items() if u != username]
+    others.sort(key=lambda x: x[1])
+    return (
+        [{"user": u, "div": v} for u, v in others[:3]],
+        [{"user": u, "div": v} for u, v in others[-3:][::-1]],
+    )
+
+
+@settings(max_examples=200)
+@given(rank_maps(tied_ranks, min_users=1))
+def test_top_k_matches_sorting_the_full_row(user_rankings):
+    matrix = divergence_data(user_rankings)["matrix"]
+    for username in matrix:
+        assert NeighborIndexService.top_k(matrix[username], username) == legacy_match(matrix, username)
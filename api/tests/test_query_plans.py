@@ -0,0 +1,157 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+from app.models import AnalysisResult, Base, Subgroup, Submission, SubmissionStatus
+from app.services.current_submissions import CurrentSubmissionService
+from app.services.live_analysis import LiveAnalysisService
+from app.services.snapshot import RankingSnapshot
+
+FRANCHISE_ID = uuid.uuid4()
+SUBGROUP_ID = uuid.uuid4()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def query_plans(db, run):
+    """Runs `run()` and returns the EXPLAIN QUERY PLAN details of every SELECT it issued."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    connection = db.connection()
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+
+    assert statements, "no SELECT was issued"
+    return [
+        " | ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params))
+        for sql, params in statements
+    ]
+
+
+def assert_indexed(plans, table, *index_names):
+    """Every plan searches `table` through one of `index_names`, without a sort."""
+    for plan in plans:
+        assert f"SCAN {table}" not in plan, plan
+        assert any(index_name in plan for index_name in index_names), plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+# Both lead with (franchise_id, submission_status, is_current) and hold
+# created_at and id, so either covers counts and data versions
+CURRENT_INDEXES = ("ix_submissions_franchise_current_created", "ix_submissions_franchise_current_user_id")
+
+
+def current_submissions(db):
+    return db.query(Submission).filter(
+        Submission.franchise_id == FRANCHISE_ID,
+        Submission.submission_status == SubmissionStatus.VALID,
+        Submission.is_current.is_(True),
+    )
+
+
+def test_snapshot_load_uses_current_index(db):
+    plans = query_plans(db, lambda: RankingSnapshot.load(FRANCHISE_ID, db))
+    submission_plans = [p for p in plans if "submissions" in p]
+    assert submission_plans
+    assert_indexed(submission_plans, "submissions", "ix_submissions_franchise_current_created")
+    assert_indexed([p for p in plans if "subgroups" in p], "subgroups", "ix_subgroups_franchise_name")
+
+
+def test_data_version_uses_current_index(db):
+    plans = query_plans(db, lambda: LiveAnalysisService.data_version(FRANCHISE_ID, db))
+    assert_indexed(plans, "submissions", *CURRENT_INDEXES)
+
+
+def test_latest_user_submission_is_an_index_seek(db):
+    plans = query_plans(db, lambda: current_submissions(db).filter(
+        Submission.username == "alice"
+    ).order_by(Submission.created_at.desc()).first())
+    assert_indexed(plans, "submissions", "ix_submissions_franchise_current_user_id")
+
+
+def test_user_pair_lookup_uses_current_index(db):
+    plans = query_plans(db, lambda: current_submissions(db).filter(
+        Submission.username.in_(["alice", "bob"])
+    ).all())
+    assert_indexed(plans, "submissions", "ix_submissions_franchise_current_user_id")
+
+
+def test_per_user_lookups_use_user_index(db):
+    plans = query_plans(db, lambda: db.query(Submission).filter(
+        Submission.username == "alice",
+        Submission.franchise_id == FRANCHISE_ID,
+    ).count())
+    plans += query_plans(db, lambda: db.query(Submission).filter(
+        Submission.username == "alice",
+        Submission.franchise_id == FRANCHISE_ID,
+        Submission.subgroup_id == SUBGROUP_ID,
+    ).first())
+    # Superseding: the stored current rows of a batch's users
+    plans += query_plans(db, lambda: CurrentSubmissionService.replace(
+        db, FRANCHISE_ID, SUBGROUP_ID, {"alice": uuid.uuid4(), "bob": uuid.uuid4()}
+    ))
+    assert_indexed(plans, "submissions", "ix_submissions_user_franchise")
+
+
+def test_franchise_submission_count_is_covered(db):
+    plans = query_plans(db, lambda: current_submissions(db).with_entities(func.count(Submission.id)).scalar())
+    assert_indexed(plans, "submissions", *CURRENT_INDEXES)
+
+
+def test_stored_analysis_lookup_uses_unique_key(db):
+    plans = query_plans(db, lambda: db.query(AnalysisResult).filter_by(
+        franchise_id=FRANCHISE_ID, subgroup_id=SUBGROUP_ID, analysis_type="DIVERGENCE"
+    ).first())
+    plans += query_plans(db, lambda: db.query(Subgroup).filter_by(
+        franchise_id=FRANCHISE_ID, name="All Songs"
+    ).first())
+    for plan in plans:
+        assert "SCAN" not in plan, plan
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, plan
+
+
+def test_conditional_get_lookup_is_indexed(db):
+    from app.api.v1.analysis import _stored_result_query
+
+    plans = query_plans(db, lambda: db.execute(_stored_result_query("liella", "All Songs", "DIVERGENCE")).first())
+    plans += query_plans(db, lambda: db.execute(_stored_result_query("liella", None, "SPICE")).first())
+    for plan in plans:
+        assert "SCAN" not in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+def test_user_rankings_pages_are_index_range_scans(db):
+    from app.api.v1.users import _user_page_query
+
+    after = "alice"
+    plans = query_plans(db, lambda: db.execute(_user_page_query(FRANCHISE_ID, 50, after)).all())
+    plans += query_plans(db, lambda: db.execute(_user_page_query(FRANCHISE_ID, 50, after, "al")).all())
+    assert_indexed(plans, "submissions", "ix_submissions_franchise_current_user_id")
+
+
+def test_user_match_lookup_uses_neighbor_key(db):
+    from app.api.v1.analysis import _user_match_query
+
+    plans = query_plans(db, lambda: db.execute(_user_match_query("liella", "All Songs", "alice")).first())
+    for plan in plans:
+        assert "SCAN" not in plan, plan
+        # The unique (franchise_id, subgroup_id, username) key
+        assert "user_neighbors USING INDEX" in plan and "username=?" in plan, plan
@@ -0,0 +1,103 @@
+import numpy as np
+from hypothesis import given, settings, strategies as st
+
+from app.services.ranking_utils import RelativeRankingService
+from app.services.snapshot import RankingSnapshot, SubgroupRecord, SubmissionRecord
+from app.services.tie_handling import TieHandlingService
+
+SONGS = [f"song{i}" for i in range(24)]
+
+# Few distinct ranks so ties are common; half steps mimic stored mean ranks
+ranks = st.integers(min_value=1, max_value=12).map(lambda r: r / 2) | st.integers(min_value=1, max_value=30)
+rankings = st.dictionaries(st.sampled_from(SONGS), ranks, max_size=len(SONGS))
+batches = st.lists(rankings, max_size=12)
+subgroups = st.lists(st.sampled_from(SONGS), min_size=1, max_size=len(SONGS), unique=True)
+# Overlapping subgroups of one franchise, possibly without songs
+franchise_subgroups = st.lists(st.lists(st.sampled_from(SONGS), max_size=len(SONGS), unique=True), max_size=6)
+
+
+def to_matrix(batch):
+    matrix = np.full((len(batch), len(SONGS)), np.nan)
+    for row, ranking in enumerate(batch):
+        for song_id, rank in ranking.items():
+            matrix[row, SONGS.index(song_id)] = rank
+    return matrix
+
+
+def row_to_dict(row, song_ids):
+    return {song_id: value for song_id, value in zip(song_ids, row.tolist()) if not np.isnan(value)}
+
+
+def assert_bit_identical(expected, actual):
+    assert expected.keys() == actual.keys()
+    for song_id, value in expected.items():
+        assert type(actual[song_id]) is float
+        assert float(value).hex() == actual[song_id].hex()
+
+
+@settings(max_examples=300)
+@given(batches)
+def test_average_ranks_matches_convert_tied_ranks(batch):
+    means = TieHandlingService.average_ranks(to_matrix(batch))
+    for ranking, row in zip(batch, means):
+        assert_bit_identical(TieHandlingService.convert_tied_ranks(ranking), row_to_dict(row, SONGS))
+
+
+@settings(max_examples=300)
+@given(batches)
+def test_convert_tied_ranks_batch_matches_convert_tied_ranks(batch):
+    converted = TieHandlingService.convert_tied_ranks_batch(batch)
+    assert len(converted) == len(batch)
+    for ranking, result in zip(batch, converted):
+        assert_bit_identical(TieHandlingService.convert_tied_ranks(ranking), result)
+        # Keys follow rank order
+        assert list(result.values()) == sorted(result.values())
+
+
+@settings(max_examples=300)
+@given(batches, subgroups)
+def test_relativize_matrix_matches_relativize(batch, subgroup):
+    columns = [SONGS.index(song_id) for song_id in subgroup]
+    relative = RelativeRankingService.relativize_matrix(to_matrix(batch), columns)
+    for ranking, row in zip(batch, relative):
+        assert_bit_identical(RelativeRankingService.relativize(ranking, subgroup), row_to_dict(row, subgroup))
+
+
+@settings(max_examples=300)
+@given(rankings, franchise_subgroups)
+def test_relativize_all_matches_relativize(ranking, song_lists):
+    membership = RelativeRankingService.build_membership(song_lists)
+    relative = RelativeRankingService.relativize_all(ranking, membership, len(song_lists))
+    assert len(relative) == len(song_lists)
+    for song_ids, result in zip(song_lists, relative):
+        expected = RelativeRankingService.relativize(ranking, song_ids)
+        assert_bit_identical(expected, result)
+        # Same key order too: analyses iterate these maps
+        assert list(result) == list(expected)
+
+
+@settings(max_examples=200)
+@given(
+    st.lists(st.tuples(st.sampled_from(["alice", "bob", "carol"]), rankings, st.integers(0, 5)), max_size=12),
+    franchise_subgroups,
+)
+def test_batched_snapshot_matches_per_subgroup_relativize(entries, song_lists):
+    subgroups = [SubgroupRecord(f"sg{i}", f"Subgroup {i}", song_ids, False) for i, song_ids in enumerate(song_lists)]
+    submissions = [SubmissionRecord(username, ranking, f"sg{own}") for username, ranking, own in entries]
+    lazy = RankingSnapshot("franchise", submissions, subgroups, {})
+    batched = RankingSnapshot("franchise", submissions, subgroups, {})
+    batched.relativize_subgroups()
+
+    for subgroup in subgroups:
+        expected = lazy.relative_rankings(subgroup.id)
+        result = batched.relative_rankings(subgroup.id)
+        assert [username for username, _ in result] == [username for username, _ in expected]
+        for (_, rel_map), (_, expected_map) in zip(result, expected):
+            assert_bit_identical(expected_map, rel_map)
+            assert list(rel_map) == list(expected_map)
+
+
+def test_average_ranks_example():
+    matrix = np.array([[1, 1, 3, np.nan], [np.nan, np.nan, np.nan, np.nan], [2, 2, 2, 2]])
+    expected = np.array([[1.5, 1.5, 3, np.nan], [np.nan] * 4, [2.5] * 4])
+    np.testing.assert_array_equal(TieHandlingService.average_ranks(matrix), expected)
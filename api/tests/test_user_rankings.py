@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.api.v1 import users
+from app.models import Base, Franchise, Song, Subgroup, Submission, SubmissionStatus
+
+URL = "/api/v1/users/rankings"
+PARAMS = {"franchise": "liella", "subgroup": "All Songs"}
+USERNAMES = ["alice", "Bob", "carol", "dave\U0010ffff", "dave\U0010ffffx", "\U0010ffff", "erin"]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # In-memory, so the async routes run on ThreadedReadSession
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(database, "ReadSessionLocal", None)
+    monkeypatch.setattr(database, "AsyncReadSessionLocal", None)
+    session = database.SessionLocal()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(users.router)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def submit(db, subgroup, username, song_ids, created_at=None):
+    db.add(Submission(
+        username=username,
+        franchise_id=subgroup.franchise_id,
+        subgroup_id=subgroup.id,
+        parsed_rankings={song_id: float(rank) for rank, song_id in enumerate(song_ids, start=1)},
+        submission_status=SubmissionStatus.VALID,
+        is_current=True,
+        created_at=created_at,
+    ))
+
+
+@pytest.fixture
+def submissions(db):
+    franchise = Franchise(name="liella")
+    db.add(franchise)
+    db.flush()
+    songs = [Song(name=f"song{i}", franchise_id=franchise.id) for i in range(4)]
+    db.add_all(songs)
+    db.flush()
+    ids = [str(song.id) for song in songs]
+    everything = Subgroup(name="All Songs", franchise_id=franchise.id, song_ids=ids)
+    unit = Subgroup(name="Unit", franchise_id=franchise.id, song_ids=ids[:2])
+    solo = Subgroup(name="Solo", franchise_id=franchise.id, song_ids=ids[3:])
+    db.add_all([everything, unit, solo])
+    db.flush()
+
+    # Every user is current in all three subgroups. created_at is left to
+    # the server default, so a user's rows share one timestamp.
+    for username in USERNAMES:
+        submit(db, everything, username, ids)
+        submit(db, unit, username, unit.song_ids)
+        submit(db, solo, username, solo.song_ids)
+    # frank never ranked All Songs, so the latest ranking covering it counts
+    submit(db, unit, "frank", unit.song_ids, created_at=datetime(2024, 1, 1))
+    submit(db, solo, "frank", solo.song_ids, created_at=datetime(2024, 1, 2))
+    db.commit()
+
+
+def walk(client, limit, **params):
+    pages, cursor = [], None
+    while True:
+        page = client.get(URL, params={**PARAMS, **params, "limit": limit, "cursor": cursor}).json()
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return [user for page in pages for user in page["users"]], len(pages)
+
+
+def test_each_user_appears_once_with_their_effective_ranking(submissions, client):
+    users = client.get(URL, params=PARAMS).json()["users"]
+    assert sorted(user["username"] for user in users) == sorted(USERNAMES + ["frank"])
+    assert {user["username"]: user["total_songs"] for user in users} == {
+        **{username: 4 for username in USERNAMES}, "frank": 1,
+    }
+
+    picker = client.get(URL, params={**PARAMS, "fields": "username"}).json()["users"]
+    assert len(picker) == len({user["username"] for user in picker}) == len(users)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 500])
+def test_walking_every_page_returns_the_unpaginated_users(submissions, client, limit):
+    unpaginated = client.get(URL, params=PARAMS).json()["users"]
+
+    paged, page_count = walk(client, limit)
+    assert sorted(paged, key=lambda user: user["username"]) == sorted(unpaginated, key=lambda user: user["username"])
+    assert [user["username"] for user in paged] == sorted(user["username"] for user in unpaginated)
+    assert page_count > 1 or limit == 500
+
+
+def test_cursor_from_an_earlier_format_is_rejected(submissions, client):
+    response = client.get(URL, params={**PARAMS, "limit": 1, "cursor": "WyJhIiwgMV0="})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("prefix, expected", [
+    ("dave", {"dave\U0010ffff", "dave\U0010ffffx"}),
+    ("dave\U0010ffff", {"dave\U0010ffff", "dave\U0010ffffx"}),
+    ("\U0010ffff", {"\U0010ffff"}),
+    ("\U0010ffff\U0010ffff", set()),
+    ("B", {"Bob"}),
+])
+def test_username_prefix_is_a_range_up_to_the_last_code_point(submissions, client, prefix, expected):
+    paged, _ = walk(client, 2, username_prefix=prefix)
+    assert {user["username"] for user in paged} == expected
@@ -1912,7 +1912,7 @@ async function fetchUserList() {
     if (!sel) return;
 
     try {
-        const res = await fetch(`${API}/users/rankings?franchise=${f}&subgroup=${encodeURIComponent(sub)}`);
+        const res = await fetch(`${API}/users/rankings?franchise=${f}&subgroup=${encodeURIComponent(sub)}&fields=username`);
         if (!res.ok) return;
         const data = await res.json();
         if (data.users && data.users.length > 0) {